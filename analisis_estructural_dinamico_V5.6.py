@@ -6,6 +6,8 @@ import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import matplotlib.patches as patches
+from matplotlib.figure import Figure
+from matplotlib.collections import LineCollection
 from matplotlib.patches import Circle
 import math
 from datetime import datetime
@@ -19,7 +21,21 @@ from reportlab.lib import colors
 import base64
 import tempfile
 import os
-from scipy.linalg import eig
+import hashlib
+import json
+import copy
+import threading
+import warnings
+from collections import OrderedDict
+import pickle
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from scipy.linalg import eig, eigh, ldl, eigvalsh_tridiagonal, cholesky_banded, cho_factor, cho_solve, lu_factor, lu_solve
+from scipy.linalg.lapack import dpbtrs
+from scipy import sparse
+from scipy.sparse.linalg import spsolve, splu, eigsh, onenormest, LinearOperator, ArpackError, ArpackNoConvergence
+from scipy.sparse.csgraph import reverse_cuthill_mckee
 
 try:
     from openpyxl import Workbook
@@ -29,6 +45,11 @@ try:
 except ImportError:
     OPENPYXL_AVAILABLE = False
 
+try:
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+except ImportError:
+    add_script_run_ctx = get_script_run_ctx = None
+
 
 # -----------------------------------------------------------------
 # 2. CONFIGURACIÓN DE PÁGINA Y CSS
@@ -413,6 +434,111 @@ MATERIALES_AEROESPACIALES = {
     }
 }
 
+# Nombres de los GL por nodo según el tipo de elemento (mismo orden que la numeración)
+DIRECCIONES_GL = {
+    "barra": ['X', 'Y'],
+    "viga": ['Y', 'Theta'],
+    "viga_portico": ['X', 'Y', 'Theta']
+}
+
+# A partir de este número de GL las matrices globales se ensamblan en formato
+# disperso (CSR); por debajo se mantiene el ensamblaje denso
+UMBRAL_GL_ENSAMBLAJE_DISPERSO = 300
+
+# Almacenamiento en banda: se usa si (ancho de banda + 1) <= FRACCION_ANCHO_BANDA_MAXIMA * n
+FRACCION_ANCHO_BANDA_MAXIMA = 0.1
+
+# Número de modos extraídos por los solvers iterativos (Lanczos)
+NUM_MODOS_POR_DEFECTO = 20
+
+# Lanczos solo compensa si se piden pocos modos frente al tamaño del sistema (k <= fracción * n)
+FRACCION_MODOS_LANCZOS_MAXIMA = 0.1
+
+# Métodos del barrido en frecuencia (clave interna -> etiqueta en la UI)
+METODOS_BARRIDO = {
+    "directo": "Directo (exacto, un sistema por frecuencia)",
+    "modal": "Superposición modal (+ flexibilidad residual)",
+    "paralelo": "Directo en paralelo (procesos)",
+}
+
+# Frecuencias por tarea en el barrido directo paralelo
+TAMANO_TRAMO_BARRIDO = 64
+
+# Errores al arrancar un pool de procesos (sin procesos, script no importable, funciones no
+# serializables) tras los que se calcula en serie; los errores de las tareas se propagan
+ERRORES_INICIO_POOL = (OSError, BrokenProcessPool, pickle.PicklingError)
+
+# Malla adaptativa: se bisecan intervalos cuyo salto o curvatura de log10|U| supera esta tolerancia (décadas)
+TOLERANCIA_BARRIDO_ADAPTATIVO = 0.05
+# Distancia relativa de las semillas a cada frecuencia natural (como 0.999/1.001 en la malla uniforme)
+SEPARACION_SEMILLAS_RESONANCIA = 1e-3
+# Los picos se afinan (mitad de distancia por ronda) hasta tener muestras a esta distancia relativa de f_n
+RESOLUCION_RESONANCIA_BARRIDO = 5e-4
+
+# Integración directa en el tiempo (respuesta a aceleración de base)
+METODOS_INTEGRACION = {
+    "newmark": "Newmark-β (aceleración media, implícito)",
+    "hht": "HHT-α (implícito, disipación numérica)",
+    "diferencia_central": "Diferencia central (explícito, masa concentrada)",
+}
+ALFA_HHT_MAXIMO = 1 / 3
+# Fracción del paso crítico 2/ω_max usada por el integrador explícito
+FACTOR_SEGURIDAD_PASO_EXPLICITO = 0.9
+
+# Caché de resultados (modal, barridos) compartida por el proceso: memoria LRU + directorio en disco
+MEMORIA_MAXIMA_CACHE_RESULTADOS = 256 * 2**20
+DISCO_MAXIMO_CACHE_RESULTADOS = 2 * 2**30
+DIRECTORIO_CACHE_RESULTADOS = os.path.join(tempfile.gettempdir(), "analisis_estructural_resultados")
+
+# Puntos por elemento para dibujar la deformada de vigas y pórticos (interpolación de Hermite)
+NUM_PUNTOS_DEFORMADA = 50
+
+# Por encima de este número de nodos/elementos los gráficos de estructura no llevan etiquetas de texto
+MAX_ETIQUETAS_GRAFICO = 200
+
+# Caché de figuras de modos (PNG/SVG codificados) compartida por la UI y el reporte PDF
+MEMORIA_MAXIMA_CACHE_FIGURAS = 64 * 2**20
+DPI_FIGURAS_MODOS = 150
+
+# Hilos para generar reportes (PDF/Excel) en segundo plano, compartidos por todas las sesiones
+NUM_HILOS_REPORTES = 2
+
+# Reanálisis incremental: elementos editados admitidos antes de volver a factorizar K_uu
+MAX_ACTUALIZACIONES_INCREMENTALES = 8
+
+# Memoria máxima (bytes) de la caché LRU de factorizaciones compartida por el proceso
+MEMORIA_MAXIMA_CACHE_FACTORIZACIONES = 512 * 2**20
+
+# Matriz de masa de los elementos (paso 8)
+TIPOS_MASA = {
+    "consistente": "Consistente",
+    "concentrada": "Concentrada (diagonal, HRZ)",
+}
+# Máximo de valores (GL × pasos) guardados en las historias; por encima solo se guarda el GL seleccionado
+MAX_VALORES_HISTORIA_INTEGRACION = 5_000_000
+
+# Respuesta temporal modal: se calcula una sola vez hasta la ventana máxima del selector, con
+# NUM_PUNTOS_RESPUESTA_TEMPORAL instantes en la ventana mínima (acotado por MAX_VALORES_HISTORIA_INTEGRACION)
+NUM_PUNTOS_RESPUESTA_TEMPORAL = 1000
+VENTANA_MINIMA_RESPUESTA_TEMPORAL = 0.05
+VENTANA_MAXIMA_RESPUESTA_TEMPORAL = 1.0
+
+# Autovalores (ω²) por debajo de este valor se descartan como modos de cuerpo rígido / ruido numérico
+AUTOVALOR_MINIMO_VALIDO = 1e-9
+# Modos nulos que el redondeo aparta de cero: λ < RUIDO·eps·max(diag K)/max(diag M) seguidos de un
+# hueco espectral de al menos HUECO (factor en λ); además de los pivotes nulos de K
+RUIDO_AUTOVALOR_NULO = 100
+HUECO_ESPECTRAL_NULO = 1e3
+# Conteos de Sturm como máximo para situar el umbral de los modos nulos
+MAX_ITERACIONES_UMBRAL_NULO = 60
+
+# Métodos de extracción modal (clave interna -> etiqueta en la UI)
+METODOS_MODALES = {
+    "auto": "Automático (Lanczos en modelos dispersos, denso en modelos pequeños)",
+    "denso": "Denso simétrico (todos los modos)",
+    "lanczos": "Lanczos shift-invert (primeros k modos)",
+}
+
 
 # -----------------------------------------------------------------
 # 4. DEFINICIÓN DE FUNCIONES
@@ -626,6 +752,354 @@ def generar_matriz_transformacion_viga_portico(beta):
     ])
     return T
 
+# --- Generación de Matrices en Lote (Vectorizada) ---
+
+# Patrones constantes de las matrices elementales. Cada matriz se obtiene como
+# suma de (coeficiente por elemento) x (patrón), igual que en las funciones escalares.
+_PATRON_AXIAL_BARRA = np.array([
+    [1, 0, -1, 0],
+    [0, 0,  0, 0],
+    [-1, 0, 1, 0],
+    [0, 0,  0, 0]
+], dtype=float)
+
+# Flexión (GL v1, θ1, v2, θ2): K = 12EI/L³·P_a + 6EI/L²·P_b + 2EI/L·P_c
+_PATRON_FLEXION_A = np.array([[1, 0, -1, 0], [0, 0, 0, 0], [-1, 0, 1, 0], [0, 0, 0, 0]], dtype=float)
+_PATRON_FLEXION_B = np.array([[0, 1, 0, 1], [1, 0, -1, 0], [0, -1, 0, -1], [1, 0, -1, 0]], dtype=float)
+_PATRON_FLEXION_C = np.array([[0, 0, 0, 0], [0, 2, 0, 1], [0, 0, 0, 0], [0, 1, 0, 2]], dtype=float)
+
+_PATRON_MASA_BARRA = np.array([
+    [2, 0, 1, 0],
+    [0, 0, 0, 0],
+    [1, 0, 2, 0],
+    [0, 0, 0, 0]
+], dtype=float) / 6
+
+# Masa consistente de viga: m/420 · (P0 + L·P1 + L²·P2)
+_PATRON_MASA_VIGA_0 = np.array([[156, 0, 54, 0], [0, 0, 0, 0], [54, 0, 156, 0], [0, 0, 0, 0]], dtype=float) / 420
+_PATRON_MASA_VIGA_1 = np.array([[0, 22, 0, -13], [22, 0, 13, 0], [0, 13, 0, -22], [-13, 0, -22, 0]], dtype=float) / 420
+_PATRON_MASA_VIGA_2 = np.array([[0, 0, 0, 0], [0, 4, 0, -3], [0, 0, 0, 0], [0, -3, 0, 4]], dtype=float) / 420
+
+# Masa concentrada (diagonal, HRZ): m/2 por nudo en traslación y m·L²/78 en giro.
+# La barra recibe m/2 en ambas direcciones (invariante ante la rotación)
+_PATRON_MASA_CONCENTRADA_BARRA = np.eye(4) / 2
+_PATRON_MASA_CONCENTRADA_VIGA_0 = np.diag([1, 0, 1, 0]) / 2
+_PATRON_MASA_CONCENTRADA_VIGA_2 = np.diag([0, 1, 0, 1]) / 78
+
+# Posiciones de los GL de flexión y axiales dentro de la matriz 6x6 del pórtico
+_GL_FLEXION_PORTICO = [1, 2, 4, 5]
+_GL_AXIAL_PORTICO = [0, 3]
+
+def _expandir_portico(patron_flexion=None, patron_axial=None):
+    """Colocar patrones 4x4 (flexión) y 2x2 (axial) dentro de una matriz 6x6 de pórtico"""
+    patron = np.zeros((6, 6))
+    if patron_flexion is not None:
+        patron[np.ix_(_GL_FLEXION_PORTICO, _GL_FLEXION_PORTICO)] = patron_flexion
+    if patron_axial is not None:
+        patron[np.ix_(_GL_AXIAL_PORTICO, _GL_AXIAL_PORTICO)] = patron_axial
+    return patron
+
+def _combinar_patrones(coeficientes, patrones):
+    """Sumar coeficiente[n] * patrón para cada elemento -> (n_el, n, n)"""
+    return sum(np.einsum('n,ij->nij', coef, patron) for coef, patron in zip(coeficientes, patrones))
+
+def _arrays_lote(*valores):
+    """Convertir escalares/listas a arrays float 1D con la misma longitud"""
+    return np.broadcast_arrays(*(np.atleast_1d(np.asarray(v, dtype=float)) for v in valores))
+
+def generar_matrices_transformacion_lote(tipo_elemento, beta):
+    """Generar las matrices de transformación T (n_el, n, n) de todos los elementos"""
+    beta, = _arrays_lote(beta)
+    n_el = beta.shape[0]
+    c, s = np.cos(beta), np.sin(beta)
+
+    if tipo_elemento == "viga":
+        return np.broadcast_to(np.eye(4), (n_el, 4, 4)).copy()
+
+    n_loc, gl_por_nodo = (4, 2) if tipo_elemento == "barra" else (6, 3)
+    T = np.zeros((n_el, n_loc, n_loc))
+    for k in (0, gl_por_nodo):
+        T[:, k, k] = c
+        T[:, k, k + 1] = s
+        T[:, k + 1, k] = -s
+        T[:, k + 1, k + 1] = c
+        if gl_por_nodo == 3:
+            T[:, k + 2, k + 2] = 1.0
+    return T
+
+def generar_matrices_rigidez_lote(tipo_elemento, E, A, I, L, beta):
+    """
+    Versión vectorizada de generar_matriz_rigidez_barra/_viga/_viga_portico.
+
+    Args:
+        tipo_elemento (str): "barra", "viga" o "viga_portico".
+        E, A, I, L, beta: Escalares o arrays (n_el,) con las propiedades de cada elemento.
+    Returns:
+        tuple: (k_global, k_local), arrays (n_el, n, n). k_global = Tᵀ k_local T en un solo einsum.
+    """
+    E, A, I, L, beta = _arrays_lote(E, A, I, L, beta)
+
+    if tipo_elemento == "barra":
+        k_local = _combinar_patrones([E * A / L], [_PATRON_AXIAL_BARRA])
+    else:
+        coef_flexion = [12 * E * I / L**3, 6 * E * I / L**2, 2 * E * I / L]
+        if tipo_elemento == "viga":
+            return (_combinar_patrones(coef_flexion, [_PATRON_FLEXION_A, _PATRON_FLEXION_B, _PATRON_FLEXION_C]),) * 2
+        patrones = [_expandir_portico(_PATRON_FLEXION_A), _expandir_portico(_PATRON_FLEXION_B),
+                    _expandir_portico(_PATRON_FLEXION_C), _expandir_portico(patron_axial=_PATRON_AXIAL_BARRA[np.ix_([0, 2], [0, 2])])]
+        k_local = _combinar_patrones(coef_flexion + [E * A / L], patrones)
+
+    T = generar_matrices_transformacion_lote(tipo_elemento, beta)
+    k_global = np.einsum('nji,njk,nkl->nil', T, k_local, T, optimize=True)
+    return k_global, k_local
+
+def generar_matrices_masa_lote(tipo_elemento, rho, A, L, beta, concentrada=False):
+    """
+    Versión vectorizada de generar_matriz_masa_barra/_viga/_viga_portico (consistentes),
+    o matrices de masa concentrada (diagonales) con concentrada=True.
+
+    Returns:
+        tuple: (m_global, m_local), arrays (n_el, n, n). Igual que en el cálculo por elemento,
+               solo el pórtico se rota (Tᵀ m T); barra y viga usan la matriz local.
+    """
+    rho, A, L, beta = _arrays_lote(rho, A, L, beta)
+    m = rho * A * L
+
+    if concentrada:
+        if tipo_elemento == "barra":
+            m_local = _combinar_patrones([m], [_PATRON_MASA_CONCENTRADA_BARRA])
+            return m_local, m_local
+        if tipo_elemento == "viga":
+            m_local = _combinar_patrones([m, m * L**2], [_PATRON_MASA_CONCENTRADA_VIGA_0, _PATRON_MASA_CONCENTRADA_VIGA_2])
+            return m_local, m_local
+        # Traslaciones iguales en x e y: la matriz diagonal es invariante ante la rotación (Tᵀ m T = m)
+        patrones = [_expandir_portico(_PATRON_MASA_CONCENTRADA_VIGA_0), _expandir_portico(_PATRON_MASA_CONCENTRADA_VIGA_2),
+                    _expandir_portico(patron_axial=np.eye(2) / 2)]
+        m_local = _combinar_patrones([m, m * L**2, m], patrones)
+        return m_local, m_local
+
+    if tipo_elemento == "barra":
+        m_local = _combinar_patrones([m], [_PATRON_MASA_BARRA])
+        return m_local, m_local
+    if tipo_elemento == "viga":
+        m_local = _combinar_patrones([m, m * L, m * L**2], [_PATRON_MASA_VIGA_0, _PATRON_MASA_VIGA_1, _PATRON_MASA_VIGA_2])
+        return m_local, m_local
+
+    # Pórtico: flexión consistente (m/420) + axial (m/3, m/6)
+    patrones = [_expandir_portico(_PATRON_MASA_VIGA_0), _expandir_portico(_PATRON_MASA_VIGA_1),
+                _expandir_portico(_PATRON_MASA_VIGA_2), _expandir_portico(patron_axial=np.array([[1/3, 1/6], [1/6, 1/3]]))]
+    m_local = _combinar_patrones([m, m * L, m * L**2, m], patrones)
+    T = generar_matrices_transformacion_lote(tipo_elemento, beta)
+    m_global = np.einsum('nji,njk,nkl->nil', T, m_local, T, optimize=True)
+    return m_global, m_local
+
+# --- Almacén de Matrices de Elementos ---
+
+class AlmacenMatricesElementos:
+    """
+    Almacén de las matrices elementales en arrays float64 contiguos (n_el, n, n),
+    uno por clave ('numerica', 'local', 'masa_global', 'masa_local'), indexados por fila.
+
+    Conserva la interfaz de diccionario que usaba st.session_state.matrices_elementos
+    ({id: {'numerica': ..., ...}}), pero devuelve vistas de los arrays en vez de listas anidadas.
+    """
+    CLAVES = ('numerica', 'local', 'masa_global', 'masa_local')
+
+    def __init__(self):
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.fila_por_id = {}
+        self.arrays = {}
+        self.tiene_masa = np.zeros(0, dtype=bool)
+        self.num_filas = 0
+
+    def __len__(self):
+        return self.num_filas
+
+    def __contains__(self, elem_id):
+        return elem_id in self.fila_por_id
+
+    def __getitem__(self, elem_id):
+        fila = self.fila_por_id[elem_id]
+        matrices = {clave: self.arrays[clave][fila] for clave in self.CLAVES}
+        if not self.tiene_masa[fila]:
+            # Análisis estático: sin matrices de masa (antes se guardaban como [])
+            matrices['masa_global'] = np.zeros(0)
+            matrices['masa_local'] = np.zeros(0)
+        return matrices
+
+    def get(self, elem_id, default=None):
+        return self[elem_id] if elem_id in self.fila_por_id else default
+
+    def keys(self):
+        return list(self.ids[:self.num_filas])
+
+    def items(self):
+        for elem_id in self.ids[:self.num_filas]:
+            yield int(elem_id), self[int(elem_id)]
+
+    def _reservar(self, capacidad, n_loc):
+        """Ampliar (o crear) los arrays para al menos 'capacidad' filas de n_loc x n_loc"""
+        actual = self.ids.shape[0]
+        if capacidad <= actual and self.arrays:
+            return
+        nueva = max(capacidad, 2 * actual, 16)
+        for clave in self.CLAVES:
+            nuevo_array = np.zeros((nueva, n_loc, n_loc))
+            if clave in self.arrays:
+                nuevo_array[:self.num_filas] = self.arrays[clave][:self.num_filas]
+            self.arrays[clave] = nuevo_array
+        self.ids = np.concatenate([self.ids[:self.num_filas], np.zeros(nueva - self.num_filas, dtype=np.int64)])
+        self.tiene_masa = np.concatenate([self.tiene_masa[:self.num_filas], np.zeros(nueva - self.num_filas, dtype=bool)])
+
+    def actualizar(self, ids, k_global, k_local, m_global=None, m_local=None):
+        """Escribir en bloque las matrices (n_el, n, n) de los elementos 'ids' (nuevos o existentes)"""
+        ids = [int(i) for i in ids]
+        n_loc = k_global.shape[1]
+        if self.arrays and self.arrays['numerica'].shape[1] != n_loc:
+            # Cambió el tipo de elemento: se descarta el contenido anterior (antes de buscar ids nuevos)
+            self.__init__()
+        nuevos = [i for i in dict.fromkeys(ids) if i not in self.fila_por_id]
+        self._reservar(self.num_filas + len(nuevos), n_loc)
+        for elem_id in nuevos:
+            self.fila_por_id[elem_id] = self.num_filas
+            self.ids[self.num_filas] = elem_id
+            self.num_filas += 1
+
+        filas = self.filas(ids)
+        self.arrays['numerica'][filas] = k_global
+        self.arrays['local'][filas] = k_local
+        self.tiene_masa[filas] = m_global is not None
+        self.arrays['masa_global'][filas] = m_global if m_global is not None else 0.0
+        self.arrays['masa_local'][filas] = m_local if m_local is not None else 0.0
+
+    def filas(self, ids):
+        """Filas del almacén (array de enteros) correspondientes a los ids de elemento"""
+        return np.fromiter((self.fila_por_id[int(i)] for i in ids), dtype=np.int64, count=len(ids))
+
+    def matrices(self, clave, filas=None):
+        """
+        Matrices apiladas de 'clave'. Sin 'filas' (o si son 0..n-1 en orden) devuelve una vista
+        sin copia; con filas arbitrarias devuelve una copia contigua.
+        """
+        if filas is None or (len(filas) == self.num_filas and np.array_equal(filas, np.arange(self.num_filas))):
+            return self.arrays[clave][:self.num_filas]
+        return self.arrays[clave][filas]
+
+# --- Modelo Estructural (Tablas de Nodos y Elementos) ---
+
+class ModeloEstructural:
+    """
+    Vista en columnas NumPy (estructura de arrays) de los nodos y elementos de la sesión.
+
+    Columnas de nodos: x, y, tipo (0 libre / 1 fijo) y tabla_gl (n_nodos, gl_por_nodo) con el
+    número de GL (0 si el GL no existe). Columnas de elementos: conectividad (filas de nodo),
+    material_idx, tipo_seccion_idx, parametros_seccion (n_el, len(PARAMETROS_SECCION)), area,
+    inercia, densidad, modulo_young, longitud y beta.
+    Los índices id -> fila dan búsquedas O(1) y los adaptadores nodo()/elemento()/extremos()
+    devuelven los diccionarios originales para el código de UI existente.
+
+    Es un índice por llamada: obtener_modelo_estructural() lo reconstruye (O(N + E)) desde las
+    listas de la sesión, que siguen siendo la fuente de verdad, así nunca queda desactualizado.
+    """
+    TIPOS_NODO = {'libre': 0, 'fijo': 1}
+    PARAMETROS_SECCION = ('radio', 'radio_ext', 'radio_int', 'lado1', 'lado2', 'lado', 'area', 'inercia')
+
+    def __init__(self, nodos, elementos, tipo_elemento=None, grados_libertad_info=None):
+        self.nodos = nodos
+        self.elementos = elementos
+
+        # --- Nodos ---
+        self.nodo_ids = np.array([n['id'] for n in nodos], dtype=np.int64)
+        self.fila_nodo = {n['id']: i for i, n in enumerate(nodos)}
+        self.x = np.array([n['x'] for n in nodos], dtype=float)
+        self.y = np.array([n['y'] for n in nodos], dtype=float)
+        self.tipo = np.array([self.TIPOS_NODO.get(n.get('tipo', 'libre'), 0) for n in nodos], dtype=np.int8)
+
+        # --- Elementos ---
+        self.elemento_ids = np.array([e['id'] for e in elementos], dtype=np.int64)
+        self.fila_elemento = {e['id']: i for i, e in enumerate(elementos)}
+        self.conectividad = np.array(
+            [[self.fila_nodo.get(e['nodo_inicio'], -1), self.fila_nodo.get(e['nodo_fin'], -1)] for e in elementos],
+            dtype=np.int64
+        ).reshape(-1, 2)
+
+        self.materiales = sorted({e['material'] for e in elementos if e.get('material') is not None})
+        indice_material = {nombre: i for i, nombre in enumerate(self.materiales)}
+        self.material_idx = np.array([indice_material.get(e.get('material'), -1) for e in elementos], dtype=np.int64)
+
+        self.tipos_seccion = sorted({e['tipo_seccion'] for e in elementos if e.get('tipo_seccion') is not None})
+        indice_seccion = {nombre: i for i, nombre in enumerate(self.tipos_seccion)}
+        self.tipo_seccion_idx = np.array([indice_seccion.get(e.get('tipo_seccion'), -1) for e in elementos], dtype=np.int64)
+        self.parametros_seccion = np.array(
+            [[(e.get('parametros_seccion') or {}).get(p, np.nan) for p in self.PARAMETROS_SECCION] for e in elementos],
+            dtype=float
+        ).reshape(-1, len(self.PARAMETROS_SECCION))
+
+        def columna(clave):
+            return np.array([e[clave] if e.get(clave) is not None else np.nan for e in elementos], dtype=float)
+
+        self.area = columna('area')
+        self.inercia = columna('inercia')
+        self.densidad = columna('densidad')
+        self.modulo_young = columna('modulo_young')
+        self.longitud = columna('longitud')
+        self.beta = columna('beta')
+
+        # --- Tabla de GL (número de GL por nodo y dirección; 0 = sin GL) ---
+        self.direcciones = DIRECCIONES_GL.get(tipo_elemento, DIRECCIONES_GL["viga_portico"])
+        self.gl_por_nodo = len(self.direcciones)
+        self.tabla_gl = np.zeros((len(nodos), self.gl_por_nodo), dtype=np.int64)
+        self.indice_direccion = {d.lower(): j for j, d in enumerate(self.direcciones)}
+        for info in grados_libertad_info or []:
+            fila = self.fila_nodo.get(info['nodo'])
+            if fila is not None and info['numero'] is not None:
+                self.tabla_gl[fila, self.indice_direccion[info['direccion'].lower()]] = info['numero']
+
+    @property
+    def num_nodos(self):
+        return len(self.nodos)
+
+    @property
+    def num_elementos(self):
+        return len(self.elementos)
+
+    def nodo(self, nodo_id):
+        """Diccionario del nodo con ese id (o None)"""
+        fila = self.fila_nodo.get(nodo_id)
+        return self.nodos[fila] if fila is not None else None
+
+    def elemento(self, elemento_id):
+        """Diccionario del elemento con ese id (o None)"""
+        fila = self.fila_elemento.get(elemento_id)
+        return self.elementos[fila] if fila is not None else None
+
+    def extremos(self, elemento):
+        """Diccionarios (nodo_inicio, nodo_fin) de un elemento"""
+        return self.nodo(elemento['nodo_inicio']), self.nodo(elemento['nodo_fin'])
+
+    def filas_extremos(self, elementos):
+        """Filas de nodo (inicio, fin) para una lista de elementos (dicts)"""
+        filas = [[self.fila_nodo[e['nodo_inicio']], self.fila_nodo[e['nodo_fin']]] for e in elementos]
+        return np.array(filas, dtype=np.int64).reshape(-1, 2)
+
+    def gl_nodo(self, nodo_id, direccion):
+        """Número de GL del nodo en la dirección dada (None si no existe)"""
+        fila = self.fila_nodo.get(nodo_id)
+        columna = self.indice_direccion.get(direccion.lower())
+        if fila is None or columna is None:
+            return None
+        gl = int(self.tabla_gl[fila, columna])
+        return gl if gl > 0 else None
+
+def obtener_modelo_estructural():
+    """Construir el ModeloEstructural (O(N + E)) a partir del estado actual de la sesión"""
+    return ModeloEstructural(
+        st.session_state.nodos,
+        st.session_state.elementos,
+        st.session_state.tipo_elemento,
+        st.session_state.grados_libertad_info
+    )
+
 # --- Funciones de Geometría y Ensamblaje ---
 
 def calcular_grados_libertad_globales(nodo_id):
@@ -693,6 +1167,74 @@ def calcular_momento_inercia(tipo_seccion, parametros):
     else:
         return parametros.get("inercia", 1e-6)
 
+def obtener_modulo_young(elemento):
+    """Obtener el módulo de Young del elemento (valor asignado o el de su material)"""
+    if elemento.get('modulo_young') is not None:
+        return elemento['modulo_young']
+    todos_materiales = {**MATERIALES_AEROESPACIALES, **st.session_state.materiales_personalizados}
+    return todos_materiales.get(elemento.get('material'), {}).get('modulo_young', 0.0)
+
+def recalcular_matrices_elementos(elementos):
+    """
+    Recalcular en lote la geometría (L, β) y las matrices K y M de los elementos dados,
+    guardándolas en st.session_state.matrices_elementos.
+
+    Los elementos deben tener ya 'area', 'inercia' y (en dinámico) 'densidad'.
+    """
+    if not elementos:
+        return
+
+    modelo = obtener_modelo_estructural()
+    extremos = modelo.filas_extremos(elementos)
+
+    dx = modelo.x[extremos[:, 1]] - modelo.x[extremos[:, 0]]
+    dy = modelo.y[extremos[:, 1]] - modelo.y[extremos[:, 0]]
+    L = np.hypot(dx, dy)
+    beta = np.arctan2(dy, dx)
+
+    E = np.array([obtener_modulo_young(e) for e in elementos], dtype=float)
+    A = np.array([e.get('area', 0.0) for e in elementos], dtype=float)
+    I = np.array([e.get('inercia', 0.0) for e in elementos], dtype=float)
+
+    k_global, k_local = generar_matrices_rigidez_lote(st.session_state.tipo_elemento, E, A, I, L, beta)
+    m_global, m_local = None, None
+    if st.session_state.tipo_analisis == "dinamico":
+        rho = np.array([e.get('densidad', 0.0) for e in elementos], dtype=float)
+        m_global, m_local = generar_matrices_masa_lote(st.session_state.tipo_elemento, rho, A, L, beta,
+                                                       concentrada=st.session_state.get('tipo_masa') == "concentrada")
+
+    for k, elem in enumerate(elementos):
+        elem['longitud'] = float(L[k])
+        elem['beta'] = float(beta[k])
+
+    registrar_modificaciones_elementos(elementos, k_global)
+    st.session_state.matrices_elementos.actualizar([e['id'] for e in elementos], k_global, k_local, m_global, m_local)
+
+def registrar_modificaciones_elementos(elementos, k_global_nuevas):
+    """
+    Guardar ΔK_e = k_nueva - k_anterior (rango ≤ 6) de los elementos recalculados para el
+    reanálisis incremental (Sherman–Morrison–Woodbury sobre la factorización base).
+    Si se supera el máximo de actualizaciones, o un elemento no tiene GL asignados, se descarta
+    la base y el siguiente cálculo refactoriza.
+    """
+    if not st.session_state.get('analisis_incremental') or st.session_state.get('base_incremental') is None:
+        return
+    almacen = st.session_state.matrices_elementos
+    modificaciones = st.session_state.modificaciones_elementos
+    n_loc = k_global_nuevas.shape[1]
+    if (len(modificaciones) + len(elementos) > st.session_state.max_actualizaciones_incrementales
+            or (almacen.arrays and almacen.arrays['numerica'].shape[1] != n_loc)
+            or any(len(e.get('grados_libertad_global', [])) != n_loc for e in elementos)):
+        st.session_state.base_incremental = None
+        modificaciones.clear()
+        return
+
+    for elem, k_nueva in zip(elementos, k_global_nuevas):
+        k_anterior = almacen[elem['id']]['numerica'] if elem['id'] in almacen else np.zeros_like(k_nueva)
+        delta_k = k_nueva - k_anterior
+        if np.any(delta_k):
+            modificaciones.append({'gl': np.asarray(elem['grados_libertad_global'], dtype=np.int64) - 1, 'delta_k': delta_k})
+
 def calcular_y_asignar_grados_libertad():
     """Calcula los grados de libertad globales y la información de GL para todos los nodos y elementos."""
     st.session_state.grados_libertad_info = []
@@ -714,12 +1256,7 @@ def calcular_y_asignar_grados_libertad():
         
         gl_indices = []
         
-        if st.session_state.tipo_elemento == "barra":
-            gl_nombres = ['X', 'Y']
-        elif st.session_state.tipo_elemento == "viga":
-            gl_nombres = ['Y', 'Theta']
-        else: # viga_portico
-            gl_nombres = ['X', 'Y', 'Theta']
+        gl_nombres = DIRECCIONES_GL.get(st.session_state.tipo_elemento, DIRECCIONES_GL["viga_portico"])
         
         for i in range(gl_por_nodo):
             gl_nombre = gl_nombres[i]
@@ -766,33 +1303,1043 @@ def calcular_y_asignar_grados_libertad():
 
     # Filtrar solo los GL libres (no nulos) para la lista oficial
     st.session_state.grados_libertad_info = [info for info in all_gl_info if info['numero'] is not None]
-    
-def resolver_sistema_dinamico():
-    """Resolver el problema de autovalores para análisis dinámico"""
+
+    # Orden interno de resolución (los números de GL del usuario no cambian)
+    st.session_state.rango_gl_rcm = calcular_rango_gl_rcm() if st.session_state.get('renumeracion_rcm') else None
+
+def calcular_rango_gl_rcm():
+    """
+    Renumeración Cuthill-McKee inversa sobre el grafo de conectividad de nodos.
+
+    Returns:
+        np.ndarray: rango[gl - 1] = posición del GL (base-0) en el orden RCM,
+                    o None si no hay GL que renumerar.
+    """
+    modelo = obtener_modelo_estructural()
+    num_gl = len(st.session_state.grados_libertad_info)
+    if num_gl == 0 or modelo.num_nodos == 0:
+        return None
+
+    conectividad = modelo.conectividad[(modelo.conectividad >= 0).all(axis=1)]
+    grafo = sparse.coo_matrix(
+        (np.ones(len(conectividad)), (conectividad[:, 0], conectividad[:, 1])),
+        shape=(modelo.num_nodos, modelo.num_nodos)
+    ).tocsr()
+    orden_nodos = reverse_cuthill_mckee((grafo + grafo.T).tocsr(), symmetric_mode=True)
+
+    # Expandir el orden de nodos a GL (0 = GL inexistente en nodos fijos)
+    gl_ordenados = modelo.tabla_gl[orden_nodos].ravel()
+    gl_ordenados = gl_ordenados[gl_ordenados > 0] - 1
+    rango = np.empty(num_gl, dtype=np.int64)
+    rango[gl_ordenados] = np.arange(len(gl_ordenados))
+    return rango
+
+def preparar_ensamblaje(claves):
+    """
+    Reunir las matrices de los elementos desde el almacén y precalcular sus índices de dispersión.
+
+    Args:
+        claves (list): Claves de st.session_state.matrices_elementos a ensamblar
+                       (ej: ['numerica'] o ['numerica', 'masa_global']).
+    Returns:
+        dict: {'indices': (n_el, n_loc) GL base-0, clave: (n_el, n_loc, n_loc)}
+              o None si no hay elementos ensamblables.
+    """
+    almacen = st.session_state.matrices_elementos
+    if len(almacen) == 0:
+        return None
+    n_loc = almacen.arrays['numerica'].shape[1]
+    requiere_masa = any(clave.startswith('masa') for clave in claves)
+
+    ids_validos = []
+    indices = []
+    for elemento in st.session_state.elementos:
+        if elemento['id'] not in almacen:
+            continue
+        gl = elemento['grados_libertad_global']
+        sin_masa = requiere_masa and not almacen.tiene_masa[almacen.fila_por_id[elemento['id']]]
+        if len(gl) != n_loc or sin_masa:
+            st.error(f"Error en Elemento {elemento['id']}: Inconsistencia de GL. Matriz tiene {0 if sin_masa else n_loc} GLs pero el elemento tiene {len(gl)} GLs libres.")
+            continue
+        ids_validos.append(elemento['id'])
+        indices.append(gl)
+
+    if not indices:
+        return None
+
+    filas = almacen.filas(ids_validos)
+    ensamblaje = {'indices': np.asarray(indices, dtype=np.int64) - 1}
+    for clave in claves:
+        ensamblaje[clave] = almacen.matrices(clave, filas)
+    return ensamblaje
+
+def ensamblar_matriz_global(matrices, indices, num_gl, disperso=None):
+    """
+    Ensambla una matriz global (K o M) en un único paso vectorizado.
+
+    Construye los tripletes COO (fila, columna, valor) de todos los elementos a la vez.
+    Si 'disperso' es None, se usa CSR cuando num_gl supera UMBRAL_GL_ENSAMBLAJE_DISPERSO;
+    para modelos pequeños se mantiene la matriz densa.
+    """
+    if disperso is None:
+        disperso = num_gl > UMBRAL_GL_ENSAMBLAJE_DISPERSO
+
+    n_el, n_loc = indices.shape
+    filas = np.repeat(indices, n_loc, axis=1).ravel()
+    columnas = np.tile(indices, (1, n_loc)).ravel()
+    valores = matrices.reshape(n_el, n_loc * n_loc).ravel()
+
+    if disperso:
+        # coo -> csr suma los tripletes duplicados (GL compartidos entre elementos)
+        return sparse.coo_matrix((valores, (filas, columnas)), shape=(num_gl, num_gl)).tocsr()
+
+    matriz = np.zeros((num_gl, num_gl))
+    np.add.at(matriz, (filas, columnas), valores)
+    return matriz
+
+def extraer_submatriz(matriz, filas, columnas):
+    """Extraer la submatriz (filas, columnas) de una matriz densa o dispersa"""
+    if sparse.issparse(matriz):
+        return matriz[filas, :][:, columnas].tocsr()
+    return matriz[np.ix_(filas, columnas)]
+
+def matriz_densa(matriz):
+    """Devolver la matriz como ndarray denso (para solvers densos)"""
+    if sparse.issparse(matriz):
+        return matriz.toarray()
+    return np.asarray(matriz)
+
+def iterar_filas_densas(matriz):
+    """Recorrer las filas de una matriz densa o dispersa como arrays densos (para reportes)"""
+    if sparse.issparse(matriz):
+        matriz = matriz.tocsr()
+        for i in range(matriz.shape[0]):
+            yield matriz.getrow(i).toarray().ravel()
+    else:
+        for fila in matriz:
+            yield np.asarray(fila)
+
+def resolver_sistema_lineal(A, b):
+    """
+    Resolver A x = b con la matriz densa o dispersa.
+    Lanza np.linalg.LinAlgError si la matriz es singular en ambos casos.
+    """
+    if sparse.issparse(A):
+        x = spsolve(A.tocsc(), b)
+        if not np.all(np.isfinite(x)):
+            raise np.linalg.LinAlgError("Matriz singular")
+        return x
+    return np.linalg.solve(A, b)
+
+# --- Renumeración de GL y Solvers Simétricos (Banda / Disperso / Denso) ---
+
+def obtener_permutacion_gl(indices_gl):
+    """
+    Permutación local (orden RCM) de un subconjunto de GL base-0, o None si la renumeración
+    está desactivada. La matriz permutada es A[perm][:, perm].
+    """
+    rango = st.session_state.get('rango_gl_rcm')
+    indices_gl = np.asarray(indices_gl, dtype=np.int64)
+    if rango is None or len(indices_gl) == 0 or indices_gl.max() >= len(rango):
+        return None
+    return np.argsort(rango[indices_gl], kind='stable')
+
+def _posiciones_permutadas(n, permutacion):
+    """Nueva posición de cada índice local tras aplicar la permutación"""
+    if permutacion is None:
+        return np.arange(n)
+    posiciones = np.empty(n, dtype=np.int64)
+    posiciones[permutacion] = np.arange(n)
+    return posiciones
+
+def ancho_banda(matriz, permutacion=None):
+    """Semiancho de banda max|i - j| de los no nulos (tras la permutación opcional)"""
+    coo = sparse.coo_matrix(matriz)
+    if coo.nnz == 0:
+        return 0
+    posiciones = _posiciones_permutadas(coo.shape[0], permutacion)
+    return int(np.max(np.abs(posiciones[coo.row] - posiciones[coo.col])))
+
+def usar_almacenamiento_banda(matriz, permutacion=None):
+    """Decidir si la matriz (dispersa) tiene un perfil lo bastante estrecho para el solver en banda"""
+    if not sparse.issparse(matriz):
+        return False
+    n = matriz.shape[0]
+    return (ancho_banda(matriz, permutacion) + 1) <= FRACCION_ANCHO_BANDA_MAXIMA * n
+
+def matriz_banda_inferior(matriz, permutacion=None):
+    """Almacenamiento en banda inferior (formato LAPACK) ab[i - j, j] = a[i, j], i >= j"""
+    coo = sparse.coo_matrix(matriz)
+    coo.sum_duplicates()
+    posiciones = _posiciones_permutadas(coo.shape[0], permutacion)
+    filas, columnas = posiciones[coo.row], posiciones[coo.col]
+    inferior = filas >= columnas
+    b = int(np.max(filas[inferior] - columnas[inferior])) if np.any(inferior) else 0
+    ab = np.zeros((b + 1, coo.shape[0]))
+    ab[filas[inferior] - columnas[inferior], columnas[inferior]] = coo.data[inferior]
+    return ab
+
+def factorizar_matriz_simetrica(A, permutacion=None):
+    """
+    Factorizar una vez una matriz simétrica (K_uu, K_libre) y devolver su resolvedor.
+
+    - 'banda': Cholesky en banda (O(n·b²)) si el perfil (con la permutación RCM) es estrecho.
+    - 'dispersa': LU dispersa (SuperLU) si no es definida positiva o la banda es ancha.
+    - 'densa': Cholesky densa (cho_factor) para modelos pequeños; LU si no es definida positiva.
+
+    Returns:
+        dict: {'tipo', 'n', 'ancho_banda', 'memoria' (bytes), 'resolver': f(b) -> x, 'pivotes': f() -> d}.
+              'resolver' lanza np.linalg.LinAlgError si la matriz es singular; el producto de
+              |d| es |det A| (ver log10_determinante).
+    """
+    n = A.shape[0]
+    if not sparse.issparse(A):
+        A = np.asarray(A, dtype=float)
+        try:
+            factor_cholesky = cho_factor(A, lower=True)
+            return {'tipo': 'densa', 'n': n, 'ancho_banda': None, 'memoria': factor_cholesky[0].nbytes,
+                    'resolver': lambda b: cho_solve(factor_cholesky, np.asarray(b, dtype=float)),
+                    'pivotes': lambda: np.diag(factor_cholesky[0])**2}
+        except np.linalg.LinAlgError:
+            pass  # No definida positiva: LU densa
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")  # LinAlgWarning de pivote nulo: se informa al resolver
+            factor_denso = lu_factor(A)
+        singular = n > 0 and not np.all(np.diag(factor_denso[0]))
+
+        def resolver_denso(b):
+            if singular:
+                raise np.linalg.LinAlgError("Matriz singular")
+            return lu_solve(factor_denso, np.asarray(b, dtype=float))
+
+        return {'tipo': 'densa', 'n': n, 'ancho_banda': None, 'memoria': factor_denso[0].nbytes + factor_denso[1].nbytes,
+                'resolver': resolver_denso, 'pivotes': lambda: np.diag(factor_denso[0])}
+
+    if usar_almacenamiento_banda(A, permutacion):
+        ab = matriz_banda_inferior(A, permutacion)
+        try:
+            factor_banda = cholesky_banded(ab, lower=True)
+        except np.linalg.LinAlgError:
+            factor_banda = None  # No definida positiva: se recurre a LU dispersa
+
+        if factor_banda is not None:
+            perm = np.arange(n) if permutacion is None else permutacion
+
+            def resolver_banda(b):
+                b = np.asarray(b, dtype=float)
+                x = np.empty_like(b)
+                x[perm], _ = dpbtrs(factor_banda, b[perm], lower=1)  # sustitución triangular (LAPACK directo)
+                return x
+
+            return {'tipo': 'banda', 'n': n, 'ancho_banda': ab.shape[0] - 1, 'memoria': factor_banda.nbytes + perm.nbytes,
+                    'resolver': resolver_banda, 'pivotes': lambda: factor_banda[0]**2}
+
+    try:
+        factor_lu = splu(A.tocsc())
+    except RuntimeError as e:  # SuperLU: "Factor is exactly singular"
+        raise np.linalg.LinAlgError(str(e))
+
+    def resolver_disperso(b):
+        x = factor_lu.solve(np.asarray(b, dtype=float))
+        if not np.all(np.isfinite(x)):
+            raise np.linalg.LinAlgError("Matriz singular")
+        return x
+
+    return {'tipo': 'dispersa', 'n': n, 'ancho_banda': None, 'memoria': factor_lu.nnz * 12 + n * 16,
+            'resolver': resolver_disperso, 'pivotes': lambda: factor_lu.U.diagonal()}
+
+def log10_determinante(factor):
+    """log10 |det A| a partir de los pivotes de la factorización (sin desbordamiento para E ~ 1e11)"""
+    with np.errstate(divide='ignore'):
+        return float(np.sum(np.log10(np.abs(factor['pivotes']()))))
+
+def estimar_condicion_1(A, factor):
+    """
+    Estimación barata de κ₁(A) = ‖A‖₁·‖A⁻¹‖₁: ‖A⁻¹‖₁ por onenormest (Higham–Tisseur) con unas
+    pocas sustituciones sobre la factorización existente (A simétrica: Aᵀ⁻¹ = A⁻¹).
+    """
+    n = A.shape[0]
+    if n == 0:
+        return float('nan')
+    norma_A = abs(A).sum(axis=0).max() if sparse.issparse(A) else np.linalg.norm(A, 1)
+    if n <= 4:
+        norma_inversa = np.linalg.norm(factor['resolver'](np.eye(n)), 1)  # onenormest requiere n > 4
+    else:
+        inversa = LinearOperator((n, n), matvec=factor['resolver'], rmatvec=factor['resolver'],
+                                 matmat=factor['resolver'], dtype=float)
+        norma_inversa = onenormest(inversa)
+    return float(norma_A * norma_inversa)
+
+# --- Caché de Factorizaciones (entre re-ejecuciones y sesiones) ---
+
+class CacheMemoriaLRU:
+    """
+    Caché LRU con memoria acotada de dicts que declaran su tamaño en la clave 'memoria'
+    (factorizaciones de factorizar_matriz_simetrica, figuras codificadas), indexada por huella.
+    Es única por proceso (st.cache_resource), por lo que se protege con un cerrojo; el
+    cálculo del valor se hace fuera del cerrojo.
+    """
+
+    def __init__(self, memoria_maxima):
+        self.memoria_maxima = memoria_maxima
+        self.entradas = OrderedDict()
+        self.memoria = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+        self.cerrojo = threading.Lock()
+
+    def obtener(self, clave, factorizar):
+        """Devolver la factorización de 'clave' o crearla con factorizar() y guardarla (LRU)"""
+        with self.cerrojo:
+            if clave in self.entradas:
+                self.entradas.move_to_end(clave)
+                self.aciertos += 1
+                return self.entradas[clave]
+            self.fallos += 1
+
+        factor = factorizar()
+        tamano = factor.get('memoria', 0)
+        with self.cerrojo:
+            if tamano <= self.memoria_maxima and clave not in self.entradas:
+                self.entradas[clave] = factor
+                self.memoria += tamano
+                while self.memoria > self.memoria_maxima:
+                    _, desalojado = self.entradas.popitem(last=False)
+                    self.memoria -= desalojado.get('memoria', 0)
+                    self.desalojos += 1
+        return factor
+
+    def contiene(self, clave):
+        with self.cerrojo:
+            return clave in self.entradas
+
+    def estadisticas(self):
+        with self.cerrojo:
+            return {'aciertos': self.aciertos, 'fallos': self.fallos, 'desalojos': self.desalojos,
+                    'entradas': len(self.entradas), 'memoria': self.memoria, 'memoria_maxima': self.memoria_maxima}
+
+@st.cache_resource
+def obtener_cache_factorizaciones():
+    """Caché de factorizaciones compartida por todas las sesiones del servidor"""
+    return CacheMemoriaLRU(MEMORIA_MAXIMA_CACHE_FACTORIZACIONES)
+
+def huella_matriz(A, *extras):
+    """Huella (blake2b) del contenido de una matriz densa o dispersa y de arrays adicionales"""
+    h = hashlib.blake2b(digest_size=16)
+    if sparse.issparse(A):
+        A = A.tocsr()
+        if not A.has_canonical_format:
+            A = A.copy()
+            A.sum_duplicates()
+        h.update(np.asarray(A.shape, dtype=np.int64).tobytes())
+        for array in (A.indptr, A.indices, A.data):
+            h.update(np.ascontiguousarray(array).tobytes())
+    else:
+        A = np.ascontiguousarray(A, dtype=float)
+        h.update(np.asarray(A.shape, dtype=np.int64).tobytes())
+        h.update(A.tobytes())
+    for extra in extras:
+        h.update(b'|' if extra is None else np.ascontiguousarray(extra).tobytes())
+    return h.hexdigest()
+
+def factorizar_con_cache(A, permutacion=None, *extras):
+    """factorizar_matriz_simetrica reutilizando la caché LRU si la matriz ya se factorizó"""
+    clave = huella_matriz(A, permutacion, *extras)
+    return obtener_cache_factorizaciones().obtener(clave, lambda: factorizar_matriz_simetrica(A, permutacion))
+
+# --- Caché de Resultados (Memoria + Disco, entre sesiones) ---
+
+def _bytes_resultado(resultado):
+    """Memoria aproximada de los arrays (densos y dispersos) de un dict de resultados"""
+    total = 0
+    for valor in resultado.values():
+        if sparse.issparse(valor):
+            valor = valor.tocsr()
+            total += valor.data.nbytes + valor.indices.nbytes + valor.indptr.nbytes
+        elif isinstance(valor, np.ndarray):
+            total += valor.nbytes
+    return total
+
+def _guardar_resultado_npz(ruta, resultado):
+    """Serializar un dict de resultados a .npz sin pickle: arrays, CSR por componentes y el resto en JSON"""
+    arrays, meta = {}, {}
+    for clave, valor in resultado.items():
+        if sparse.issparse(valor):
+            valor = valor.tocsr()
+            arrays.update({f"s__{clave}__data": valor.data, f"s__{clave}__indices": valor.indices,
+                           f"s__{clave}__indptr": valor.indptr, f"s__{clave}__shape": np.asarray(valor.shape)})
+        elif isinstance(valor, np.ndarray):
+            arrays[f"a__{clave}"] = valor
+        else:
+            meta[clave] = valor.item() if isinstance(valor, np.generic) else valor
+    temporal = ruta + ".tmp.npz"
+    np.savez(temporal, __meta__=np.asarray(json.dumps(meta)), **arrays)
+    os.replace(temporal, ruta)  # escritura atómica (varias sesiones)
+
+def _cargar_resultado_npz(ruta):
+    with np.load(ruta, allow_pickle=False) as datos:
+        resultado = json.loads(str(datos['__meta__']))
+        for nombre in datos.files:
+            if nombre.startswith("a__"):
+                resultado[nombre[3:]] = datos[nombre]
+            elif nombre.startswith("s__") and nombre.endswith("__data"):
+                clave = nombre[3:-6]
+                resultado[clave] = sparse.csr_matrix(
+                    (datos[nombre], datos[f"s__{clave}__indices"], datos[f"s__{clave}__indptr"]),
+                    shape=tuple(datos[f"s__{clave}__shape"]))
+    return resultado
+
+class CacheResultados:
+    """
+    Caché direccionada por contenido de resultados de análisis (dicts), única por proceso.
+
+    Nivel 1: LRU en memoria acotado en bytes. Al desalojar, la entrada se vuelca a un archivo
+    .npz en 'directorio' (nivel 2, acotado en bytes; se borran primero los archivos más antiguos).
+    Un fallo en memoria busca en disco y promueve la entrada.
+    """
+
+    def __init__(self, memoria_maxima, disco_maximo, directorio):
+        self.memoria_maxima = memoria_maxima
+        self.disco_maximo = disco_maximo
+        self.directorio = directorio
+        self.entradas = OrderedDict()  # clave -> (resultado, bytes)
+        self.memoria = 0
+        self.aciertos_memoria = 0
+        self.aciertos_disco = 0
+        self.fallos = 0
+        self.volcados = 0
+        self.cerrojo = threading.Lock()
+        os.makedirs(directorio, exist_ok=True)
+
+    def _ruta(self, clave):
+        return os.path.join(self.directorio, f"{clave}.npz")
+
+    def obtener(self, clave):
+        """Resultado guardado para 'clave' (copia superficial del dict) o None"""
+        with self.cerrojo:
+            if clave in self.entradas:
+                self.entradas.move_to_end(clave)
+                self.aciertos_memoria += 1
+                return dict(self.entradas[clave][0])
+            ruta = self._ruta(clave)
+            if os.path.exists(ruta):
+                try:
+                    resultado = _cargar_resultado_npz(ruta)
+                    os.utime(ruta)  # antigüedad LRU del nivel de disco
+                except (OSError, ValueError, KeyError):
+                    resultado = None
+                if resultado is not None:
+                    self.aciertos_disco += 1
+                    self._insertar(clave, resultado)
+                    return dict(resultado)
+            self.fallos += 1
+            return None
+
+    def guardar(self, clave, resultado):
+        with self.cerrojo:
+            if clave not in self.entradas:
+                self._insertar(clave, dict(resultado))
+
+    def _insertar(self, clave, resultado):
+        tamano = _bytes_resultado(resultado)
+        self.entradas[clave] = (resultado, tamano)
+        self.memoria += tamano
+        while self.memoria > self.memoria_maxima and len(self.entradas) > 1:
+            clave_vieja, (viejo, tamano_viejo) = self.entradas.popitem(last=False)
+            self.memoria -= tamano_viejo
+            self._volcar(clave_vieja, viejo)
+
+    def _volcar(self, clave, resultado):
+        """Pasar una entrada desalojada al nivel de disco y respetar su presupuesto"""
+        try:
+            if not os.path.exists(self._ruta(clave)):
+                _guardar_resultado_npz(self._ruta(clave), resultado)
+                self.volcados += 1
+            archivos = sorted((os.path.join(self.directorio, f) for f in os.listdir(self.directorio) if f.endswith(".npz")),
+                              key=os.path.getmtime)
+            ocupado = sum(os.path.getsize(f) for f in archivos)
+            while archivos and ocupado > self.disco_maximo:
+                viejo = archivos.pop(0)
+                ocupado -= os.path.getsize(viejo)
+                os.remove(viejo)
+        except (OSError, TypeError, ValueError):
+            pass  # El nivel de disco es opcional: sin espacio/permisos la caché sigue solo en memoria
+
+    def estadisticas(self):
+        with self.cerrojo:
+            try:
+                archivos = [os.path.join(self.directorio, f) for f in os.listdir(self.directorio) if f.endswith(".npz")]
+                disco = sum(os.path.getsize(f) for f in archivos)
+            except OSError:
+                archivos, disco = [], 0
+            return {'aciertos_memoria': self.aciertos_memoria, 'aciertos_disco': self.aciertos_disco,
+                    'fallos': self.fallos, 'volcados': self.volcados, 'entradas': len(self.entradas),
+                    'memoria': self.memoria, 'archivos': len(archivos), 'disco': disco}
+
+    def vaciar(self):
+        """Purgar ambos niveles"""
+        with self.cerrojo:
+            self.entradas.clear()
+            self.memoria = 0
+            try:
+                for f in os.listdir(self.directorio):
+                    if f.endswith(".npz"):
+                        os.remove(os.path.join(self.directorio, f))
+            except OSError:
+                pass
+
+@st.cache_resource
+def obtener_cache_resultados():
+    """Caché de resultados compartida por todas las sesiones del servidor"""
+    return CacheResultados(MEMORIA_MAXIMA_CACHE_RESULTADOS, DISCO_MAXIMO_CACHE_RESULTADOS, DIRECTORIO_CACHE_RESULTADOS)
+
+def _serializar_para_huella(valor):
+    """default= de json.dumps: los arrays entran por su contenido completo (str() los resume)"""
+    if isinstance(valor, np.ndarray):
+        return [str(valor.dtype), valor.shape, hashlib.blake2b(np.ascontiguousarray(valor).tobytes(), digest_size=16).hexdigest()]
+    if isinstance(valor, np.generic):
+        return valor.item()
+    return str(valor)
+
+# --- Grafo de Etapas del Análisis ---
+# Cada etapa tiene una huella = hash(nombre, huellas de sus padres, entradas propias): un cambio
+# solo invalida las etapas aguas abajo.
+ETAPAS_ANALISIS = {
+    'geometria': (),
+    'mapa_gdl': ('geometria',),
+    'matrices_elementos': ('mapa_gdl',),
+    'ensamblaje': ('matrices_elementos',),
+    'modal': ('ensamblaje',),
+    'respuesta_forzada': ('modal',),
+    'barrido': ('modal',),
+    'reportes': ('modal', 'respuesta_forzada', 'barrido'),
+}
+
+# Claves lineales en la amplitud A de la aceleración de base: se calculan con A = 1 y se escalan
+CLAVES_LINEALES_RESPUESTA_FORZADA = ('P_0_vector', 'U_x_amp_vector', 'U_y_amp_vector')
+CLAVES_LINEALES_BARRIDO = ('desplazamientos', 'aceleraciones')  # módulos: escalan con |A|
+
+def huella_etapa(nombre, padres, *entradas):
+    """Huella de una etapa a partir de las huellas de sus padres y sus entradas propias"""
+    return hashlib.blake2b(json.dumps([nombre, list(padres), entradas], sort_keys=True, default=_serializar_para_huella).encode(),
+                           digest_size=20).hexdigest()
+
+def huellas_modelo():
+    """
+    Huellas de las etapas del modelo de la sesión: geometría → mapa de GL → matrices
+    elementales (almacén, que ya incorpora material, sección y tipo de masa) → ensamblaje
+    (condiciones de contorno).
+    """
+    ss = st.session_state
+    huellas = {}
+    huellas['geometria'] = huella_etapa(
+        'geometria', [], ss.tipo_analisis, ss.tipo_elemento,
+        sorted((n['id'], float(n['x']), float(n['y']), n.get('tipo', 'libre')) for n in ss.nodos),
+        sorted((e['id'], e['nodo_inicio'], e['nodo_fin']) for e in ss.elementos))
+    huellas['mapa_gdl'] = huella_etapa(
+        'mapa_gdl', [huellas['geometria']], bool(ss.get('renumeracion_rcm')),
+        [(g['numero'], g['nodo'], g['direccion']) for g in ss.grados_libertad_info],
+        sorted((e['id'], [int(g) for g in e.get('grados_libertad_global', [])]) for e in ss.elementos))
+    almacen = ss.matrices_elementos
+    ids = sorted(e['id'] for e in ss.elementos if e['id'] in almacen)
+    contenido = hashlib.blake2b(digest_size=20)
+    if ids:
+        filas = almacen.filas(ids)
+        for clave in ('numerica', 'masa_global'):
+            contenido.update(np.ascontiguousarray(almacen.matrices(clave, filas)).tobytes())
+    huellas['matrices_elementos'] = huella_etapa('matrices_elementos', [huellas['mapa_gdl']], ids, ss.get('tipo_masa'),
+                                                 contenido.hexdigest())
+    huellas['ensamblaje'] = huella_etapa('ensamblaje', [huellas['matrices_elementos']],
+                                         sorted(int(gl) for gl, r in ss.condiciones_contorno_dinamica.items() if r))
+    return huellas
+
+def descendientes_etapa(nombre):
+    """Etapas que dependen (directa o indirectamente) de 'nombre'"""
+    resultado, pendientes = set(), [nombre]
+    while pendientes:
+        actual = pendientes.pop()
+        for etapa, padres in ETAPAS_ANALISIS.items():
+            if actual in padres and etapa not in resultado:
+                resultado.add(etapa)
+                pendientes.append(etapa)
+    return resultado
+
+def invalidar_etapa(nombre):
+    """Descartar el resultado guardado de una etapa y de todas las que dependen de ella"""
+    for etapa in {nombre} | descendientes_etapa(nombre):
+        st.session_state.etapas_analisis.pop(etapa, None)
+
+def obtener_etapa(nombre, padres, huella=None):
+    """
+    Entrada guardada {'huella', 'padres', 'valor'} de una etapa de la sesión, o None.
+    Si las huellas de los padres cambiaron la etapa (y sus descendientes) se invalida; con
+    'huella' se exige además que coincidan sus entradas propias.
+    """
+    entrada = st.session_state.etapas_analisis.get(nombre)
+    if entrada is None:
+        return None
+    if entrada['padres'] != list(padres):
+        invalidar_etapa(nombre)
+        return None
+    if huella is not None and entrada['huella'] != huella:
+        return None
+    return entrada
+
+def guardar_etapa(nombre, padres, huella, valor):
+    """Guardar el resultado de una etapa; sus descendientes quedan invalidados"""
+    for etapa in descendientes_etapa(nombre):
+        st.session_state.etapas_analisis.pop(etapa, None)
+    st.session_state.etapas_analisis[nombre] = {'huella': huella, 'padres': list(padres), 'valor': valor}
+
+def escalar_resultado_lineal(resultado, factor, claves):
+    """Copia de un resultado con las claves lineales en la amplitud multiplicadas por 'factor'"""
+    if resultado is None:
+        return None
+    escalado = dict(resultado)
+    for clave in claves:
+        escalado[clave] = resultado[clave] * factor
+    return escalado
+
+def etapa_respuesta_forzada(resultados_modales, carga_info):
+    """
+    Respuesta armónica estacionaria (etapa 'respuesta_forzada') para amplitud unitaria.
+    Solo depende de la huella modal, ω y los GL de base: cambiar A no recalcula (se escala).
+    """
+    padres = [resultados_modales['huella']]
+    huella = huella_etapa('respuesta_forzada', padres, float(carga_info['freq_omega']),
+                          sorted(int(g) for g in carga_info['gdl_aplicados_nums']))
+    entrada = obtener_etapa('respuesta_forzada', padres, huella)
+    if entrada is None:
+        unitaria = calcular_respuesta_armonica_base(resultados_modales, {**carga_info, 'amplitud_A': 1.0})
+        if unitaria is None:
+            return None
+        unitaria['huella'] = huella
+        guardar_etapa('respuesta_forzada', padres, huella, unitaria)
+        entrada = st.session_state.etapas_analisis['respuesta_forzada']
+    return entrada['valor']
+
+def etapa_barrido(resultados_modales, carga_info, f_min, f_max, num_puntos, gdl_base, **opciones):
+    """
+    Barrido en frecuencia (etapa 'barrido') para amplitud unitaria, a través de la caché de
+    resultados. Los módulos de la respuesta se escalan luego con |A|.
+    """
+    padres = [resultados_modales['huella']]
+    huella = huella_etapa('barrido', padres, f_min, f_max, num_puntos, sorted(int(g) for g in gdl_base),
+                          {k: v for k, v in opciones.items() if k not in ('num_trabajadores', 'tamano_tramo')})
+    entrada = obtener_etapa('barrido', padres, huella)
+    if entrada is None:
+        unitario = calcular_barrido_frecuencia_cacheado(resultados_modales, {**carga_info, 'amplitud_A': 1.0},
+                                                        f_min, f_max, num_puntos, gdl_base, **opciones)
+        if unitario is None:
+            return None
+        guardar_etapa('barrido', padres, huella, unitario)
+        entrada = st.session_state.etapas_analisis['barrido']
+    return entrada['valor']
+
+def resolver_sistema_dinamico_cacheado(**parametros):
+    """resolver_sistema_dinamico() a través de la caché de resultados; el dict lleva su 'huella' (etapa modal)"""
+    huella_ensamblaje = huellas_modelo()['ensamblaje']
+    huella = huella_etapa('modal', [huella_ensamblaje], parametros)
+    cache = obtener_cache_resultados()
+    resultado = cache.obtener(huella)
+    if resultado is None:
+        resultado = resolver_sistema_dinamico(**parametros)
+        if resultado and resultado.get('exito'):
+            resultado['huella'] = huella
+            resultado['huella_ensamblaje'] = huella_ensamblaje
+            cache.guardar(huella, resultado)
+    return resultado
+
+def calcular_barrido_frecuencia_cacheado(resultados_modales, carga_info, *args, **kwargs):
+    """calcular_barrido_frecuencia() a través de la caché (clave: huella modal + carga + parámetros)"""
+    if 'huella' not in resultados_modales:
+        return calcular_barrido_frecuencia(resultados_modales, carga_info, *args, **kwargs)
+    parametros = {k: v for k, v in kwargs.items() if k not in ('num_trabajadores', 'tamano_tramo')}  # no cambian el resultado
+    clave = hashlib.blake2b(json.dumps([resultados_modales['huella'], carga_info, args, parametros], sort_keys=True,
+                                       default=_serializar_para_huella).encode(), digest_size=20).hexdigest()
+    cache = obtener_cache_resultados()
+    resultado = cache.obtener(clave)
+    if resultado is None:
+        resultado = calcular_barrido_frecuencia(resultados_modales, carga_info, *args, **kwargs)
+        if resultado:
+            cache.guardar(clave, resultado)
+    return resultado
+
+# --- Reanálisis Incremental (Sherman–Morrison–Woodbury) ---
+
+def factorizar_woodbury(factor_base, posiciones, delta):
+    """
+    Resolvedor de (A + P Δ Pᵀ) x = b a partir de la factorización de A, con P las columnas
+    'posiciones' de la identidad y Δ (s×s) simétrica, no necesariamente invertible:
+        (A + PΔPᵀ)⁻¹ = A⁻¹ - A⁻¹P (I + Δ PᵀA⁻¹P)⁻¹ Δ PᵀA⁻¹
+    Cuesta s sustituciones con la factorización base más una LU de s×s.
+    """
+    n, s = factor_base['n'], len(posiciones)
+    E = np.zeros((n, s))
+    E[posiciones, np.arange(s)] = 1.0
+    A_inv_P = factor_base['resolver'](E)
+    capacitancia = np.eye(s) + delta @ A_inv_P[posiciones]
+    factor_capacitancia = lu_factor(capacitancia)
+    if not np.all(np.diag(factor_capacitancia[0])):
+        raise np.linalg.LinAlgError("Matriz modificada singular")
+
+    def resolver_woodbury(b):
+        y = factor_base['resolver'](b)
+        return y - A_inv_P @ lu_solve(factor_capacitancia, delta @ y[posiciones])
+
+    with np.errstate(divide='ignore'):
+        log10_det = (factor_base['log10_determinante'] if 'log10_determinante' in factor_base else log10_determinante(factor_base)) \
+            + float(np.sum(np.log10(np.abs(np.diag(factor_capacitancia[0])))))  # lema del determinante
+    return {'tipo': f"{factor_base['tipo']} + Woodbury (rango {s})", 'n': n, 'ancho_banda': factor_base['ancho_banda'],
+            'memoria': A_inv_P.nbytes, 'resolver': resolver_woodbury, 'log10_determinante': log10_det}
+
+def factorizar_incremental(K_uu, incognitas_u_idx, permutacion=None):
+    """
+    Factorización de K_uu para el cálculo estático. En modo incremental, si desde la última
+    factorización completa (base) solo cambiaron elementos (≤ max_actualizaciones_incrementales)
+    con las mismas incógnitas, se actualiza la base con Woodbury en vez de refactorizar.
+    """
+    base = st.session_state.get('base_incremental')
+    modificaciones = st.session_state.get('modificaciones_elementos', [])
+    if st.session_state.get('analisis_incremental') and base is not None and base['incognitas'] == tuple(incognitas_u_idx) \
+            and modificaciones:
+        if base.get('num_modificaciones') == len(modificaciones):
+            return base['woodbury']
+
+        # ΔK_uu = P Δ Pᵀ restringida a los GL incógnita tocados por los elementos modificados
+        posicion_en_uu = {gl: k for k, gl in enumerate(incognitas_u_idx)}
+        tocados = sorted({posicion_en_uu[gl] for mod in modificaciones for gl in mod['gl'] if gl in posicion_en_uu})
+        posicion_en_delta = {p: k for k, p in enumerate(tocados)}
+        delta = np.zeros((len(tocados), len(tocados)))
+        for mod in modificaciones:
+            locales = [k for k, gl in enumerate(mod['gl']) if gl in posicion_en_uu]
+            destino = [posicion_en_delta[posicion_en_uu[mod['gl'][k]]] for k in locales]
+            delta[np.ix_(destino, destino)] += mod['delta_k'][np.ix_(locales, locales)]
+
+        try:
+            factor = factorizar_woodbury(base['factor'], np.asarray(tocados, dtype=np.int64), delta)
+            # Comprobación (error inverso): la actualización debe reproducir la K_uu ensamblada
+            # (falla p. ej. si cambió la geometría o se borraron elementos sin pasar por el registro)
+            b = np.ones(K_uu.shape[0])
+            x = factor['resolver'](b)
+            norma_K = abs(K_uu).sum(axis=0).max() if sparse.issparse(K_uu) else np.linalg.norm(K_uu, 1)
+            if np.linalg.norm(K_uu @ x - b, 1) <= 1e-10 * (norma_K * np.linalg.norm(x, 1) + np.linalg.norm(b, 1)):
+                base.update({'woodbury': factor, 'num_modificaciones': len(modificaciones)})
+                return factor
+        except np.linalg.LinAlgError:
+            pass
+
+    factor = factorizar_con_cache(K_uu, permutacion, incognitas_u_idx)
+    st.session_state.base_incremental = {'factor': factor, 'incognitas': tuple(incognitas_u_idx)}
+    st.session_state.modificaciones_elementos = []
+    return factor
+
+def autovalores_menores_factorizados(K, M, factor, num_modos, sigma=0.0):
+    """
+    Primeros 'num_modos' autopares de K Φ = λ M Φ por Lanczos en shift-invert,
+    reutilizando la factorización de (K - σ M) como operador inverso.
+    """
+    n = K.shape[0]
+    k = min(num_modos, n - 1)
+    OPinv = LinearOperator((n, n), matvec=factor['resolver'], dtype=float)
+    eigenvalues, eigenvectors = eigsh(K, k=k, M=M, sigma=sigma, which='LM', OPinv=OPinv)
+    orden = np.argsort(eigenvalues)
+    return eigenvalues[orden], eigenvectors[:, orden]
+
+def pivotes_ldl(A):
+    """
+    Pivotes de la factorización LDLᵀ de la matriz simétrica A (autovalores de los bloques de D).
+
+    En disperso se usa SuperLU en modo simétrico (pivoteo diagonal, P A Pᵀ = L D Lᵀ); si SuperLU
+    pivotea fuera de la diagonal o encuentra un pivote exactamente nulo se recurre a scipy.linalg.ldl.
+    """
+    if sparse.issparse(A):
+        A = A.tocsc()
+        try:
+            factor_lu = splu(A, permc_spec='MMD_AT_PLUS_A', diag_pivot_thresh=0.0,
+                             options={'SymmetricMode': True})
+            if np.array_equal(factor_lu.perm_r, factor_lu.perm_c):
+                return factor_lu.U.diagonal()
+        except RuntimeError:
+            pass  # Pivote nulo (σ coincide con un autovalor): LDLᵀ denso con pivoteo de Bunch-Kaufman
+        A = A.toarray()
+    _, D, _ = ldl(np.asarray(A))
+    # D es diagonal por bloques 1x1 / 2x2 (tridiagonal)
+    return eigvalsh_tridiagonal(np.diag(D).copy(), np.diag(D, -1).copy())
+
+def contar_autovalores_menores(K, M, sigma):
+    """
+    Conteo de Sturm: número de autovalores λ < σ de K Φ = λ M Φ.
+
+    Por la ley de inercia de Sylvester es el número de pivotes negativos de la factorización
+    LDLᵀ de K - σM.
+    """
+    return int(np.sum(pivotes_ldl(K - sigma * M) < 0))
+
+def contar_modos_nulos(K):
+    """
+    Deficiencia de rango de K (modos de cuerpo rígido y mecanismos): pivotes nulos de su LDLᵀ,
+    con la tolerancia de rango habitual n·eps·max|d| (la de numpy.linalg.matrix_rank).
+    """
+    pivotes = np.abs(pivotes_ldl(K))
+    if pivotes.size == 0:
+        return 0
+    return int(np.sum(pivotes <= pivotes.size * np.finfo(float).eps * pivotes.max()))
+
+def umbral_autovalor_nulo(K, M):
+    """
+    Umbral de λ = ω² que separa los modos nulos de K de los modos flexibles.
+
+    Los modos nulos son los pivotes nulos de K (contar_modos_nulos) y, además, los autovalores
+    que el redondeo deja por debajo de RUIDO_AUTOVALOR_NULO·eps·max(diag K)/max(diag M) si
+    sobre ellos hay un hueco espectral de HUECO_ESPECTRAL_NULO (conteos de Sturm). El umbral
+    se centra (en escala logarítmica) en ese hueco, para que el ruido de cada solver no lo cruce.
+    Sin modos nulos solo se aplica AUTOVALOR_MINIMO_VALIDO: nunca se descarta un modo que K resiste.
+    """
+    escala = np.max(np.abs(K.diagonal())) / max(np.max(np.abs(M.diagonal())), np.finfo(float).tiny)
+    sigma_ruido = RUIDO_AUTOVALOR_NULO * np.finfo(float).eps * escala
+    modos_nulos = contar_modos_nulos(K)
+    modos_ruido = contar_autovalores_menores(K, M, sigma_ruido)
+    if (modos_ruido > modos_nulos
+            and contar_autovalores_menores(K, M, HUECO_ESPECTRAL_NULO * sigma_ruido) == modos_ruido):
+        return max(AUTOVALOR_MINIMO_VALIDO, sigma_ruido * np.sqrt(HUECO_ESPECTRAL_NULO))
+    if modos_nulos == 0:
+        return AUTOVALOR_MINIMO_VALIDO
+
+    # σ con exactamente r autovalores por debajo: duplicar desde eps·escala y, si se pasa, bisecar
+    sigma = np.finfo(float).eps * escala
+    sigma_bajo, sigma_alto = 0.0, None
+    for _ in range(MAX_ITERACIONES_UMBRAL_NULO):
+        cuenta = contar_autovalores_menores(K, M, sigma)
+        if cuenta == modos_nulos:
+            break
+        if cuenta < modos_nulos:
+            sigma_bajo = sigma
+            sigma = 2.0 * sigma if sigma_alto is None else 0.5 * (sigma + sigma_alto)
+        else:
+            sigma_alto = sigma
+            sigma = 0.5 * (sigma_bajo + sigma)
+    else:
+        # Autovalores no separables en precisión doble: se queda con el lado seguro
+        return max(AUTOVALOR_MINIMO_VALIDO, sigma_bajo)
+    # Hueco sin autovalores sobre σ, comprobado por Sturm en pasos de 10x
+    sigma_hueco = sigma
+    while (sigma_hueco < HUECO_ESPECTRAL_NULO * sigma
+           and contar_autovalores_menores(K, M, 10.0 * sigma_hueco) == modos_nulos):
+        sigma_hueco *= 10.0
+    return max(AUTOVALOR_MINIMO_VALIDO, np.sqrt(sigma * sigma_hueco))
+
+def ventana_autovalores(frecuencia_minima_hz=None, frecuencia_maxima_hz=None, lambda_nulo=AUTOVALOR_MINIMO_VALIDO):
+    """Convertir una ventana [f_min, f_max] en Hz a (λ_min, λ_max) = ((2π f)²); None si no hay ventana"""
+    if not frecuencia_minima_hz and not frecuencia_maxima_hz:
+        return None
+    lambda_min = max((2 * np.pi * (frecuencia_minima_hz or 0.0)) ** 2, lambda_nulo)
+    lambda_max = (2 * np.pi * frecuencia_maxima_hz) ** 2 if frecuencia_maxima_hz else np.inf
+    return lambda_min, lambda_max
+
+def contar_modos_ventana(K, M, ventana):
+    """Número exacto de modos con λ_min < λ < λ_max (dos conteos de Sturm); None si la ventana no está acotada"""
+    lambda_min, lambda_max = ventana
+    if not np.isfinite(lambda_max):
+        return None
+    return contar_autovalores_menores(K, M, lambda_max) - contar_autovalores_menores(K, M, lambda_min)
+
+def extraer_modos_lanczos(K, M, num_modos, permutacion=None, sigma=0.0):
+    """
+    Lanczos shift-invert sobre matrices dispersas simétricas (K, M definida positiva):
+    los 'num_modos' autopares más cercanos a σ.
+
+    Se factoriza K - σM una sola vez (banda o LU dispersa). Con σ = 0 y K singular (modos de
+    cuerpo rígido) se desplaza a σ < 0, donde K - σM es definida positiva.
+
+    Devuelve None si k no es pequeño frente a n (k > FRACCION_MODOS_LANCZOS_MAXIMA * n, o
+    2k + 1 >= n que ARPACK no admite); en ese caso el solver denso es más eficiente.
+    """
+    K = sparse.csr_matrix(K)
+    M = sparse.csr_matrix(M)
+    n = K.shape[0]
+    if num_modos > (n - 2) // 2 or num_modos > FRACCION_MODOS_LANCZOS_MAXIMA * n:
+        return None
+
+    try:
+        factor = factorizar_matriz_simetrica((K - sigma * M).tocsr() if sigma else K, permutacion)
+    except np.linalg.LinAlgError:
+        if sigma:
+            raise
+        sigma = desplazamiento_negativo(K, M)
+        factor = factorizar_matriz_simetrica((K - sigma * M).tocsr(), permutacion)
+
+    eigenvalues, eigenvectors = autovalores_menores_factorizados(K, M, factor, max(1, num_modos), sigma)
+    return eigenvalues, eigenvectors, factor['tipo']
+
+def desplazamiento_negativo(K, M):
+    """σ < 0 pequeño frente a la escala de K/M: K - σM es definida positiva aunque K sea singular"""
+    return -1e-6 * abs(K.diagonal().sum() / M.diagonal().sum())
+
+def autopares_validos(K, M, eigenvalues, eigenvectors, tolerancia=1e-6):
+    """Comprobar el residuo ||K φ - λ M φ|| <= tol (||K||₁ + |λ| ||M||₁) ||φ|| de cada autopar iterativo"""
+    if len(eigenvalues) == 0:
+        return True
+    residuo = np.linalg.norm(K @ eigenvectors - (M @ eigenvectors) * eigenvalues, axis=0)
+    norma_K = abs(K).sum(axis=0).max()
+    norma_M = abs(M).sum(axis=0).max()
+    escala = (norma_K + np.abs(eigenvalues) * norma_M) * np.linalg.norm(eigenvectors, axis=0)
+    return bool(np.all(np.isfinite(eigenvalues)) and np.all(residuo <= tolerancia * escala))
+
+def extraer_modos_menores_lanczos(K, M, num_modos, permutacion=None, lambda_nulo=None):
+    """
+    Los 'num_modos' modos válidos (λ > umbral_autovalor_nulo) más bajos por Lanczos, verificados.
+
+    Un conteo de Sturm en ese umbral da el número r de modos nulos (cuerpo rígido,
+    mecanismos) y se piden k + r autopares (con σ < 0 si r > 0). El resultado se acepta solo si
+    los residuos son pequeños y el conteo de Sturm bajo el mayor autovalor coincide con el número
+    de autopares devueltos (no falta ningún modo intermedio); si no, devuelve None.
+    """
+    K = sparse.csr_matrix(K)
+    M = sparse.csr_matrix(M)
+    if lambda_nulo is None:
+        lambda_nulo = umbral_autovalor_nulo(K, M)
+    modos_nulos = contar_autovalores_menores(K, M, lambda_nulo)
+    sigma = desplazamiento_negativo(K, M) if modos_nulos > 0 else 0.0
+    modos = extraer_modos_lanczos(K, M, num_modos + modos_nulos, permutacion, sigma)
+    if modos is None:
+        return None
+
+    eigenvalues, eigenvectors, tipo = modos
+    orden = np.argsort(eigenvalues)
+    eigenvalues, eigenvectors = eigenvalues[orden], eigenvectors[:, orden]
+    if not autopares_validos(K, M, eigenvalues, eigenvectors):
+        return None
+    lambda_tope = eigenvalues[-1] + 1e-8 * max(abs(eigenvalues[-1]), lambda_nulo)
+    if contar_autovalores_menores(K, M, lambda_tope) != len(eigenvalues):
+        return None
+    return eigenvalues, eigenvectors, tipo
+
+def dividir_ventana_sturm(K, M, ventana, modos_sturm, max_modos_tramo=NUM_MODOS_POR_DEFECTO):
+    """
+    Partir la ventana (λ_min, λ_max) por bisección de Sturm en tramos [a, b) con a lo sumo
+    'max_modos_tramo' modos cada uno (los tramos vacíos se descartan).
+
+    Returns:
+        list: [(a, b, número de modos en [a, b)), ...]
+    """
+    lambda_min, lambda_max = ventana
+    base = contar_autovalores_menores(K, M, lambda_min)
+    pendientes = [(lambda_min, lambda_max, base, base + modos_sturm)]
+    tramos = []
+    while pendientes:
+        a, b, n_a, n_b = pendientes.pop()
+        cuenta = n_b - n_a
+        if cuenta == 0:
+            continue
+        # Cúmulos de autovalores casi iguales: no se pueden separar más
+        if cuenta <= max_modos_tramo or (b - a) <= 1e-8 * b:
+            tramos.append((a, b, cuenta))
+            continue
+        medio = 0.5 * (a + b)
+        n_medio = contar_autovalores_menores(K, M, medio)
+        pendientes.append((medio, b, n_medio, n_b))
+        pendientes.append((a, medio, n_a, n_medio))
+    return sorted(tramos)
+
+def extraer_modos_ventana_lanczos(K, M, ventana, modos_sturm, permutacion=None):
+    """
+    Modos dentro de la ventana (λ_min, λ_max) por partición espectral: cada tramo de Sturm
+    se resuelve con shift-invert centrado en él, pidiendo solo los modos que contiene
+    (k se amplía si Lanczos devuelve autovalores vecinos fuera del tramo).
+    """
+    valores, vectores, tipo = [], [], None
+    for a, b, cuenta in dividir_ventana_sturm(K, M, ventana, modos_sturm):
+        sigma = 0.5 * (a + b)
+        k = cuenta
+        while True:
+            modos = extraer_modos_lanczos(K, M, k, permutacion, sigma)
+            if modos is None:
+                return None
+            eigenvalues, eigenvectors, tipo = modos
+            if not autopares_validos(K, M, eigenvalues, eigenvectors):
+                return None
+            dentro = (eigenvalues >= a) & (eigenvalues < b)
+            if np.sum(dentro) >= cuenta:
+                valores.append(eigenvalues[dentro])
+                vectores.append(eigenvectors[:, dentro])
+                break
+            k = 2 * k
+    return np.concatenate(valores), np.hstack(vectores), tipo
+
+def extraer_modos(K, M, metodo="auto", num_modos=None, ventana=None, modos_sturm=None, permutacion=None,
+                  lambda_nulo=None):
+    """
+    Autopares K Φ = λ M Φ con solvers simétricos.
+
+    Args:
+        metodo (str): clave de METODOS_MODALES.
+        num_modos (int): modos a extraer (None = todos en denso, NUM_MODOS_POR_DEFECTO en Lanczos).
+                         Se ignora si hay ventana: se extraen todos los modos de la ventana.
+        ventana (tuple): (λ_min, λ_max) de ventana_autovalores() o None.
+        modos_sturm (int): número de modos en la ventana según contar_modos_ventana().
+        lambda_nulo (float): umbral_autovalor_nulo(K, M) si ya se ha calculado.
+    Returns:
+        tuple: (eigenvalues, eigenvectors, metodo usado) en orden ascendente.
+    """
+    n = K.shape[0]
+
+    if metodo == "auto":
+        metodo = "lanczos" if sparse.issparse(K) else "denso"
+    if ventana is not None and modos_sturm == 0:
+        return np.zeros(0), np.zeros((n, 0)), metodo
+    if metodo == "lanczos":
+        try:
+            if ventana is None:
+                modos = extraer_modos_menores_lanczos(K, M, num_modos or NUM_MODOS_POR_DEFECTO, permutacion, lambda_nulo)
+            elif modos_sturm is not None:
+                modos = extraer_modos_ventana_lanczos(K, M, ventana, modos_sturm, permutacion)
+            else:
+                modos = None  # Ventana sin límite superior: solo en denso
+        except (ArpackError, ArpackNoConvergence):
+            modos = None  # p.ej. M singular (barras sin masa transversal): se recurre al solver denso
+        if modos is not None:
+            eigenvalues, eigenvectors, tipo = modos
+            orden = np.argsort(eigenvalues)
+            return eigenvalues[orden], eigenvectors[:, orden], tipo
+
+    # Denso simétrico (LAPACK sygvx/sygvd): solo el subconjunto pedido
+    K_d, M_d = matriz_densa(K), matriz_densa(M)
+    if ventana is not None:
+        eigenvalues, eigenvectors = eigh(K_d, M_d, subset_by_value=list(ventana))
+    elif num_modos:
+        # Se piden también los r modos nulos (cuerpo rígido) que luego se descartan
+        if lambda_nulo is None:
+            lambda_nulo = umbral_autovalor_nulo(K_d, M_d)
+        modos_nulos = contar_autovalores_menores(K_d, M_d, lambda_nulo)
+        eigenvalues, eigenvectors = eigh(K_d, M_d, subset_by_index=[0, min(num_modos + modos_nulos, n) - 1])
+    else:
+        eigenvalues, eigenvectors = eigh(K_d, M_d)
+    return eigenvalues, eigenvectors, "denso"
+
+def resolver_sistema_dinamico(metodo="auto", num_modos=None, frecuencia_corte_hz=None, frecuencia_minima_hz=None):
+    """
+    Resolver el problema de autovalores para análisis dinámico.
+
+    'metodo' y 'num_modos' se pasan a extraer_modos(). Con una ventana de frecuencias
+    [frecuencia_minima_hz, frecuencia_corte_hz] se extraen todos los modos de la ventana (se
+    ignora 'num_modos') y el conteo de Sturm garantiza que no falta ninguno.
+    """
     if not st.session_state.elementos or not st.session_state.grados_libertad_info:
         return None
     
     try:
         max_gl = len(st.session_state.grados_libertad_info)
-        K_global = np.zeros((max_gl, max_gl))
-        M_global = np.zeros((max_gl, max_gl))
         
-        # Ensamblar matrices K y M globales
-        for elemento in st.session_state.elementos:
-            if elemento['id'] in st.session_state.matrices_elementos:
-                matriz_k_num = np.array(st.session_state.matrices_elementos[elemento['id']].get('numerica', []))
-                matriz_m_num = np.array(st.session_state.matrices_elementos[elemento['id']].get('masa_global', []))
-                
-                gl = elemento['grados_libertad_global']
-                
-                if matriz_k_num.shape[0] != len(gl) or matriz_m_num.shape[0] != len(gl):
-                    st.error(f"Error en Elemento {elemento['id']}: Inconsistencia de GL. Matriz K/M tiene {matriz_k_num.shape[0]} GLs pero el elemento tiene {len(gl)} GLs libres.")
-                    continue
-
-                for i, gl_i in enumerate(gl):
-                    for j, gl_j in enumerate(gl):
-                        K_global[gl_i-1, gl_j-1] += matriz_k_num[i, j]
-                        M_global[gl_i-1, gl_j-1] += matriz_m_num[i, j]
+        # Ensamblar matrices K y M globales (tripletes COO -> CSR o denso)
+        ensamblaje = preparar_ensamblaje(['numerica', 'masa_global'])
+        if ensamblaje is None:
+            st.error("No hay elementos con matrices definidas para ensamblar.")
+            return None
+        K_global = ensamblar_matriz_global(ensamblaje['numerica'], ensamblaje['indices'], max_gl)
+        M_global = ensamblar_matriz_global(ensamblaje['masa_global'], ensamblaje['indices'], max_gl)
         
         # Identificar DOF restringidos 
         dof_restringidos_idx = [] # base-0
@@ -800,18 +2347,33 @@ def resolver_sistema_dinamico():
             if restringido:
                 dof_restringidos_idx.append(gl_num - 1)
         
-        dof_libres_idx = [i for i in range(max_gl) if i not in dof_restringidos_idx]
+        dof_restringidos_set = set(dof_restringidos_idx)
+        dof_libres_idx = [i for i in range(max_gl) if i not in dof_restringidos_set]
         
         if not dof_libres_idx:
             st.error("No hay grados de libertad libres. No se puede calcular el sistema dinámico.")
             return None
 
         # Extraer submatrices para DOF libres
-        K_libre = K_global[np.ix_(dof_libres_idx, dof_libres_idx)]
-        M_libre = M_global[np.ix_(dof_libres_idx, dof_libres_idx)]
+        K_libre = extraer_submatriz(K_global, dof_libres_idx, dof_libres_idx)
+        M_libre = extraer_submatriz(M_global, dof_libres_idx, dof_libres_idx)
         
-        # Resolver problema de autovalores: K * Φ = λ * M * Φ
-        eigenvalues, eigenvectors = eig(K_libre, M_libre)
+        # Ventana de frecuencias: número exacto de modos por conteo de Sturm
+        lambda_nulo = umbral_autovalor_nulo(K_libre, M_libre)
+        ventana = ventana_autovalores(frecuencia_minima_hz, frecuencia_corte_hz, lambda_nulo)
+        modos_sturm = contar_modos_ventana(K_libre, M_libre, ventana) if ventana else None
+
+        # Resolver problema de autovalores simétrico: K * Φ = λ * M * Φ
+        # (Lanczos shift-invert reutiliza la factorización en banda/dispersa con RCM opcional)
+        try:
+            eigenvalues, eigenvectors, metodo_usado = extraer_modos(
+                K_libre, M_libre, metodo, num_modos, ventana, modos_sturm,
+                permutacion=obtener_permutacion_gl(dof_libres_idx), lambda_nulo=lambda_nulo
+            )
+        except np.linalg.LinAlgError:
+            # M no definida positiva: problema general no simétrico (todos los modos)
+            eigenvalues, eigenvectors = eig(matriz_densa(K_libre), matriz_densa(M_libre))
+            metodo_usado = "general"
         
         # Ordenar por frecuencia ascendente (usar .real para autovalores)
         idx = np.argsort(eigenvalues.real)
@@ -819,12 +2381,18 @@ def resolver_sistema_dinamico():
         eigenvectors_sorted = eigenvectors.real[:, idx]
         
         # Filtrar valores negativos o muy pequeños (numéricamente inestables)
-        min_eigenvalue_threshold = 1e-9
-        valid_indices = eigenvalues_sorted > min_eigenvalue_threshold
+        valid_indices = eigenvalues_sorted > lambda_nulo
         
         eigenvalues_valid = eigenvalues_sorted[valid_indices]
         eigenvectors_valid = eigenvectors_sorted[:, valid_indices]
 
+        # Límites de modos pedidos (el solver general no los aplica)
+        if ventana is not None:
+            dentro = (eigenvalues_valid >= ventana[0]) & (eigenvalues_valid <= ventana[1])
+            eigenvalues_valid, eigenvectors_valid = eigenvalues_valid[dentro], eigenvectors_valid[:, dentro]
+        elif num_modos:
+            eigenvalues_valid, eigenvectors_valid = eigenvalues_valid[:num_modos], eigenvectors_valid[:, :num_modos]
+
         # Calcular frecuencias naturales (ω² → ω)
         frecuencias_rad = np.sqrt(eigenvalues_valid)
         frecuencias_hz = frecuencias_rad / (2 * np.pi)
@@ -847,36 +2415,43 @@ def resolver_sistema_dinamico():
             'K_global': K_global,
             'M_global': M_global,
             'K_libre': K_libre,
-            'M_libre': M_libre
+            'M_libre': M_libre,
+            'metodo_modal': metodo_usado,
+            'modos_sturm': modos_sturm  # Modos garantizados en la ventana (None sin ventana acotada)
         }
     except Exception as e:
         st.error(f"Error en el cálculo dinámico: {str(e)}")
         return None
 
 def resolver_sistema():
-    """Resolver el sistema de ecuaciones para análisis estático"""
+    """
+    Resolver el sistema de ecuaciones para análisis estático.
+
+    El caso 1 sale de grados_libertad_info y los casos adicionales de st.session_state.casos_carga
+    (misma partición de GL conocidos/incógnita). K_uu se factoriza una sola vez y todos los
+    casos se resuelven como un bloque de n × n_casos segundos miembros.
+    """
     if not st.session_state.elementos or not st.session_state.grados_libertad_info:
         return None
     
     try:
         max_gl = len(st.session_state.grados_libertad_info)
-        K_global = np.zeros((max_gl, max_gl))
         
-        for elemento in st.session_state.elementos:
-            if elemento['id'] in st.session_state.matrices_elementos:
-                matriz_num = np.array(st.session_state.matrices_elementos[elemento['id']]['numerica'])
-                gl = elemento['grados_libertad_global']
-                
-                if matriz_num.shape[0] != len(gl):
-                    st.error(f"Error en Elemento {elemento['id']}: Inconsistencia de GL. Matriz K tiene {matriz_num.shape[0]} GLs pero el elemento tiene {len(gl)} GLs libres.")
-                    continue
-
-                for i, gl_i in enumerate(gl):
-                    for j, gl_j in enumerate(gl):
-                        K_global[gl_i-1, gl_j-1] += matriz_num[i, j]
+        ensamblaje = preparar_ensamblaje(['numerica'])
+        if ensamblaje is None:
+            st.error("No hay elementos con matrices definidas para ensamblar.")
+            return None
+        K_global = ensamblar_matriz_global(ensamblaje['numerica'], ensamblaje['indices'], max_gl)
+        
+        casos = st.session_state.get('casos_carga')
+        if casos and casos['valores'].shape[0] != max_gl:
+            st.warning("Los casos de carga adicionales no corresponden a los GL actuales; se resuelve solo el caso 1.")
+            casos = None
+        nombres_casos = ['Caso 1'] + (list(casos['nombres']) if casos else [])
         
-        F = np.zeros(max_gl)
-        U = np.zeros(max_gl)
+        # Bloques (GL, caso): columna 0 = caso 1
+        F = np.zeros((max_gl, len(nombres_casos)))
+        U = np.zeros((max_gl, len(nombres_casos)))
         
         incognitas_u_idx = [] # base-0
         conocidos_u_idx = [] # base-0
@@ -884,45 +2459,62 @@ def resolver_sistema():
         for i, info in enumerate(st.session_state.grados_libertad_info):
             gl_idx = info['numero'] - 1 # base-0
             if info['fuerza_conocida']:
-                F[gl_idx] = info['valor_fuerza']
+                F[gl_idx, 0] = info['valor_fuerza']
+                if casos:
+                    F[gl_idx, 1:] = casos['valores'][gl_idx]
             if info['desplazamiento_conocido']:
-                U[gl_idx] = info['valor_desplazamiento']
+                U[gl_idx, 0] = info['valor_desplazamiento']
+                if casos:
+                    U[gl_idx, 1:] = casos['valores'][gl_idx]
                 conocidos_u_idx.append(gl_idx)
             else:
                 incognitas_u_idx.append(gl_idx)
 
+        log10_det, condicion = float('nan'), float('nan')
         if incognitas_u_idx:
-            K_uu = K_global[np.ix_(incognitas_u_idx, incognitas_u_idx)]
-            K_uk = K_global[np.ix_(incognitas_u_idx, conocidos_u_idx)] if conocidos_u_idx else np.zeros((len(incognitas_u_idx), 0))
+            K_uu = extraer_submatriz(K_global, incognitas_u_idx, incognitas_u_idx)
+            K_uk = extraer_submatriz(K_global, incognitas_u_idx, conocidos_u_idx) if conocidos_u_idx else np.zeros((len(incognitas_u_idx), 0))
             
             F_u = F[incognitas_u_idx]
-            U_k = U[conocidos_u_idx] if conocidos_u_idx else np.array([])
+            U_k = U[conocidos_u_idx]
             
             F_efectivo = F_u - (K_uk @ U_k if conocidos_u_idx else 0)
             
             try:
-                U_u = np.linalg.solve(K_uu, F_efectivo)
+                # Misma K_uu e incógnitas (p. ej. solo cambian cargas): solo sustituciones
+                # Tras editar pocos elementos (modo incremental): actualización de rango bajo de la base
+                factor = factorizar_incremental(K_uu, incognitas_u_idx, obtener_permutacion_gl(incognitas_u_idx))
+                U_u = factor['resolver'](F_efectivo)
                 
-                for i, idx in enumerate(incognitas_u_idx):
-                    U[idx] = U_u[i]
+                U[incognitas_u_idx] = U_u
+                # Diagnóstico de K_uu con la misma factorización (sin det() O(n³) adicional), guardado con ella
+                if 'log10_determinante' not in factor:
+                    factor['log10_determinante'] = log10_determinante(factor)
+                if 'condicion' not in factor:
+                    factor['condicion'] = estimar_condicion_1(K_uu, factor)
+                log10_det, condicion = factor['log10_determinante'], factor['condicion']
             except np.linalg.LinAlgError:
                 st.error("Error: La matriz de rigidez es singular. El sistema es inestable o tiene movimientos de cuerpo rígido. Verifique sus condiciones de contorno.")
                 return None
         
-        F_calculado = K_global @ U
+        F_calculado = np.asarray(K_global @ U)
         
         # Restaurar fuerzas conocidas (reacciones)
-        for i, info in enumerate(st.session_state.grados_libertad_info):
-            gl_idx = info['numero'] - 1
-            if not info['desplazamiento_conocido']: # Si el desplazamiento era incógnita
-                F_calculado[gl_idx] = F[gl_idx] # La fuerza era conocida (aplicada)
+        # Si el desplazamiento era incógnita, la fuerza era conocida (aplicada)
+        F_calculado[incognitas_u_idx] = F[incognitas_u_idx]
 
         
         return {
             'K_global': K_global,
-            'desplazamientos': U,
-            'fuerzas': F_calculado,
-            'determinante': np.linalg.det(K_global), # Nota: K_global puede ser singular si hay BCs
+            'desplazamientos': U[:, 0],  # Caso activo (se cambia con el selector del paso 11)
+            'fuerzas': F_calculado[:, 0],
+            'desplazamientos_casos': U,  # (GL, caso)
+            'fuerzas_casos': F_calculado,
+            'nombres_casos': nombres_casos,
+            'caso_activo': 0,
+            'log10_determinante': log10_det,  # log10 |det K_uu| (K_global es singular sin apoyos)
+            'condicion': condicion,  # Estimación de κ₁(K_uu)
+            'tipo_factorizacion': factor['tipo'] if incognitas_u_idx else None,
             'exito': True
         }
         
@@ -1051,9 +2643,9 @@ def crear_grafico_interactivo_moderno():
         ))
 
     # Añadir elementos con estilo moderno
+    modelo_interactivo = ModeloEstructural(st.session_state.nodos_interactivos, st.session_state.elementos_interactivos)
     for elemento in st.session_state.elementos_interactivos:
-        nodo_inicio = next((n for n in st.session_state.nodos_interactivos if n['id'] == elemento['nodo_inicio']), None)
-        nodo_fin = next((n for n in st.session_state.nodos_interactivos if n['id'] == elemento['nodo_fin']), None)
+        nodo_inicio, nodo_fin = modelo_interactivo.extremos(elemento)
 
         if nodo_inicio and nodo_fin:
             # Calcular punto medio para etiqueta
@@ -1170,7 +2762,7 @@ def transferir_datos_interactivos():
     st.session_state.num_libres = st.session_state.num_nodos - st.session_state.num_fijos
     
     st.session_state.elementos = []
-    st.session_state.matrices_elementos = {}
+    st.session_state.matrices_elementos = AlmacenMatricesElementos()
     st.session_state.num_elementos = len(st.session_state.elementos_interactivos)
     
     # Pre-poblar st.session_state.elementos desde interactivos
@@ -1182,13 +2774,14 @@ def transferir_datos_interactivos():
 
 # --- Funciones de Formateo de Tablas y UI ---
 
-def crear_tabla_nodos():
-    """Crear tabla de nodos con coordenadas y grados de libertad"""
-    if not st.session_state.nodos:
+def crear_tabla_nodos(estado=None):
+    """Crear tabla de nodos con coordenadas y grados de libertad (de la sesión o de 'estado')"""
+    estado = st.session_state if estado is None else estado
+    if not estado['nodos']:
         return pd.DataFrame()
 
     nodos_data = []
-    for nodo in st.session_state.nodos:
+    for nodo in estado['nodos']:
         gl_str = ", ".join([f"GL{gl}" for gl in nodo['grados_libertad_globales']])
         if not gl_str:
             gl_str = "Fijo (0)"
@@ -1203,13 +2796,14 @@ def crear_tabla_nodos():
 
     return pd.DataFrame(nodos_data)
 
-def crear_tabla_conectividad():
-    """Crear tabla de conectividad de elementos con densidad para análisis dinámico"""
-    if not st.session_state.elementos:
+def crear_tabla_conectividad(estado=None):
+    """Crear tabla de conectividad de elementos con densidad para análisis dinámico (de la sesión o de 'estado')"""
+    estado = st.session_state if estado is None else estado
+    if not estado['elementos']:
         return pd.DataFrame()
 
     conectividad_data = []
-    for elem in st.session_state.elementos:
+    for elem in estado['elementos']:
         
         # Manejar secciones (de V4.7)
         tipo_seccion_val = elem.get('tipo_seccion')
@@ -1233,10 +2827,10 @@ def crear_tabla_conectividad():
             'Área [m²]': f"{elem.get('area', 0.0):.6f}",
         }
         
-        if st.session_state.tipo_elemento in ["viga", "viga_portico"]:
+        if estado['tipo_elemento'] in ["viga", "viga_portico"]:
             data_elem['Inercia [m⁴]'] = f"{elem.get('inercia', 0.0):.6e}"
         
-        if st.session_state.tipo_analisis == "dinamico":
+        if estado['tipo_analisis'] == "dinamico":
             data_elem['Densidad [kg/m³]'] = densidad_str
         
         data_elem.update({
@@ -1249,13 +2843,14 @@ def crear_tabla_conectividad():
 
     return pd.DataFrame(conectividad_data)
 
-def crear_tabla_modos_completa():
+def crear_tabla_modos_completa(estado=None):
     """Crear tabla completa con todos los modos y sus amplitudes en todos los DOF,
-        formateada como la imagen de Excel."""
-    if not st.session_state.resultados_dinamicos:
+        formateada como la imagen de Excel (de la sesión o de 'estado')."""
+    estado = st.session_state if estado is None else estado
+    if not estado['resultados_dinamicos']:
         return pd.DataFrame()
     
-    resultado_din = st.session_state.resultados_dinamicos
+    resultado_din = estado['resultados_dinamicos']
     num_modos = len(resultado_din['frecuencias_hz'])
     dof_libres_nums = resultado_din['dof_libres'] # Estos son los números de GL (índices base-1)
     
@@ -1263,7 +2858,7 @@ def crear_tabla_modos_completa():
     datos_modos = []
     
     # Ordenar info GL por número de GL para asegurar el orden correcto
-    gl_info_map = {info['numero']: info for info in st.session_state.grados_libertad_info}
+    gl_info_map = {info['numero']: info for info in estado['grados_libertad_info']}
     
     # Crear lista de info de GL ordenada según dof_libres_nums
     gl_info_ordenada = []
@@ -1507,6 +3102,31 @@ def mostrar_sidebar_mejorado():
             st.markdown(f"**Grados de Libertad:** {len(st.session_state.grados_libertad_info)}")
         
         st.markdown(f"**Fecha:** {datetime.now().strftime('%d/%m/%Y')}")
+        
+        st.divider()
+        st.markdown("### Caché de Factorizaciones")
+        estadisticas_cache = obtener_cache_factorizaciones().estadisticas()
+        st.markdown(f"**Aciertos / Fallos:** {estadisticas_cache['aciertos']} / {estadisticas_cache['fallos']}")
+        st.markdown(f"**Desalojos:** {estadisticas_cache['desalojos']}")
+        st.markdown(f"**Entradas:** {estadisticas_cache['entradas']} "
+                    f"({estadisticas_cache['memoria'] / 2**20:.1f} de {estadisticas_cache['memoria_maxima'] / 2**20:.0f} MB)")
+        
+        st.markdown("### Caché de Figuras de Modos")
+        estadisticas_figuras = obtener_cache_figuras().estadisticas()
+        st.markdown(f"**Aciertos / Fallos:** {estadisticas_figuras['aciertos']} / {estadisticas_figuras['fallos']}")
+        st.markdown(f"**Entradas:** {estadisticas_figuras['entradas']} "
+                    f"({estadisticas_figuras['memoria'] / 2**20:.1f} de {estadisticas_figuras['memoria_maxima'] / 2**20:.0f} MB)")
+        
+        st.markdown("### Caché de Resultados")
+        cache_resultados = obtener_cache_resultados()
+        estadisticas_res = cache_resultados.estadisticas()
+        st.markdown(f"**Aciertos (memoria / disco):** {estadisticas_res['aciertos_memoria']} / {estadisticas_res['aciertos_disco']}")
+        st.markdown(f"**Fallos:** {estadisticas_res['fallos']} · **Volcados a disco:** {estadisticas_res['volcados']}")
+        st.markdown(f"**Memoria:** {estadisticas_res['entradas']} entradas ({estadisticas_res['memoria'] / 2**20:.1f} MB)")
+        st.markdown(f"**Disco:** {estadisticas_res['archivos']} archivos ({estadisticas_res['disco'] / 2**20:.1f} MB)")
+        if st.button("🗑️ Purgar caché de resultados", key="purgar_cache_resultados", use_container_width=True):
+            cache_resultados.vaciar()
+            st.rerun()
 
 def mostrar_matriz_formateada_moderna(matriz, titulo="Matriz", es_simbolica=True):
     """Mostrar matriz en formato tabla con estilo moderno (de V4.7)"""
@@ -1561,112 +3181,67 @@ def visualizar_estructura_moderna(mostrar_deformada=False, factor_escala=10):
     fig, ax = plt.subplots(figsize=(8, 8), facecolor='white')
     ax.set_facecolor('white')
 
-    nodos_deformados = []
-    all_x = [nodo['x'] for nodo in st.session_state.nodos]
-    all_y = [nodo['y'] for nodo in st.session_state.nodos]
+    # Todo se dibuja con colecciones (una por capa) sobre los arrays del modelo
+    modelo = obtener_modelo_estructural()
+    coordenadas = np.column_stack([modelo.x, modelo.y])
+    fijos = modelo.tipo == ModeloEstructural.TIPOS_NODO['fijo']
+    validos = (modelo.conectividad >= 0).all(axis=1)
+    extremos = modelo.conectividad[validos]
+    segmentos_originales = coordenadas[extremos]  # (E, 2, 2)
+    all_x, all_y = list(modelo.x), list(modelo.y)
+    dibujar_deformada = mostrar_deformada and st.session_state.resultados
+
+    if dibujar_deformada:
+        # Desplazamientos nodales (x, y, θ) por fila de nodo; los nodos fijos no se desplazan
+        U_global_vec = np.asarray(st.session_state.resultados['desplazamientos'], dtype=float)
+        gl_nodo = np.zeros((modelo.num_nodos, 3), dtype=np.int64)
+        for j, direccion in enumerate(modelo.direcciones):
+            gl_nodo[:, ('x', 'y', 'theta').index(direccion.lower())] = modelo.tabla_gl[:, j]
+        gl_nodo[fijos] = 0
+        despl_nodo = np.where(gl_nodo > 0, U_global_vec[np.maximum(gl_nodo - 1, 0)], 0.0)
+        nodos_deformados = coordenadas + factor_escala * despl_nodo[:, :2]
+        all_x.extend(nodos_deformados[:, 0])
+        all_y.extend(nodos_deformados[:, 1])
 
-    if mostrar_deformada and st.session_state.resultados:
-        for nodo in st.session_state.nodos:
-            nodo_deformado = nodo.copy()
-            dx, dy, dtheta = 0, 0, 0
-            
-            # Encontrar los GL de este nodo
-            gls_nodo = nodo['grados_libertad_globales']
-            
-            if nodo['tipo'] != 'fijo' and gls_nodo:
-                desplazamientos_res = st.session_state.resultados['desplazamientos']
-                
-                if st.session_state.tipo_elemento == "barra":
-                    dx = desplazamientos_res[gls_nodo[0]-1]
-                    dy = desplazamientos_res[gls_nodo[1]-1]
-                elif st.session_state.tipo_elemento == "viga":
-                    dy = desplazamientos_res[gls_nodo[0]-1]
-                    dtheta = desplazamientos_res[gls_nodo[1]-1]
-                elif st.session_state.tipo_elemento == "viga_portico":
-                    dx = desplazamientos_res[gls_nodo[0]-1]
-                    dy = desplazamientos_res[gls_nodo[1]-1]
-                    dtheta = desplazamientos_res[gls_nodo[2]-1]
-
-            nodo_deformado['x'] += dx * factor_escala
-            nodo_deformado['y'] += dy * factor_escala
-            nodo_deformado['theta'] = dtheta # Guardar rotación
-            nodos_deformados.append(nodo_deformado)
-            
-            all_x.append(nodo_deformado['x'])
-            all_y.append(nodo_deformado['y'])
+        if st.session_state.tipo_elemento in ["viga", "viga_portico"]:
+            # Curvas de Hermite de todos los elementos a la vez (v local; base en el nudo inicial desplazado)
+            U_elem = np.concatenate([despl_nodo[extremos[:, 0]], despl_nodo[extremos[:, 1]]], axis=1)  # (E, 6)
+            beta, L = modelo.beta[validos], modelo.longitud[validos]
+            if st.session_state.tipo_elemento == "viga_portico":
+                u_local = np.einsum('eij,ej->ei', generar_matrices_transformacion_lote("viga_portico", beta), U_elem)
+            else:
+                u_local = U_elem
+            s = np.linspace(0.0, 1.0, NUM_PUNTOS_DEFORMADA)
+            v_local_curva = (np.outer(u_local[:, 1], 2*s**3 - 3*s**2 + 1) + np.outer(u_local[:, 2] * L, s**3 - 2*s**2 + s)
+                             + np.outer(u_local[:, 4], -2*s**3 + 3*s**2) + np.outer(u_local[:, 5] * L, s**3 - s**2))
+            x_local = np.outer(L, s)
+            c, sn = np.cos(beta)[:, None], np.sin(beta)[:, None]
+            inicio_def = nodos_deformados[extremos[:, 0]]
+            segmentos_deformados = np.stack([inicio_def[:, [0]] + x_local * c - v_local_curva * sn * factor_escala,
+                                             inicio_def[:, [1]] + x_local * sn + v_local_curva * c * factor_escala], axis=-1)
+            all_x.extend(segmentos_deformados[..., 0].ravel())
+            all_y.extend(segmentos_deformados[..., 1].ravel())
+        else: # Para 'barra'
+            segmentos_deformados = nodos_deformados[extremos]
 
     # Dibujar original (si se muestra deformada)
     if mostrar_deformada:
-        for elemento in st.session_state.elementos:
-            nodo_inicio = next((n for n in st.session_state.nodos if n['id'] == elemento['nodo_inicio']), None)
-            nodo_fin = next((n for n in st.session_state.nodos if n['id'] == elemento['nodo_fin']), None)
-            if nodo_inicio and nodo_fin:
-                ax.plot([nodo_inicio['x'], nodo_fin['x']], 
-                        [nodo_inicio['y'], nodo_fin['y']], 
-                        color='#ced4da', linewidth=2, alpha=0.8, linestyle='--', 
-                        label='Estructura Original' if 'Estructura Original' not in ax.get_legend_handles_labels()[1] else "")
+        ax.add_collection(LineCollection(segmentos_originales, colors='#ced4da', linewidths=2, alpha=0.8, linestyles='--',
+                                         label='Estructura Original', zorder=2))
 
     # Dibujar elementos
-    for elemento in st.session_state.elementos:
-        nodo_inicio = next((n for n in st.session_state.nodos if n['id'] == elemento['nodo_inicio']), None)
-        nodo_fin = next((n for n in st.session_state.nodos if n['id'] == elemento['nodo_fin']), None)
-        
-        if not (nodo_inicio and nodo_fin):
-            continue
-
-        if mostrar_deformada and nodos_deformados:
-            nodo_inicio_def = next((n for n in nodos_deformados if n['id'] == elemento['nodo_inicio']), None)
-            nodo_fin_def = next((n for n in nodos_deformados if n['id'] == elemento['nodo_fin']), None)
-
-            if nodo_inicio_def and nodo_fin_def and st.session_state.tipo_elemento in ["viga", "viga_portico"]:
-                U_global_vec = st.session_state.resultados['desplazamientos']
-                T = np.eye(6) 
-                u_local = np.zeros(6)
-
-                if st.session_state.tipo_elemento == "viga":
-                    gl_i = nodo_inicio['grados_libertad_globales']
-                    gl_j = nodo_fin['grados_libertad_globales']
-                    u_local = np.array([0, U_global_vec[gl_i[0]-1], U_global_vec[gl_i[1]-1], 0, U_global_vec[gl_j[0]-1], U_global_vec[gl_j[1]-1]])
-                
-                elif st.session_state.tipo_elemento == "viga_portico":
-                    T = generar_matriz_transformacion_viga_portico(elemento['beta'])
-                    gl_globales_elem = elemento['grados_libertad_global']
-                    U_global_elem = np.array([U_global_vec[i-1] for i in gl_globales_elem])
-                    u_local = T @ U_global_elem
-
-                v1, theta1 = u_local[1], u_local[2]
-                v2, theta2 = u_local[4], u_local[5]
-
-                x_local, v_local_curva = hermite_interpolation(v1, theta1, v2, theta2, elemento['longitud'])
-                
-                beta = elemento['beta']
-                c, s = math.cos(beta), math.sin(beta)
-                
-                x_global_base = nodo_inicio_def['x'] + x_local * c
-                y_global_base = nodo_inicio_def['y'] + x_local * s
-                
-                x_global_final = x_global_base - v_local_curva * s * factor_escala
-                y_global_final = y_global_base + v_local_curva * c * factor_escala
-
-                all_x.extend(x_global_final)
-                all_y.extend(y_global_final)
-
-                ax.plot(x_global_final, y_global_final,
-                        color='#000000', linewidth=3, alpha=0.9,
-                        label='Estructura Deformada' if 'Estructura Deformada' not in ax.get_legend_handles_labels()[1] else "")
-            
-            elif nodo_inicio_def and nodo_fin_def: # Para 'barra'
-                ax.plot([nodo_inicio_def['x'], nodo_fin_def['x']], [nodo_inicio_def['y'], nodo_fin_def['y']], 
-                        color='#000000', linewidth=3, alpha=0.9,
-                        label='Estructura Deformada' if 'Estructura Deformada' not in ax.get_legend_handles_labels()[1] else "")
-        else:
-            # Dibujar solo original
-            ax.plot([nodo_inicio['x'], nodo_fin['x']], [nodo_inicio['y'], nodo_fin['y']], color='#000000', linewidth=3, alpha=0.9)
+    if dibujar_deformada:
+        ax.add_collection(LineCollection(segmentos_deformados, colors='#000000', linewidths=3, alpha=0.9,
+                                         label='Estructura Deformada', zorder=2))
+    else:
+        ax.add_collection(LineCollection(segmentos_originales, colors='#000000', linewidths=3, alpha=0.9, zorder=2))
 
-        # Etiqueta de elemento
-        mid_x, mid_y = (nodo_inicio['x'] + nodo_fin['x']) / 2, (nodo_inicio['y'] + nodo_fin['y']) / 2
-        ax.text(mid_x, mid_y, f'E{elemento["id"]}', ha='center', va='center', fontsize=9, fontweight='600',
-                bbox=dict(boxstyle="round,pad=0.3", facecolor="white", edgecolor="black", linewidth=1.5, alpha=0.95), zorder=20)
+    # Etiquetas de elementos (solo en estructuras pequeñas: el texto domina el tiempo de dibujo)
+    if len(extremos) <= MAX_ETIQUETAS_GRAFICO:
+        for elemento, (mid_x, mid_y) in zip((e for e, v in zip(st.session_state.elementos, validos) if v),
+                                            segmentos_originales.mean(axis=1)):
+            ax.text(mid_x, mid_y, f'E{elemento["id"]}', ha='center', va='center', fontsize=9, fontweight='600',
+                    bbox=dict(boxstyle="round,pad=0.3", facecolor="white", edgecolor="black", linewidth=1.5, alpha=0.95), zorder=20)
 
     x_min, x_max = (min(all_x) if all_x else 0), (max(all_x) if all_x else 1)
     y_min, y_max = (min(all_y) if all_y else 0), (max(all_y) if all_y else 1)
@@ -1680,17 +3255,15 @@ def visualizar_estructura_moderna(mostrar_deformada=False, factor_escala=10):
     ax.set_ylim(y_min - padding_y, y_max + padding_y)
     
     # Dibujar nodos
-    for i, nodo in enumerate(st.session_state.nodos):
-        color_orig = '#DC2626' if nodo['tipo'] == 'fijo' else '#6c757d'
-        ax.plot(nodo['x'], nodo['y'], 'o', markersize=12, color=color_orig, zorder=10, markeredgecolor='black')
-        
-        if mostrar_deformada and nodos_deformados:
-            nodo_def = nodos_deformados[i]
-            color_def = '#DC2626' if nodo['tipo'] == 'fijo' else '#28a745'
-            ax.plot(nodo_def['x'], nodo_def['y'], 'o', markersize=12, color=color_def, zorder=11, markeredgecolor='black')
-            ax.plot([nodo['x'], nodo_def['x']], [nodo['y'], nodo_def['y']], color='#6c757d', linestyle=':', linewidth=1.5)
-        
-        ax.text(nodo['x'], nodo['y'], str(nodo['id']), ha='center', va='center', fontsize=9, fontweight='700', color='white', zorder=12)
+    ax.scatter(modelo.x, modelo.y, s=12**2, c=np.where(fijos, '#DC2626', '#6c757d'), edgecolors='black', zorder=10)
+    if dibujar_deformada:
+        ax.scatter(nodos_deformados[:, 0], nodos_deformados[:, 1], s=12**2, c=np.where(fijos, '#DC2626', '#28a745'),
+                   edgecolors='black', zorder=11)
+        ax.add_collection(LineCollection(np.stack([coordenadas, nodos_deformados], axis=1), colors='#6c757d',
+                                         linestyles=':', linewidths=1.5, zorder=2))
+    if modelo.num_nodos <= MAX_ETIQUETAS_GRAFICO:
+        for nodo in st.session_state.nodos:
+            ax.text(nodo['x'], nodo['y'], str(nodo['id']), ha='center', va='center', fontsize=9, fontweight='700', color='white', zorder=12)
 
     ax.set_xlabel('X [m]', fontsize=12, fontweight='600')
     ax.set_ylabel('Y [m]', fontsize=12, fontweight='600')
@@ -1729,54 +3302,114 @@ def dibujar_apoyo(ax, x, y, tipo='fijo', color='black', size=10):
         for i in np.linspace(line_x[0], line_x[1], 4):
             ax.plot([i, i - size/40], [line_y[0], line_y[0] - size/40], color=color, linewidth=1)
 
-def visualizar_modo_dinamico(modo_idx, factor_escala=None, figsize=(8, 8)):
+def contexto_dibujo_modos(resultados_modales):
     """
-    Visualiza un modo de vibración específico para la estructura,
-    con una mejor estética y relación de aspecto. (Versión CORREGIDA)
-    
-    Args:
-        modo_idx (int): Índice del modo a visualizar (0-based).
-        factor_escala (float, optional): Factor para escalar la deformada.
-                                        Si es None, se escala automáticamente.
-        figsize (tuple, optional): Tamaño de la figura (ancho, alto) en pulgadas.
-    Returns:
-        matplotlib.figure.Figure: La figura de matplotlib con la visualización.
+    Contexto de dibujo de los modos de un resultado (solo arrays, sin st.session_state): se
+    construye una vez y sirve para todos los modos.
+
+    Además de coordenadas, conectividad (filas de nodo), apoyos e índices (base 0) de los GL
+    x, y, θ de cada nodo en el vector completo (-1 si no existe), guarda la deformada de todos
+    los elementos como una matriz dispersa: 'puntos_base' (E, P, 2) son los P puntos de
+    muestreo de cada elemento y 'deformada' (2·E·P, num_gl) da sus desplazamientos globales
+    a partir del vector completo del modo (rotaciones T y R del elemento, funciones de forma
+    lineales para u y de Hermite para v). Así la deformada de un modo es un solo producto.
     """
-    if not st.session_state.resultados_dinamicos or not st.session_state.resultados_dinamicos.get('exito'):
-        st.warning("No hay resultados dinámicos para visualizar.")
-        return None
-
-    # 1. Obtener el vector de modo "pequeño" (solo DOFs libres) desde la clave correcta
-    eigenvector_matrix_small = np.array(st.session_state.resultados_dinamicos['eigenvectors'])
-    
-    # Comprobar si modo_idx es válido
-    if modo_idx < 0 or modo_idx >= eigenvector_matrix_small.shape[1]:
-        st.error(f"Índice de modo inválido: {modo_idx}. Debe estar entre 0 y {eigenvector_matrix_small.shape[1]-1}.")
-        return None
-        
-    modo_shape_small = eigenvector_matrix_small[:, modo_idx]
-
-    # 2. Obtener la lista de DOFs libres (números base-1, ej: [3, 4, 5])
-    dof_libres_nums = st.session_state.resultados_dinamicos['dof_libres'] 
-
-    # 3. Crear un mapa de {GL_num: indice_en_vector_pequeño}
-    gl_a_idx_map = {gl_num: i for i, gl_num in enumerate(dof_libres_nums)}
-
-    # 4. Crear el vector de desplazamiento "completo" (incluyendo 0s para DOFs fijos)
-    num_total_gl = len(st.session_state.grados_libertad_info)
-    desplazamientos_modales_actuales_full = np.zeros(num_total_gl)
+    nodos, elementos = st.session_state.nodos, st.session_state.elementos
+    tipo_elemento = st.session_state.tipo_elemento
+    fila_nodo = {n['id']: i for i, n in enumerate(nodos)}
+    gl_nodo = np.full((len(nodos), 3), -1, dtype=np.int64)
+    for gl in st.session_state.grados_libertad_info:
+        direccion = gl['direccion'].lower()
+        if gl['numero'] is not None and gl['nodo'] in fila_nodo and direccion in ('x', 'y', 'theta'):
+            gl_nodo[fila_nodo[gl['nodo']], ('x', 'y', 'theta').index(direccion)] = gl['numero'] - 1
+    coordenadas = np.array([[n['x'], n['y']] for n in nodos], dtype=float).reshape(-1, 2)
+    extremos = np.array([[fila_nodo[e['nodo_inicio']], fila_nodo[e['nodo_fin']]] for e in elementos],
+                        dtype=np.int64).reshape(-1, 2)
+    num_gl = len(st.session_state.grados_libertad_info)
+    dof_libres_idx = np.asarray(resultados_modales['dof_libres'], dtype=np.int64) - 1
+
+    # Geometría de los elementos
+    num_puntos = NUM_PUNTOS_DEFORMADA if tipo_elemento in ("viga", "viga_portico") else 2
+    s = np.linspace(0.0, 1.0, num_puntos)
+    xy_i, xy_j = coordenadas[extremos[:, 0]], coordenadas[extremos[:, 1]]
+    delta = xy_j - xy_i
+    L = np.hypot(delta[:, 0], delta[:, 1])
+    beta = np.arctan2(delta[:, 1], delta[:, 0])
+    recto = (L < 1e-9) | (tipo_elemento == "barra")  # Deformada recta entre los nudos desplazados
+
+    # B[e, p, a, k]: desplazamiento global 'a' (x, y) del punto p por GL k = [x1, y1, θ1, x2, y2, θ2]
+    num_el = len(extremos)
+    B = np.zeros((num_el, num_puntos, 2, 6))
+    if tipo_elemento in ("viga", "viga_portico"):
+        # La viga se dibuja con β = 0 y sin desplazamiento axial (v = Y global)
+        beta_hermite = beta if tipo_elemento == "viga_portico" else np.zeros(num_el)
+        T = (generar_matrices_transformacion_lote("viga_portico", beta_hermite) if tipo_elemento == "viga_portico"
+             else np.broadcast_to(np.eye(6), (num_el, 6, 6)))
+        c, sn = np.cos(beta_hermite), np.sin(beta_hermite)
+        R = np.stack([np.stack([c, -sn], axis=-1), np.stack([sn, c], axis=-1)], axis=-2)  # local (u, v) → global
+        N = np.zeros((num_el, num_puntos, 2, 6))  # funciones de forma locales
+        if tipo_elemento == "viga_portico":
+            N[:, :, 0, 0], N[:, :, 0, 3] = 1 - s, s
+        N[:, :, 1, 1] = 2*s**3 - 3*s**2 + 1
+        N[:, :, 1, 2] = np.outer(L, s**3 - 2*s**2 + s)
+        N[:, :, 1, 4] = -2*s**3 + 3*s**2
+        N[:, :, 1, 5] = np.outer(L, s**3 - s**2)
+        B = np.einsum('eab,epbk,ekl->epal', R, N, T)
+        puntos_base = xy_i[:, None, :] + (np.outer(L, s)[:, :, None] * np.stack([c, sn], axis=-1)[:, None, :])
+    else:
+        puntos_base = xy_i[:, None, :] + s[None, :, None] * delta[:, None, :]
+    if recto.any():
+        B[recto] = 0.0
+        B[recto, :, 0, 0] = B[recto, :, 1, 1] = 1 - s
+        B[recto, :, 0, 3] = B[recto, :, 1, 4] = s
+        puntos_base[recto] = xy_i[recto][:, None, :] + s[None, :, None] * delta[recto][:, None, :]
+
+    # Matriz dispersa global: columnas = GL del vector completo (los GL inexistentes no desplazan)
+    gl_elemento = np.concatenate([gl_nodo[extremos[:, 0]], gl_nodo[extremos[:, 1]]], axis=1)  # (E, 6)
+    columnas = np.broadcast_to(gl_elemento[:, None, None, :], B.shape)
+    filas = np.broadcast_to(np.arange(num_el * num_puntos * 2).reshape(num_el, num_puntos, 2, 1), B.shape)
+    usar = (columnas >= 0) & (B != 0)
+    deformada = sparse.csr_matrix((B[usar], (filas[usar], columnas[usar])), shape=(num_el * num_puntos * 2, num_gl))
+
+    contexto = {
+        'tipo_elemento': tipo_elemento,
+        'coordenadas': coordenadas,
+        'ids_nodos': [n['id'] for n in nodos],
+        'fijos': np.array([n.get('tipo') == 'fijo' for n in nodos], dtype=bool),
+        'extremos': extremos,
+        'gl_nodo': gl_nodo,
+        'dof_libres_idx': dof_libres_idx,
+        'gl_libres_dibujados': np.intersect1d(gl_nodo[gl_nodo >= 0], dof_libres_idx),
+        'num_gl': num_gl,
+        'puntos_base': puntos_base,
+        'deformada': deformada,
+    }
+    contexto['memoria'] = (sum(v.nbytes for v in contexto.values() if isinstance(v, np.ndarray))
+                           + deformada.data.nbytes + deformada.indices.nbytes + deformada.indptr.nbytes)
+    return contexto
+
+def obtener_contexto_dibujo(resultados_modales):
+    """Contexto de dibujo del resultado, construido una vez y guardado en la caché de figuras"""
+    huella = resultados_modales.get('huella') or huella_matriz(resultados_modales['eigenvectors'])
+    clave = huella_etapa('contexto_dibujo', [huella])
+    return obtener_cache_figuras().obtener(clave, lambda: contexto_dibujo_modos(resultados_modales))
+
+def vector_modo_completo(contexto, resultados_modales, modo_idx):
+    """Forma modal en el vector completo de GL (ceros en los GL restringidos)"""
+    modo = np.zeros(contexto['num_gl'])
+    validos = contexto['dof_libres_idx'] < contexto['num_gl']
+    modo[contexto['dof_libres_idx'][validos]] = np.asarray(resultados_modales['eigenvectors'])[validos, modo_idx]
+    return modo
+
+def dibujar_modo(contexto, modo_completo, modo_idx, f_modo, factor_escala=None, figsize=(8, 8)):
+    """
+    Figura de un modo con la API orientada a objetos de matplotlib (Figure, sin estado global
+    de pyplot): se puede llamar desde hilos y procesos del pool de reportes.
+    """
+    coordenadas, gl_nodo = contexto['coordenadas'], contexto['gl_nodo']
 
-    # 5. Llenar el vector "completo" con los valores del vector "pequeño"
-    for gl_num, i in gl_a_idx_map.items():
-        if (gl_num - 1) < num_total_gl: # Verificación de seguridad
-            desplazamientos_modales_actuales_full[gl_num - 1] = modo_shape_small[i]
-    
-    # Obtener el nombre del modo y la frecuencia
-    f_modo = st.session_state.resultados_dinamicos['frecuencias_hz'][modo_idx]
-    omega_modo = st.session_state.resultados_dinamicos['frecuencias_rad'][modo_idx]
-    
-    # Crear la figura y los ejes
-    fig, ax = plt.subplots(figsize=figsize)
+    fig = Figure(figsize=figsize)
+    ax = fig.add_subplot()
     ax.set_aspect('auto') # Dejar que los límites definan la proporción
 
     ax.set_xlabel("X [m]")
@@ -1784,38 +3417,18 @@ def visualizar_modo_dinamico(modo_idx, factor_escala=None, figsize=(8, 8)):
     ax.grid(True, linestyle='--', alpha=0.6)
     
     # Rango de la estructura original para el ajuste automático del factor de escala
-    x_coords_orig = [n['x'] for n in st.session_state.nodos]
-    y_coords_orig = [n['y'] for n in st.session_state.nodos]
-    
-    min_x_orig, max_x_orig = (min(x_coords_orig) if x_coords_orig else 0), (max(x_coords_orig) if x_coords_orig else 0)
-    min_y_orig, max_y_orig = (min(y_coords_orig) if y_coords_orig else 0), (max(y_coords_orig) if y_coords_orig else 0)
+    x_coords_orig, y_coords_orig = coordenadas[:, 0], coordenadas[:, 1]
+    min_x_orig, max_x_orig = (x_coords_orig.min() if len(x_coords_orig) else 0), (x_coords_orig.max() if len(x_coords_orig) else 0)
+    min_y_orig, max_y_orig = (y_coords_orig.min() if len(y_coords_orig) else 0), (y_coords_orig.max() if len(y_coords_orig) else 0)
     
     rango_x_orig = max_x_orig - min_x_orig if max_x_orig != min_x_orig else 1.0
     rango_y_orig = max_y_orig - min_y_orig if max_y_orig != min_y_orig else 1.0
     rango_global_orig = max(rango_x_orig, rango_y_orig, 1.0) # Asegurarse de que no sea 0
 
-    # Para cálculo automático del factor de escala
-    max_desplazamiento_nodal = 0.0
-    
-    gl_info_map = {gl['numero']: gl for gl in st.session_state.grados_libertad_info}
-    gl_info_map_by_node = {}
-    for gl in st.session_state.grados_libertad_info:
-        if gl['nodo'] not in gl_info_map_by_node:
-            gl_info_map_by_node[gl['nodo']] = []
-        gl_info_map_by_node[gl['nodo']].append(gl)
-
-    for nodo_original in st.session_state.nodos:
-        gls_nodo = gl_info_map_by_node.get(nodo_original['id'], [])
-        
-        for gl_info in gls_nodo:
-            gl_num = gl_info['numero']
-            despl = desplazamientos_modales_actuales_full[gl_num - 1] 
-            
-            if gl_num in dof_libres_nums:
-                max_desplazamiento_nodal = max(max_desplazamiento_nodal, abs(despl))
-
     # Calcular factor de escala automático si no se proporcionó
     if factor_escala is None:
+        gl_libres = contexto['gl_libres_dibujados']
+        max_desplazamiento_nodal = np.max(np.abs(modo_completo[gl_libres])) if len(gl_libres) else 0.0
         if max_desplazamiento_nodal > 1e-9: 
             factor_escala = (0.1 * rango_global_orig) / max_desplazamiento_nodal 
             factor_escala = max(1, min(factor_escala, 500)) 
@@ -1828,245 +3441,495 @@ def visualizar_modo_dinamico(modo_idx, factor_escala=None, figsize=(8, 8)):
         'deformada': {'color': 'darkgreen', 'linestyle': '-', 'linewidth': 2.5, 'label': f'Modo (Escala x{factor_escala:.1f})'}
     }
 
-    # Recopilar coordenadas para los límites del gráfico
-    all_x = list(x_coords_orig)
-    all_y = list(y_coords_orig)
+    # Deformada de todos los elementos: un producto matriz dispersa × vector del modo
+    puntos_base = contexto['puntos_base']
+    puntos_deformada = puntos_base + factor_escala * (contexto['deformada'] @ modo_completo).reshape(puntos_base.shape)
+
+    ax.add_collection(LineCollection(coordenadas[contexto['extremos']], colors=line_styles['original']['color'],
+                                     linestyles=line_styles['original']['linestyle'], linewidths=line_styles['original']['linewidth'],
+                                     label=line_styles['original']['label'], zorder=2))
+    ax.add_collection(LineCollection(puntos_deformada, colors=line_styles['deformada']['color'],
+                                     linestyles=line_styles['deformada']['linestyle'], linewidths=line_styles['deformada']['linewidth'],
+                                     label=line_styles['deformada']['label'], zorder=2))
+
+    # Límites: estructura original y deformada
+    all_x = np.concatenate([x_coords_orig, puntos_deformada[..., 0].ravel()])
+    all_y = np.concatenate([y_coords_orig, puntos_deformada[..., 1].ravel()])
+
+    # ---  Mover cálculo de límites a DESPUÉS de plotear ---
+    x_min, x_max = (all_x.min() if len(all_x) else 0), (all_x.max() if len(all_x) else 1)
+    y_min, y_max = (all_y.min() if len(all_y) else 0), (all_y.max() if len(all_y) else 1)
+    x_range = x_max - x_min if x_max > x_min else 2
+    y_range = y_max - y_min if y_max > y_min else 2
     
-    gl_dir_map_by_node = {}
-    for gl in st.session_state.grados_libertad_info:
-        if gl['nodo'] not in gl_dir_map_by_node:
-            gl_dir_map_by_node[gl['nodo']] = {}
-        gl_dir_map_by_node[gl['nodo']][gl['direccion'].lower()] = gl['numero']
+    padding_x = 0.1 * x_range
+    padding_y = 0.1 * y_range
+    
+    ax.set_xlim(x_min - padding_x, x_max + padding_x)
+    ax.set_ylim(y_min - padding_y, y_max + padding_y)
 
+    # Dibujar nodos originales y deformados (con texto)
+    gl_xy = gl_nodo[:, :2]
+    nodos_deformada = coordenadas + factor_escala * np.where(gl_xy >= 0, modo_completo[np.maximum(gl_xy, 0)], 0.0)
+    ax.scatter(coordenadas[:, 0], coordenadas[:, 1], s=8**2, c='blue', edgecolors='black', zorder=5)
+    ax.scatter(nodos_deformada[:, 0], nodos_deformada[:, 1], s=8**2, c='lightgreen', edgecolors='darkgreen', zorder=5)
+    if len(coordenadas) <= MAX_ETIQUETAS_GRAFICO:
+        for id_nodo, (x_orig, y_orig), (x_def, y_def) in zip(contexto['ids_nodos'], coordenadas, nodos_deformada):
+            ax.text(x_orig, y_orig, f" {id_nodo}", color='blue', ha='left', va='bottom', fontsize=10, weight='bold')
+            ax.text(x_def, y_def, f" {id_nodo}'", color='darkgreen', ha='left', va='bottom', fontsize=10, weight='bold')
+    
+    # Dibujar apoyos (restricciones)
+    for x_apoyo, y_apoyo in coordenadas[contexto['fijos']]:
+        dibujar_apoyo(ax, x_apoyo, y_apoyo, 'fijo', 'black', size=rango_global_orig*0.05) # Tamaño relativo
 
-    # Dibujar elementos originales y deformados
-    for elemento in st.session_state.elementos:
-        nodo_inicio_original = next(n for n in st.session_state.nodos if n['id'] == elemento['nodo_inicio'])
-        nodo_fin_original = next(n for n in st.session_state.nodos if n['id'] == elemento['nodo_fin'])
+    # Limpiar leyenda de duplicados
+    handles, labels = ax.get_legend_handles_labels()
+    by_label = dict(zip(labels, handles))
+    ax.legend(by_label.values(), by_label.keys())
+    
+    ax.set_title(f"Modo {modo_idx + 1} (f = {f_modo:.2f} Hz, Escala x{factor_escala:.1f})", fontsize=16)
+    fig.tight_layout()
+    
+    return fig
 
-        x1_orig, y1_orig = nodo_inicio_original['x'], nodo_inicio_original['y']
-        x2_orig, y2_orig = nodo_fin_original['x'], nodo_fin_original['y']
+def visualizar_modo_dinamico(modo_idx, factor_escala=None, figsize=(8, 8)):
+    """
+    Visualiza un modo de vibración específico para la estructura,
+    con una mejor estética y relación de aspecto. (Versión CORREGIDA)
+    
+    Args:
+        modo_idx (int): Índice del modo a visualizar (0-based).
+        factor_escala (float, optional): Factor para escalar la deformada.
+                                        Si es None, se escala automáticamente.
+        figsize (tuple, optional): Tamaño de la figura (ancho, alto) en pulgadas.
+    Returns:
+        matplotlib.figure.Figure: La figura de matplotlib con la visualización.
+    """
+    resultado = st.session_state.resultados_dinamicos
+    if not resultado or not resultado.get('exito'):
+        st.warning("No hay resultados dinámicos para visualizar.")
+        return None
+
+    num_modos = np.shape(resultado['eigenvectors'])[1]
+    if modo_idx < 0 or modo_idx >= num_modos:
+        st.error(f"Índice de modo inválido: {modo_idx}. Debe estar entre 0 y {num_modos-1}.")
+        return None
+
+    contexto = obtener_contexto_dibujo(resultado)
+    return dibujar_modo(contexto, vector_modo_completo(contexto, resultado, modo_idx), modo_idx,
+                        resultado['frecuencias_hz'][modo_idx], factor_escala, figsize)
+
+# --- Renderizado de Figuras de Modos en un Pool de Procesos ---
+def contexto_pool_procesos():
+    """
+    Contexto de multiprocessing de los pools de procesos: 'forkserver' (o 'spawn' si no existe).
+    Nunca 'fork': los pools se crean desde hilos del servidor, y un fork mientras otro hilo
+    tiene tomado un lock (matplotlib, logging, cachés, BLAS) puede bloquear al hijo. Los
+    procesos importan el script como '__mp_main__' (sin UI, ver sección 6) y reciben los
+    datos por el inicializador.
+    """
+    metodo = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return multiprocessing.get_context(metodo)
+
+_DATOS_TRABAJADOR_FIGURAS = {}
+
+def _inicializar_trabajador_figuras(contexto):
+    """Inicializador del pool: recibe el contexto de dibujo una sola vez por proceso"""
+    _DATOS_TRABAJADOR_FIGURAS['contexto'] = contexto
+
+def codificar_figura_modo(contexto, modo_completo, modo_idx, f_modo, factor_escala, figsize, formato, dpi):
+    """Bytes (PNG/SVG) de la figura de un modo"""
+    fig = dibujar_modo(contexto, modo_completo, modo_idx, f_modo, factor_escala, figsize)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=formato, dpi=dpi, bbox_inches='tight')
+    return buffer.getvalue()
+
+def _renderizar_modo(tarea):
+    """Tarea del pool: figura de un modo con la geometría recibida por el inicializador"""
+    return codificar_figura_modo(_DATOS_TRABAJADOR_FIGURAS['contexto'], *tarea)
+
+def renderizar_modos_paralelo(contexto, tareas, num_trabajadores=None):
+    """
+    Renderizar figuras de modos en un pool de procesos, en orden. Sin pool (un solo núcleo,
+    una sola figura o si el pool no arranca) se dibujan en serie con la misma función.
+
+    Devuelve (imágenes, aviso): aviso es None o el motivo por el que no se usó el pool.
+    No llama a st.*: se ejecuta en el hilo de reportes.
+    """
+    num_trabajadores = num_trabajadores or os.cpu_count() or 1
+    aviso = None
+    if num_trabajadores > 1 and len(tareas) > 1:
+        try:
+            with ProcessPoolExecutor(
+                max_workers=min(num_trabajadores, len(tareas)),
+                mp_context=contexto_pool_procesos(),
+                initializer=_inicializar_trabajador_figuras,
+                initargs=(contexto,)
+            ) as pool:
+                return list(pool.map(_renderizar_modo, tareas)), None
+        except ERRORES_INICIO_POOL as e:
+            aviso = f"Renderizado paralelo no disponible ({e}); las figuras se dibujaron en serie."
+
+    return [codificar_figura_modo(contexto, *tarea) for tarea in tareas], aviso
+
+@st.cache_resource
+def obtener_cache_figuras():
+    """Caché de figuras de modos compartida por todas las sesiones del servidor"""
+    return CacheMemoriaLRU(MEMORIA_MAXIMA_CACHE_FIGURAS)
+
+def factor_escala_modo(resultados_modales, modo_idx, nodos=None):
+    """Factor de escala automático de la deformada de un modo (pantalla y reporte)"""
+    nodos = st.session_state.nodos if nodos is None else nodos
+    try:
+        max_despl = np.max(np.abs(resultados_modales['eigenvectors'][:, modo_idx]))
+        if max_despl > 1e-9:
+            rango_x = max([n['x'] for n in nodos]) if nodos else 1.0
+            factor_escala = (0.15 * rango_x) / max_despl
+            return max(1, min(factor_escala, 1000))
+    except (ValueError, IndexError):
+        pass
+    return 1.0
+
+def clave_figura_modo(resultados_modales, modo_idx, factor_escala, figsize, formato, dpi):
+    """Clave de la caché de figuras: huella del resultado modal + parámetros de la figura"""
+    huella = resultados_modales.get('huella') or huella_matriz(resultados_modales['eigenvectors'])
+    return huella_etapa('figura_modo', [huella], modo_idx, factor_escala, figsize, formato, dpi)
+
+def imagen_modo_dinamico(modo_idx, factor_escala=None, figsize=(8, 8), formato="png", dpi=DPI_FIGURAS_MODOS, resultado=None):
+    """
+    Figura de un modo codificada (bytes PNG/SVG) a través de la caché de figuras, con clave
+    (huella del resultado modal, modo, escala, tamaño, formato, dpi). None si no hay figura.
+    Sin 'resultado' se usa el análisis modal de la sesión.
+    """
+    resultado = st.session_state.resultados_dinamicos if resultado is None else resultado
+    if not resultado or not resultado.get('exito') or not 0 <= modo_idx < resultado['eigenvectors'].shape[1]:
+        return None
+    clave = clave_figura_modo(resultado, modo_idx, factor_escala, figsize, formato, dpi)
+
+    def renderizar():
+        contexto = obtener_contexto_dibujo(resultado)
+        imagen = codificar_figura_modo(contexto, vector_modo_completo(contexto, resultado, modo_idx), modo_idx,
+                                       resultado['frecuencias_hz'][modo_idx], factor_escala, figsize, formato, dpi)
+        return {'datos': imagen, 'memoria': len(imagen)}
+
+    return obtener_cache_figuras().obtener(clave, renderizar)['datos']
+
+def imagenes_modos_dinamicos(resultado, factores_escala, figsize=(8, 8), formato="png", dpi=DPI_FIGURAS_MODOS,
+                             num_trabajadores=None):
+    """
+    Figuras (bytes) de los modos 0..n-1 del resultado modal con los factores de escala dados,
+    para el reporte. Las que no están en la caché se dibujan juntas en el pool de procesos y se
+    guardan en ella. Devuelve (imágenes, aviso) como renderizar_modos_paralelo.
+    """
+    cache = obtener_cache_figuras()
+    claves = [clave_figura_modo(resultado, i, f, figsize, formato, dpi) for i, f in enumerate(factores_escala)]
+    pendientes = [i for i, clave in enumerate(claves) if not cache.contiene(clave)]
+    aviso = None
+    if pendientes:
+        contexto = obtener_contexto_dibujo(resultado)
+        tareas = [(vector_modo_completo(contexto, resultado, i), i, resultado['frecuencias_hz'][i], factores_escala[i],
+                   figsize, formato, dpi) for i in pendientes]
+        imagenes, aviso = renderizar_modos_paralelo(contexto, tareas, num_trabajadores)
+        for i, imagen in zip(pendientes, imagenes):
+            cache.obtener(claves[i], lambda imagen=imagen: {'datos': imagen, 'memoria': len(imagen)})
+    # Si la caché desalojó alguna durante el lote, obtener() la vuelve a dibujar
+    return [imagen_modo_dinamico(i, f, figsize, formato, dpi, resultado) for i, f in enumerate(factores_escala)], aviso
+
+def generar_frecuencias_barrido(f_naturales, f_min, f_max, num_puntos):
+    """Malla del barrido: puntos lineales + puntos finos alrededor de las frecuencias naturales"""
+    # 1. Generar puntos base lineales
+    freqs_base = np.linspace(f_min, f_max, num_puntos)
+    
+    # 2. Crear puntos finos alrededor de las resonancias (±0.5% y ±0.1%)
+    freqs_resonancia = []
+    for fn in f_naturales:
+        if f_min <= fn <= f_max:
+            offsets = [0.95, 0.98, 0.99, 0.995, 0.999, 
+                        1.001, 1.005, 1.01, 1.02, 1.05]
+            
+            for factor in offsets:
+                freqs_resonancia.append(fn * factor)
+    
+    # 3. Combinar, ordenar y eliminar duplicados
+    freqs = np.unique(np.concatenate((freqs_base, np.array(freqs_resonancia))))
+    return freqs[(freqs >= f_min) & (freqs <= f_max)]
 
-        # Dibujar original
-        ax.plot([x1_orig, x2_orig], [y1_orig, y2_orig], **line_styles['original'])
+def preparar_carga_base(resultados_modales, gdl_restringidos_base_idx):
+    """
+    Particionar K y M y proyectar una sola vez la excitación de base.
 
-        # Calcular deformada con el factor de escala
-        gls_inicio = gl_dir_map_by_node.get(nodo_inicio_original['id'], {})
-        gls_fin = gl_dir_map_by_node.get(nodo_fin_original['id'], {})
+    Con U_y = -(A/ω²)·d (d = dirección del shaker en los GL restringidos):
+        P(ω) = (ω² M_xy - K_xy) U_y = -A·p_m + (A/ω²)·p_k,   p_m = M_xy d,  p_k = K_xy d
+    """
+    K_global = resultados_modales['K_global']
+    M_global = resultados_modales['M_global']
+    
+    dof_libres_idx = [gl - 1 for gl in resultados_modales['dof_libres']] # base-0
+    dof_restringidos_idx = [gl - 1 for gl in resultados_modales['dof_restringidos']] # base-0
+    
+    # Submatrices de acoplamiento (K_lib_restr y M_lib_restr)
+    K_xy = extraer_submatriz(K_global, dof_libres_idx, dof_restringidos_idx)
+    M_xy = extraer_submatriz(M_global, dof_libres_idx, dof_restringidos_idx)
+    
+    # Mapa de GL restringidos
+    mapa_restringidos = {gl_global: i for i, gl_global in enumerate(resultados_modales['dof_restringidos'])}
+    
+    vec_direccion = np.zeros(len(dof_restringidos_idx))
+    for gl_shaker in gdl_restringidos_base_idx:
+        if gl_shaker in mapa_restringidos:
+            vec_direccion[mapa_restringidos[gl_shaker]] = 1.0
 
-        dx1 = desplazamientos_modales_actuales_full[gls_inicio.get('x', 1)-1] * factor_escala if 'x' in gls_inicio else 0
-        dy1 = desplazamientos_modales_actuales_full[gls_inicio.get('y', 1)-1] * factor_escala if 'y' in gls_inicio else 0
-        dtheta1 = desplazamientos_modales_actuales_full[gls_inicio.get('theta', 1)-1] * factor_escala if 'theta' in gls_inicio else 0
+    return {
+        'K_libre': resultados_modales['K_libre'],
+        'M_libre': resultados_modales['M_libre'],
+        'p_m': np.asarray(M_xy @ vec_direccion, dtype=float).ravel(),
+        'p_k': np.asarray(K_xy @ vec_direccion, dtype=float).ravel()
+    }
+
+def barrido_directo(carga_base, omegas, A_base):
+    """Barrido exacto: resolver (K - ω²M) U = P(ω) en cada frecuencia. Devuelve U (n_frec, n_gl), NaN si es singular"""
+    K_libre, M_libre = carga_base['K_libre'], carga_base['M_libre']
+    U = np.zeros((len(omegas), len(carga_base['p_m'])))
+    for i, w in enumerate(omegas):
+        if w == 0: continue
+        
+        # A = w^2 * U => U_base = -A / w^2 ; P_eff = (w^2 * M_xy - K_xy) * U_y
+        U_base_amp = -A_base / (w**2)
+        P_eff = U_base_amp * (w**2 * carga_base['p_m'] - carga_base['p_k'])
         
-        dx2 = desplazamientos_modales_actuales_full[gls_fin.get('x', 1)-1] * factor_escala if 'x' in gls_fin else 0
-        dy2 = desplazamientos_modales_actuales_full[gls_fin.get('y', 1)-1] * factor_escala if 'y' in gls_fin else 0
-        dtheta2 = desplazamientos_modales_actuales_full[gls_fin.get('theta', 1)-1] * factor_escala if 'theta' in gls_fin else 0
+        # Impedancia Z = K - w^2 * M
+        Z = K_libre - (w**2 * M_libre)
         
-        x1_def, y1_def = x1_orig + dx1, y1_orig + dy1
-        x2_def, y2_def = x2_orig + dx2, y2_orig + dy2
+        try:
+            U[i, :] = resolver_sistema_lineal(Z, P_eff)
+        except np.linalg.LinAlgError:
+            # Si estamos demasiado cerca de la singularidad
+            U[i, :] = np.nan
+    return U
 
-        all_x.extend([x1_def, x2_def])
-        all_y.extend([y1_def, y2_def])
+# Datos de solo lectura de cada proceso del barrido paralelo (los fija el inicializador del pool)
+_DATOS_TRABAJADOR_BARRIDO = {}
 
-        # Interpolación de Hermite para la deformada de vigas/pórticos
-        if st.session_state.tipo_elemento in ["viga", "viga_portico"]:
-            dx_orig = x2_orig - x1_orig
-            dy_orig = y2_orig - y1_orig
-            L_orig = np.sqrt(dx_orig**2 + dy_orig**2)
-            
-            if L_orig < 1e-9: # Evitar división por cero
-                ax.plot([x1_def, x2_def], [y1_def, y2_def], **line_styles['deformada'])
-                continue
+def _inicializar_trabajador_barrido(carga_base, A_base):
+    """Inicializador del pool: recibe K, M y las cargas proyectadas una sola vez por proceso"""
+    _DATOS_TRABAJADOR_BARRIDO['carga_base'] = carga_base
+    _DATOS_TRABAJADOR_BARRIDO['A_base'] = A_base
 
-            beta = np.arctan2(dy_orig, dx_orig)
-            
-            v1_loc_scaled, theta1_loc_scaled, v2_loc_scaled, theta2_loc_scaled = 0, 0, 0, 0
-            u1_loc_scaled, u2_loc_scaled = 0, 0
-            beta_hermite = 0.0 # Por defecto (para viga)
-            
-            if st.session_state.tipo_elemento == "viga":
-                v1_loc_scaled = dy1
-                theta1_loc_scaled = dtheta1
-                v2_loc_scaled = dy2
-                theta2_loc_scaled = dtheta2
-                beta_hermite = 0.0 # Viga asume beta=0
-            
-            else:  # viga_portico
-                despl_global_elem_scaled = np.array([dx1, dy1, dtheta1, dx2, dy2, dtheta2])
-                T = generar_matriz_transformacion_viga_portico(beta)
-                despl_local_elem_scaled = T @ despl_global_elem_scaled
-
-                u1_loc_scaled = despl_local_elem_scaled[0]
-                v1_loc_scaled = despl_local_elem_scaled[1]
-                theta1_loc_scaled = despl_local_elem_scaled[2]
-                u2_loc_scaled = despl_local_elem_scaled[3]
-                v2_loc_scaled = despl_local_elem_scaled[4]
-                theta2_loc_scaled = despl_local_elem_scaled[5]
-                beta_hermite = beta  # usar el ángulo del elemento
-
-            x_hermite_loc, v_hermite_loc_scaled = hermite_interpolation(v1_loc_scaled, theta1_loc_scaled, v2_loc_scaled, theta2_loc_scaled, L_orig)
-            
-            x_hermite_glob = x1_orig + x_hermite_loc * np.cos(beta_hermite) - v_hermite_loc_scaled * np.sin(beta_hermite)
-            y_hermite_glob = y1_orig + x_hermite_loc * np.sin(beta_hermite) + v_hermite_loc_scaled * np.cos(beta_hermite)
-            
-            if st.session_state.tipo_elemento == "viga_portico":
-                u_hermite_loc_scaled = u1_loc_scaled * (1 - x_hermite_loc/L_orig) + u2_loc_scaled * (x_hermite_loc/L_orig)
-                
-                x_hermite_glob += u_hermite_loc_scaled * np.cos(beta_hermite)
-                y_hermite_glob += u_hermite_loc_scaled * np.sin(beta_hermite)
+def _barrido_directo_tramo(omegas):
+    """Tarea del pool (y de la ruta serie): barrido directo de un tramo de frecuencias"""
+    return barrido_directo(_DATOS_TRABAJADOR_BARRIDO['carga_base'], omegas, _DATOS_TRABAJADOR_BARRIDO['A_base'])
 
-            all_x.extend(x_hermite_glob)
-            all_y.extend(y_hermite_glob)
+def barrido_directo_paralelo(carga_base, omegas, A_base, num_trabajadores=None, tamano_tramo=TAMANO_TRAMO_BARRIDO):
+    """
+    Barrido directo repartido por tramos de frecuencias en un pool de procesos.
 
-            ax.plot(x_hermite_glob, y_hermite_glob, **line_styles['deformada'])
+    Los tramos se unen en orden; la ruta serie (1 trabajador, o si el pool no arranca) ejecuta
+    la misma función por tramo, así el resultado es idéntico bit a bit. Los errores dentro de
+    un tramo se propagan. Devuelve (U, aviso): aviso es None o el motivo por el que no se usó
+    el pool.
+    """
+    num_trabajadores = num_trabajadores or os.cpu_count() or 1
+    tamano_tramo = max(1, int(tamano_tramo))
+    tramos = [omegas[i:i + tamano_tramo] for i in range(0, len(omegas), tamano_tramo)]
+    if not tramos:
+        return np.zeros((0, len(carga_base['p_m']))), None
+
+    aviso = None
+    if num_trabajadores > 1 and len(tramos) > 1:
+        try:
+            with ProcessPoolExecutor(
+                max_workers=min(num_trabajadores, len(tramos)),
+                mp_context=contexto_pool_procesos(),
+                initializer=_inicializar_trabajador_barrido,
+                initargs=(carga_base, A_base)
+            ) as pool:
+                return np.vstack(list(pool.map(_barrido_directo_tramo, tramos))), None
+        except ERRORES_INICIO_POOL as e:
+            aviso = f"Barrido paralelo no disponible ({e}); se calculó en serie."
+
+    _inicializar_trabajador_barrido(carga_base, A_base)
+    return np.vstack([_barrido_directo_tramo(tramo) for tramo in tramos]), aviso
+
+def preparar_frf_modal(resultados_modales, carga_base):
+    """
+    Datos del barrido por superposición modal (se calculan una vez por análisis modal):
+    modos normalizados a masa unitaria (Φᵀ M Φ = I), cargas modales q = Φᵀ p y la
+    flexibilidad residual r = K⁻¹p - Φ Λ⁻¹ Φᵀ p de los modos truncados.
+    """
+    M_libre = carga_base['M_libre']
+    Phi = np.asarray(resultados_modales['eigenvectors'], dtype=float)
+    lam = np.asarray(resultados_modales['eigenvalues'], dtype=float)
 
-        else: # Barra: solo dibujar línea recta deformada
-            ax.plot([x1_def, x2_def], [y1_def, y2_def], **line_styles['deformada'])
+    # Normalización a masa unitaria (se descartan modos sin masa / autovalores infinitos)
+    masas_modales = np.einsum('ij,ij->j', Phi, np.asarray(M_libre @ Phi))
+    validos = np.isfinite(lam) & (lam > 0) & (masas_modales > 0)
+    Phi_n = Phi[:, validos] / np.sqrt(masas_modales[validos])
+    lam = lam[validos]
 
-    # ---  Mover cálculo de límites a DESPUÉS de plotear ---
-    x_min, x_max = (min(all_x) if all_x else 0), (max(all_x) if all_x else 1)
-    y_min, y_max = (min(all_y) if all_y else 0), (max(all_y) if all_y else 1)
-    x_range = x_max - x_min if x_max > x_min else 2
-    y_range = y_max - y_min if y_max > y_min else 2
-    
-    padding_x = 0.1 * x_range
-    padding_y = 0.1 * y_range
-    
-    ax.set_xlim(x_min - padding_x, x_max + padding_x)
-    ax.set_ylim(y_min - padding_y, y_max + padding_y)
+    q_m = Phi_n.T @ carga_base['p_m']
+    q_k = Phi_n.T @ carga_base['p_k']
 
-    # Dibujar nodos originales y deformados (con texto)
-    for nodo in st.session_state.nodos:
-        idx = nodo['id'] - 1
-        x_orig, y_orig = x_coords_orig[idx], y_coords_orig[idx]
-        
-        gls_nodo = gl_info_map_by_node.get(nodo['id'], [])
-        dx, dy = 0, 0
-        for gl_info in gls_nodo:
-            gl_num = gl_info['numero']
-            despl = desplazamientos_modales_actuales_full[gl_num - 1] * factor_escala
-            if gl_info['direccion'].lower() == 'x': dx = despl
-            elif gl_info['direccion'].lower() == 'y': dy = despl
-        
-        x_def, y_def = x_orig + dx, y_orig + dy
+    # Corrección estática de los modos no incluidos
+    try:
+        factor = factorizar_matriz_simetrica(carga_base['K_libre'])
+        r_m = factor['resolver'](carga_base['p_m']) - Phi_n @ (q_m / lam)
+        r_k = factor['resolver'](carga_base['p_k']) - Phi_n @ (q_k / lam)
+    except np.linalg.LinAlgError:
+        r_m = r_k = np.zeros(Phi_n.shape[0])  # K singular: sin corrección residual
 
-        # Dibujar Nodo Original
-        ax.plot(x_orig, y_orig, 'o', markersize=8, color='blue', markeredgecolor='black', zorder=5)
-        ax.text(x_orig, y_orig, f" {nodo['id']}", color='blue', ha='left', va='bottom', fontsize=10, weight='bold')
+    return {'Phi_n': Phi_n, 'lambda': lam, 'q_m': q_m, 'q_k': q_k, 'r_m': r_m, 'r_k': r_k}
 
-        # Dibujar Nodo Deformado
-        ax.plot(x_def, y_def, 'o', markersize=8, color='lightgreen', markeredgecolor='darkgreen', zorder=5)
-        ax.text(x_def, y_def, f" {nodo['id']}'", color='darkgreen', ha='left', va='bottom', fontsize=10, weight='bold')
-    
-    # Dibujar apoyos (restricciones)
-    for nodo in st.session_state.nodos:
-        if nodo.get('tipo') == 'fijo':
-            dibujar_apoyo(ax, nodo['x'], nodo['y'], 'fijo', 'black', size=rango_global_orig*0.05) # Tamaño relativo
+def barrido_modal(frf_modal, omegas, A_base):
+    """
+    FRF por superposición modal para todas las frecuencias y GL en una expresión vectorizada:
+        U(ω) = Σ_j φ_j (-A q_m,j + (A/ω²) q_k,j) / (ω_j² - ω²) + (-A r_m + (A/ω²) r_k)
+    """
+    w2 = (np.asarray(omegas, dtype=float) ** 2)[:, None]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        coef_k = np.where(w2 > 0, A_base / w2, 0.0)
+        eta = (-A_base * frf_modal['q_m'] + coef_k * frf_modal['q_k']) / (frf_modal['lambda'] - w2)
+
+    # Coordenadas modales + coeficientes residuales -> un único producto (n_frec, m+2) @ (m+2, n_gl)
+    coeficientes = np.hstack([eta, np.full_like(w2, -A_base), coef_k])
+    singulares = ~np.isfinite(coeficientes).all(axis=1)  # ω coincide con una frecuencia natural
+    coeficientes[singulares] = 0.0
+    base = np.vstack([frf_modal['Phi_n'].T, frf_modal['r_m'], frf_modal['r_k']])
+    U = coeficientes @ base
+    U[singulares] = np.nan
+    U[w2[:, 0] == 0] = 0.0
+    return U
+
+def barrido_adaptativo(evaluar, f_min, f_max, presupuesto, f_naturales=(), tolerancia=TOLERANCIA_BARRIDO_ADAPTATIVO):
+    """
+    Malla de frecuencias adaptativa con un presupuesto de puntos (nunca lo supera).
 
-    # Limpiar leyenda de duplicados
-    handles, labels = ax.get_legend_handles_labels()
-    by_label = dict(zip(labels, handles))
-    ax.legend(by_label.values(), by_label.keys())
-    
-    ax.set_title(f"Modo {modo_idx + 1} (f = {f_modo:.2f} Hz, Escala x{factor_escala:.1f})", fontsize=16)
-    fig.tight_layout()
-    
-    return fig
+    Parte de una malla gruesa: puntos lineales y dos semillas a ±0.1% de cada frecuencia natural
+    (primero la inferior de cada modo; las que no caben en el presupuesto se omiten). En cada
+    ronda se gasta el presupuesto primero en los picos: a cada lado de f_n se añade el punto
+    medio entre f_n y la muestra más cercana, hasta quedar a RESOLUCION_RESONANCIA_BARRIDO (nunca
+    se evalúa f_n, donde el sistema es singular). El resto se gasta bisecando (en lote) los
+    intervalos sin resonancia donde el salto de log10 de la amplitud máxima entre GL, o su
+    curvatura (segunda diferencia) en un extremo, supera 'tolerancia'; los de mayor indicador
+    primero.
 
-def calcular_barrido_frecuencia(resultados_modales, carga_info, f_min, f_max, num_puntos, gdl_restringidos_base_idx):
+    Args:
+        evaluar: función omegas -> U (n_frec, n_gl) (barrido directo, paralelo o modal).
+    Returns:
+        tuple: (freqs ordenadas, U correspondiente)
+    """
+    presupuesto = max(int(presupuesto), 3)
+    f_naturales = np.asarray(f_naturales, dtype=float)
+    f_naturales = np.sort(f_naturales[(f_naturales > f_min) & (f_naturales < f_max)])
+
+    lineales = np.linspace(f_min, f_max, min(presupuesto, max(9, presupuesto // 8)))
+    semillas = np.concatenate((f_naturales * (1 - SEPARACION_SEMILLAS_RESONANCIA),
+                               f_naturales * (1 + SEPARACION_SEMILLAS_RESONANCIA)))
+    semillas = semillas[(semillas >= f_min) & (semillas <= f_max)][:presupuesto - len(lineales)]
+    freqs = np.unique(np.concatenate((lineales, semillas)))
+    U = evaluar(2 * np.pi * freqs)
+    resolucion = 1e-9 * max(f_max - f_min, 1e-12)
+
+    while len(freqs) < presupuesto:
+        # 1. Picos: mitad de la distancia entre f_n y la muestra más cercana a cada lado
+        pos = np.searchsorted(freqs, f_naturales)
+        abajo = freqs[np.maximum(pos - 1, 0)]
+        arriba = freqs[np.minimum(pos, len(freqs) - 1)]
+        picos = []
+        for lado, vecinas in ((-1, abajo), (1, arriba)):
+            distancia = lado * (vecinas - f_naturales) / f_naturales
+            afinar = distancia > RESOLUCION_RESONANCIA_BARRIDO * (1 + 1e-6)  # holgura de redondeo
+            picos.append(np.column_stack((distancia[afinar], 0.5 * (f_naturales[afinar] + vecinas[afinar]))))
+        picos = np.vstack(picos)
+        # Los picos peor resueltos primero, si no caben todos
+        nuevas = picos[np.argsort(-picos[:, 0], kind='stable'), 1][:presupuesto - len(freqs)]
+
+        # 2. Intervalos sin resonancia con salto o curvatura de log10|U| por encima de la tolerancia
+        libres = presupuesto - len(freqs) - len(nuevas)
+        if libres > 0:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                amplitud = np.max(np.abs(U), axis=1) if U.shape[1] else np.zeros(len(freqs))
+                log_amp = np.log10(amplitud + np.finfo(float).tiny)
+
+            salto = np.abs(np.diff(log_amp))
+            curvatura = np.zeros(len(freqs))
+            curvatura[1:-1] = np.abs(log_amp[:-2] - 2 * log_amp[1:-1] + log_amp[2:])
+            indicador = np.maximum(salto, np.maximum(curvatura[:-1], curvatura[1:]))
+            indicador[~np.isfinite(indicador)] = np.inf  # resonancia (sistema singular): refinar
+            indicador[np.diff(freqs) <= resolucion] = 0.0
+            indicador[pos[(pos > 0) & (pos < len(freqs))] - 1] = 0.0  # intervalos con f_n: ya afinados en 1.
+
+            candidatos = np.nonzero(indicador > tolerancia)[0]
+            candidatos = candidatos[np.argsort(-indicador[candidatos], kind='stable')][:libres]
+            nuevas = np.concatenate([nuevas, 0.5 * (freqs[candidatos] + freqs[candidatos + 1])])
+
+        if len(nuevas) == 0:
+            break
+        freqs = np.concatenate([freqs, nuevas])
+        U = np.vstack([U, evaluar(2 * np.pi * nuevas)])
+        orden = np.argsort(freqs, kind='stable')
+        freqs, U = freqs[orden], U[orden]
+
+    return freqs, U
+
+def calcular_barrido_frecuencia(resultados_modales, carga_info, f_min, f_max, num_puntos, gdl_restringidos_base_idx, metodo="directo",
+                                num_trabajadores=None, tamano_tramo=TAMANO_TRAMO_BARRIDO, adaptativo=False):
     """
     Calcula la respuesta (Desplazamiento y Aceleración) para un rango de frecuencias.
     MEJORADO: Inserta puntos alrededor de las frecuencias naturales para capturar los picos.
+
+    metodo: "directo" (solución exacta por frecuencia), "modal" (superposición modal con
+    corrección de flexibilidad residual, sin sistemas lineales por frecuencia) o "paralelo"
+    (directo repartido en 'num_trabajadores' procesos, tramos de 'tamano_tramo' frecuencias).
+    Con adaptativo=True la malla se refina en los picos (barrido_adaptativo) y 'num_puntos' es
+    el presupuesto total de frecuencias.
     """
     try:
-        K_libre = resultados_modales['K_libre']
-        M_libre = resultados_modales['M_libre']
-        
-        # Matrices globales completas para calcular fuerzas de acoplamiento
-        K_global = resultados_modales['K_global']
-        M_global = resultados_modales['M_global']
-        
-        dof_libres_idx = [gl - 1 for gl in resultados_modales['dof_libres']] # base-0
-        dof_restringidos_idx = [gl - 1 for gl in resultados_modales['dof_restringidos']] # base-0
-        
-        # Submatrices de acoplamiento (K_lib_restr y M_lib_restr)
-        K_xy = K_global[np.ix_(dof_libres_idx, dof_restringidos_idx)]
-        M_xy = M_global[np.ix_(dof_libres_idx, dof_restringidos_idx)]
-        
-        # 1. Generar puntos base lineales
-        freqs_base = np.linspace(f_min, f_max, num_puntos)
-        
-        # 2. Obtener frecuencias naturales calculadas previamente
-        f_naturales = resultados_modales['frecuencias_hz']
-        
-        # 3. Crear puntos finos alrededor de las resonancias (±0.5% y ±0.1%)
-        freqs_resonancia = []
-        for fn in f_naturales:
-            if f_min <= fn <= f_max:
-                offsets = [0.95, 0.98, 0.99, 0.995, 0.999, 
-                            1.001, 1.005, 1.01, 1.02, 1.05]
-                
-                for factor in offsets:
-                    freqs_resonancia.append(fn * factor)
-        
-        # 4. Combinar, ordenar y eliminar duplicados
-        freqs = np.unique(np.concatenate((freqs_base, np.array(freqs_resonancia))))
-        freqs = freqs[(freqs >= f_min) & (freqs <= f_max)]
-        # ---------------------------
+        carga_base = preparar_carga_base(resultados_modales, gdl_restringidos_base_idx)
+        A_base = carga_info['amplitud_A'] # Aceleración constante del shaker
+        avisos = []  # Pool de procesos no disponible (se avisa una vez por barrido)
+        
+        if metodo == "modal":
+            frf_modal = preparar_frf_modal(resultados_modales, carga_base)
+            evaluar = lambda omegas: barrido_modal(frf_modal, omegas, A_base)
+        elif metodo == "paralelo":
+            def evaluar(omegas):
+                U, aviso = barrido_directo_paralelo(carga_base, omegas, A_base, num_trabajadores, tamano_tramo)
+                if aviso and aviso not in avisos:
+                    avisos.append(aviso)
+                    st.warning(aviso)
+                return U
+        else:
+            evaluar = lambda omegas: barrido_directo(carga_base, omegas, A_base)
 
+        if adaptativo:
+            freqs, U = barrido_adaptativo(evaluar, f_min, f_max, num_puntos, resultados_modales['frecuencias_hz'])
+        else:
+            freqs = generar_frecuencias_barrido(resultados_modales['frecuencias_hz'], f_min, f_max, num_puntos)
+            U = evaluar(freqs * 2 * np.pi)
         omegas = freqs * 2 * np.pi
-        
-        A_base = carga_info['amplitud_A'] # Aceleración constante del shaker
-        
-        # Almacenamiento de resultados
-        resp_despl = np.zeros((len(freqs), len(dof_libres_idx)))
-        resp_acel = np.zeros((len(freqs), len(dof_libres_idx)))
-        
-        # Mapa de GL restringidos
-        mapa_restringidos = {gl_global: i for i, gl_global in enumerate(resultados_modales['dof_restringidos'])}
-        
-        vec_direccion = np.zeros(len(dof_restringidos_idx))
-        for gl_shaker in gdl_restringidos_base_idx:
-            if gl_shaker in mapa_restringidos:
-                vec_direccion[mapa_restringidos[gl_shaker]] = 1.0
-        
-        for i, w in enumerate(omegas):
-            if w == 0: continue
-            
-            # A = w^2 * U => U_base = -A / w^2
-            U_base_amp = -A_base / (w**2)
-            U_y_vec = vec_direccion * U_base_amp
-            
-            # P_eff = (w^2 * M_xy - K_xy) * U_y
-            P_eff = ( (w**2 * M_xy) - K_xy ) @ U_y_vec
-            
-            # Impedancia Z = K - w^2 * M
-            Z = K_libre - (w**2 * M_libre)
-            
-            try:
-                U_x = np.linalg.solve(Z, P_eff)
-                
-                resp_despl[i, :] = np.abs(U_x)
-                resp_acel[i, :] = np.abs(U_x * w**2)
-                
-            except np.linalg.LinAlgError:
-                # Si estamos demasiado cerca de la singularidad
-                resp_despl[i, :] = np.nan 
-                resp_acel[i, :] = np.nan
+
+        resp_despl = np.abs(U, out=U)
+        resp_acel = resp_despl * (omegas ** 2)[:, None]
 
         return {
             'freqs': freqs,
             'desplazamientos': resp_despl,
             'aceleraciones': resp_acel,
-            'dof_libres': resultados_modales['dof_libres']
+            'dof_libres': resultados_modales['dof_libres'],
+            'metodo': metodo,
+            'adaptativo': adaptativo
         }
     except Exception as e:
         st.error(f"Error en barrido de frecuencia: {e}")
         return None
 
-def generar_pdf_reporte_dinamico():
-    """Generar reporte PDF para análisis dinámico con estilo Excel y corrección de color en matrices locales."""
-    if not st.session_state.resultados_dinamicos:
+def generar_pdf_reporte_dinamico(estado, avisos):
+    """
+    Generar reporte PDF para análisis dinámico con estilo Excel y corrección de color en matrices locales.
+    'estado' es la instantánea del reporte (instantanea_reporte); las incidencias (errores,
+    figuras dibujadas en serie) se añaden a la lista avisos.
+    """
+    if not estado['resultados_dinamicos']:
         return None
     
     try:
@@ -2091,11 +3954,11 @@ def generar_pdf_reporte_dinamico():
         story.append(Paragraph(f"Generado: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}", styles['Normal']))
         story.append(Spacer(1, 20))
         
-        resultado = st.session_state.resultados_dinamicos
+        resultado = estado['resultados_dinamicos']
         
         # --- 1. TABLA COMPLETA DE MODOS ---
         story.append(Paragraph("1. FORMAS MODALES (EIGENVECTORES)", section_style))
-        df_modos = crear_tabla_modos_completa()
+        df_modos = crear_tabla_modos_completa(estado)
         data_modos_full = [list(df_modos.columns)] + df_modos.values.tolist()
         
         col_widths = [1.5*inch] + [0.6*inch]*(len(df_modos.columns)-1)
@@ -2124,17 +3987,15 @@ def generar_pdf_reporte_dinamico():
         story.append(Paragraph("2. VISUALIZACIÓN DE MODOS", section_style))
         
         num_modos = len(resultado['frecuencias_hz'])
-        factor_escala_reporte = None 
-        
-        for i in range(num_modos):
-            fig_modo = visualizar_modo_dinamico(i, factor_escala_reporte, figsize=(8,8))
-            
-            if fig_modo:
-                img_buffer = io.BytesIO()
-                fig_modo.savefig(img_buffer, format='png', dpi=150, bbox_inches='tight')
-                img_buffer.seek(0)
-                
-                img_pdf = Image(img_buffer)
+        # Todas las figuras de una vez: las que faltan en la caché se dibujan en paralelo
+        factores_escala = [factor_escala_modo(resultado, i, estado['nodos']) for i in range(num_modos)]
+        imagenes_modos, aviso_figuras = imagenes_modos_dinamicos(resultado, factores_escala, figsize=(8,8))
+        if aviso_figuras:
+            avisos.append(aviso_figuras)
+        
+        for i, imagen_modo in enumerate(imagenes_modos):
+            if imagen_modo:
+                img_pdf = Image(io.BytesIO(imagen_modo))
                 img_pdf.drawHeight = 6.5 * inch 
                 img_pdf.drawWidth = 6.5 * inch
                 img_pdf.hAlign = 'CENTER'
@@ -2144,14 +4005,12 @@ def generar_pdf_reporte_dinamico():
                 story.append(Paragraph(f"Modo {i+1} (f = {resultado['frecuencias_hz'][i]:.2f} Hz)", styles['Heading3']))
                 story.append(Spacer(1, 10))
                 story.append(img_pdf)
-                
-                plt.close(fig_modo)
 
         # --- 3. TABLAS DE NODOS Y CONECTIVIDAD ---
         story.append(PageBreak())
         story.append(Paragraph("3. INFORMACIÓN DE NODOS Y ELEMENTOS", section_style))
         
-        df_nodos = crear_tabla_nodos()
+        df_nodos = crear_tabla_nodos(estado)
         if not df_nodos.empty:
             data_nodos = [list(df_nodos.columns)] + df_nodos.values.tolist()
             table_nodos = Table(data_nodos, colWidths=[1.0*inch]*len(df_nodos.columns))
@@ -2169,7 +4028,7 @@ def generar_pdf_reporte_dinamico():
             story.append(table_nodos)
             story.append(PageBreak())
         
-        df_conectividad = crear_tabla_conectividad()
+        df_conectividad = crear_tabla_conectividad(estado)
         if not df_conectividad.empty:
             data_conectividad = [list(df_conectividad.columns)] + df_conectividad.values.tolist()
             col_widths_connect = [0.8*inch]*len(df_conectividad.columns)
@@ -2195,10 +4054,10 @@ def generar_pdf_reporte_dinamico():
         story.append(Paragraph("4. MATRICES DEL SISTEMA", section_style))
         
         def create_matrix_table(matrix, title):
-            gl_labels = [f"GL{info['numero']}" for info in st.session_state.grados_libertad_info]
+            gl_labels = [f"GL{info['numero']}" for info in estado['grados_libertad_info']]
             header = [''] + gl_labels
             data = [header]
-            for i, row in enumerate(matrix):
+            for i, row in enumerate(iterar_filas_densas(matrix)):
                 formatted_row = [gl_labels[i]] + [f'{val:.3e}' for val in row]
                 data.append(formatted_row)
             
@@ -2229,16 +4088,16 @@ def generar_pdf_reporte_dinamico():
         # Matrices Locales
         story.append(Paragraph("Matrices Locales por Elemento", styles['Heading3']))
         
-        if st.session_state.tipo_elemento == "viga_portico":
+        if estado['tipo_elemento'] == "viga_portico":
             labels = ["u1", "v1", "θ1", "u2", "v2", "θ2"]
-        elif st.session_state.tipo_elemento == "viga":
+        elif estado['tipo_elemento'] == "viga":
             labels = ["v1", "θ1", "v2", "θ2"]
         else:
             labels = ["u1", "v1", "u2", "v2"]
 
-        for elem_id, matrices in st.session_state.matrices_elementos.items():
-            k_local = np.array(matrices['local'])
-            m_local = np.array(matrices['masa_local'])
+        for elem_id, matrices in estado['matrices_elementos'].items():
+            k_local = np.asarray(matrices['local'])
+            m_local = np.asarray(matrices['masa_local'])
             
             data_k = [["K' Local"] + labels] + [[labels[i]] + [f"{v:.3e}" for v in row] for i, row in enumerate(k_local)]
             data_m = [["M' Local"] + labels] + [[labels[i]] + [f"{v:.3e}" for v in row] for i, row in enumerate(m_local)]
@@ -2274,37 +4133,29 @@ def generar_pdf_reporte_dinamico():
             story.append(t_m)
 
         # --- 5. NUEVOS GRÁFICOS (TIEMPO Y FRECUENCIA) ---
-        if 'fig_time_last' in st.session_state or 'fig_acc_last' in st.session_state:
+        figuras = estado['figuras_respuesta']
+        if 'fig_time_last' in figuras or 'fig_acc_last' in figuras:
             story.append(PageBreak())
             story.append(Paragraph("5. ANÁLISIS DE RESPUESTA DINÁMICA", section_style))
 
             # Gráfico Temporal
-            if 'fig_time_last' in st.session_state:
-                img_buffer = io.BytesIO()
-                st.session_state['fig_time_last'].savefig(img_buffer, format='png', dpi=150, bbox_inches='tight')
-                img_buffer.seek(0)
-                img = Image(img_buffer, width=7*inch, height=4.5*inch)
+            if 'fig_time_last' in figuras:
+                img = Image(io.BytesIO(figuras['fig_time_last']), width=7*inch, height=4.5*inch)
                 story.append(Paragraph("Respuesta Temporal (Transitorio + Estacionario)", styles['Heading3']))
                 story.append(img)
                 story.append(Spacer(1, 20))
 
             # Gráficos de Frecuencia (Barrido)
-            if 'fig_acc_last' in st.session_state:
+            if 'fig_acc_last' in figuras:
                 story.append(PageBreak())
-                img_buffer_acc = io.BytesIO()
-                st.session_state['fig_acc_last'].savefig(img_buffer_acc, format='png', dpi=150, bbox_inches='tight')
-                img_buffer_acc.seek(0)
-                img_acc = Image(img_buffer_acc, width=7*inch, height=4.5*inch)
+                img_acc = Image(io.BytesIO(figuras['fig_acc_last']), width=7*inch, height=4.5*inch)
                 story.append(Paragraph("Respuesta en Frecuencia: Aceleración vs Frecuencia", styles['Heading3']))
                 story.append(img_acc)
                 story.append(Spacer(1, 20))
 
-            if 'fig_disp_last' in st.session_state:
+            if 'fig_disp_last' in figuras:
                 story.append(PageBreak())
-                img_buffer_disp = io.BytesIO()
-                st.session_state['fig_disp_last'].savefig(img_buffer_disp, format='png', dpi=150, bbox_inches='tight')
-                img_buffer_disp.seek(0)
-                img_disp = Image(img_buffer_disp, width=7*inch, height=4.5*inch)
+                img_disp = Image(io.BytesIO(figuras['fig_disp_last']), width=7*inch, height=4.5*inch)
                 story.append(Paragraph("Respuesta en Frecuencia: Desplazamiento vs Frecuencia", styles['Heading3']))
                 story.append(img_disp)
 
@@ -2313,12 +4164,12 @@ def generar_pdf_reporte_dinamico():
         return pdf_buffer
         
     except Exception as e:
-        st.error(f"Error generando PDF: {str(e)}")
+        avisos.append(f"Error generando PDF: {str(e)}")
         return None
 
-def generar_pdf_reporte_estatico():
+def generar_pdf_reporte_estatico(estado, avisos):
     """Generar reporte PDF para análisis estático con estilo Excel (Corregido)"""
-    if not st.session_state.resultados:
+    if not estado['resultados']:
         return None
     
     try:
@@ -2342,17 +4193,18 @@ def generar_pdf_reporte_estatico():
         story.append(Paragraph(f"Generado: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}", styles['Normal']))
         story.append(Spacer(1, 20))
         
-        resultado = st.session_state.resultados
+        resultado = estado['resultados']
         
         # 1. Métricas Principales
         story.append(Paragraph("1. RESUMEN DEL ANÁLISIS", section_style))
         metricas = [
             ("Tipo de Análisis:", "Estático"),
-            ("Tipo de Elemento:", st.session_state.tipo_elemento.replace('_', ' ').title()),
-            ("Número de Nodos:", len(st.session_state.nodos)),
-            ("Número de Elementos:", len(st.session_state.elementos)),
-            ("Total de DOF:", len(st.session_state.grados_libertad_info)),
-            ("Determinante de K:", f"{resultado['determinante']:.6e}")
+            ("Tipo de Elemento:", estado['tipo_elemento'].replace('_', ' ').title()),
+            ("Número de Nodos:", len(estado['nodos'])),
+            ("Número de Elementos:", len(estado['elementos'])),
+            ("Total de DOF:", len(estado['grados_libertad_info'])),
+            ("log₁₀ |det K_uu|:", f"{resultado['log10_determinante']:.4f}"),
+            ("Condición κ₁(K_uu) (estimada):", f"{resultado['condicion']:.3e}")
         ]
         data_metricas = []
         for label, value in metricas:
@@ -2370,7 +4222,7 @@ def generar_pdf_reporte_estatico():
         # 2. Tablas de Nodos y Conectividad (Una por página)
         story.append(Paragraph("2. INFORMACIÓN DE NODOS Y ELEMENTOS", section_style))
         
-        df_nodos = crear_tabla_nodos()
+        df_nodos = crear_tabla_nodos(estado)
         if not df_nodos.empty:
             data_nodos = [list(df_nodos.columns)] + df_nodos.values.tolist()
             table_nodos = Table(data_nodos, colWidths=[1.0*inch]*len(df_nodos.columns))
@@ -2388,7 +4240,7 @@ def generar_pdf_reporte_estatico():
             story.append(table_nodos)
             story.append(PageBreak()) 
         
-        df_conectividad = crear_tabla_conectividad()
+        df_conectividad = crear_tabla_conectividad(estado)
         if not df_conectividad.empty:
             data_conectividad = [list(df_conectividad.columns)] + df_conectividad.values.tolist()
             col_widths_connect = [0.8*inch]*len(df_conectividad.columns)
@@ -2416,10 +4268,10 @@ def generar_pdf_reporte_estatico():
         
         # Desplazamientos
         df_desplazamientos = pd.DataFrame({
-            'GL': [info['numero'] for info in st.session_state.grados_libertad_info],
-            'Nodo': [info['nodo'] for info in st.session_state.grados_libertad_info],
-            'Dirección': [info['direccion'] for info in st.session_state.grados_libertad_info],
-            'Desplazamiento [m o rad]': [formatear_unidades(d, "desplazamiento") for d in resultado['desplazamientos'][np.array([info['numero']-1 for info in st.session_state.grados_libertad_info])]]
+            'GL': [info['numero'] for info in estado['grados_libertad_info']],
+            'Nodo': [info['nodo'] for info in estado['grados_libertad_info']],
+            'Dirección': [info['direccion'] for info in estado['grados_libertad_info']],
+            'Desplazamiento [m o rad]': [formatear_unidades(d, "desplazamiento") for d in resultado['desplazamientos'][np.array([info['numero']-1 for info in estado['grados_libertad_info']])]]
         })
         data_desplazamientos = [list(df_desplazamientos.columns)] + df_desplazamientos.values.tolist()
         table_desplazamientos = Table(data_desplazamientos, colWidths=[0.7*inch, 0.6*inch, 1*inch, 1.5*inch])
@@ -2439,10 +4291,10 @@ def generar_pdf_reporte_estatico():
         
         # Fuerzas
         df_fuerzas = pd.DataFrame({
-            'GL': [info['numero'] for info in st.session_state.grados_libertad_info],
-            'Nodo': [info['nodo'] for info in st.session_state.grados_libertad_info],
-            'Dirección': [info['direccion'] for info in st.session_state.grados_libertad_info],
-            'Fuerza [N o Nm]': [formatear_unidades(f, "fuerza") for f in resultado['fuerzas'][np.array([info['numero']-1 for info in st.session_state.grados_libertad_info])]]
+            'GL': [info['numero'] for info in estado['grados_libertad_info']],
+            'Nodo': [info['nodo'] for info in estado['grados_libertad_info']],
+            'Dirección': [info['direccion'] for info in estado['grados_libertad_info']],
+            'Fuerza [N o Nm]': [formatear_unidades(f, "fuerza") for f in resultado['fuerzas'][np.array([info['numero']-1 for info in estado['grados_libertad_info']])]]
         })
         data_fuerzas = [list(df_fuerzas.columns)] + df_fuerzas.values.tolist()
         table_fuerzas = Table(data_fuerzas, colWidths=[0.7*inch, 0.6*inch, 1*inch, 1.5*inch])
@@ -2464,25 +4316,25 @@ def generar_pdf_reporte_estatico():
         return pdf_buffer
         
     except Exception as e:
-        st.error(f"Error generando PDF: {str(e)}")
+        avisos.append(f"Error generando PDF: {str(e)}")
         return None
 
 # --- Funciones de Reporte (Excel) ---
 
-def generar_excel_reporte_dinamico():
+def generar_excel_reporte_dinamico(estado, avisos):
     """Generar reporte Excel para análisis dinámico con múltiples hojas y estilo personalizado."""
-    if not st.session_state.resultados_dinamicos:
+    if not estado['resultados_dinamicos']:
         return None
     
     if not OPENPYXL_AVAILABLE:
-        st.error("Se requiere instalar 'openpyxl' para exportar a Excel. Intente: pip install openpyxl")
+        avisos.append("Se requiere instalar 'openpyxl' para exportar a Excel. Intente: pip install openpyxl")
         return None
     
     try:
         wb = Workbook()
         wb.remove(wb.active)  # Remover hoja por defecto
         
-        resultado = st.session_state.resultados_dinamicos
+        resultado = estado['resultados_dinamicos']
         
         # --- Definición de Estilos (basado en image_647baa.png) ---
         style_header_verde = PatternFill(start_color="E2EFDA", end_color="E2EFDA", fill_type="solid")
@@ -2529,7 +4381,7 @@ def generar_excel_reporte_dinamico():
 
         # --- 1. HOJA: Modos de Vibración (Principal) ---
         ws_modos = wb.create_sheet("Modos de Vibración")
-        df_modos = crear_tabla_modos_completa()
+        df_modos = crear_tabla_modos_completa(estado)
         
         # Escribir encabezados
         headers_modo = list(df_modos.columns)
@@ -2571,7 +4423,7 @@ def generar_excel_reporte_dinamico():
         # --- 2. HOJA: Nodos ---
         ws_nodos = wb.create_sheet("Nodos")
         
-        df_nodos = crear_tabla_nodos()
+        df_nodos = crear_tabla_nodos(estado)
         if not df_nodos.empty:
             ws_nodos.append(list(df_nodos.columns))
             for row in df_nodos.values.tolist():
@@ -2583,7 +4435,7 @@ def generar_excel_reporte_dinamico():
         # --- 3. HOJA: ELEMENTOS ---
         ws_elem = wb.create_sheet("Elementos")
         
-        df_elem = crear_tabla_conectividad()
+        df_elem = crear_tabla_conectividad(estado)
         if not df_elem.empty:
             ws_elem.append(list(df_elem.columns))
             for row in df_elem.values.tolist():
@@ -2595,11 +4447,11 @@ def generar_excel_reporte_dinamico():
         # --- 4 & 5. HOJAS: Matrices Globales K y M ---
         def write_matrix_sheet(wb, sheet_name, matrix, header_prefix):
             ws = wb.create_sheet(sheet_name)
-            headers = [f'{header_prefix}{info["numero"]}' for info in st.session_state.grados_libertad_info]
+            headers = [f'{header_prefix}{info["numero"]}' for info in estado['grados_libertad_info']]
             ws.append([sheet_name] + headers)
             
-            for i, row_data in enumerate(matrix):
-                info = st.session_state.grados_libertad_info[i]
+            for i, row_data in enumerate(iterar_filas_densas(matrix)):
+                info = estado['grados_libertad_info'][i]
                 ws.append([f'{header_prefix}{info["numero"]}'] + row_data.tolist())
             
             # Estilos
@@ -2620,16 +4472,16 @@ def generar_excel_reporte_dinamico():
         write_matrix_sheet(wb, "Matriz Masa Global (M)", resultado['M_global'], "GL")
 
         # --- 6. HOJAS: Matrices Locales (K' y M') ---
-        if st.session_state.tipo_elemento == "viga_portico":
+        if estado['tipo_elemento'] == "viga_portico":
             labels = ["u1", "v1", "θ1", "u2", "v2", "θ2"]
-        elif st.session_state.tipo_elemento == "viga":
+        elif estado['tipo_elemento'] == "viga":
             labels = ["v1", "θ1", "v2", "θ2"]
         else:
             labels = ["u1", "v1", "u2", "v2"]
         
-        for elem_id, matrices in st.session_state.matrices_elementos.items():
-            k_local = np.array(matrices['local'])
-            m_local = np.array(matrices['masa_local'])
+        for elem_id, matrices in estado['matrices_elementos'].items():
+            k_local = np.asarray(matrices['local'])
+            m_local = np.asarray(matrices['masa_local'])
             
             # Hoja para K'
             ws_k_loc = wb.create_sheet(f"Elem {elem_id} - K Local")
@@ -2667,23 +4519,23 @@ def generar_excel_reporte_dinamico():
         return excel_buffer
         
     except Exception as e:
-        st.error(f"Error generando Excel: {str(e)}")
+        avisos.append(f"Error generando Excel: {str(e)}")
         return None
 
-def generar_excel_reporte_estatico():
+def generar_excel_reporte_estatico(estado, avisos):
     """Generar reporte Excel para análisis estático con múltiples hojas"""
-    if not st.session_state.resultados:
+    if not estado['resultados']:
         return None
     
     if not OPENPYXL_AVAILABLE:
-        st.error("Se requiere instalar 'openpyxl' para exportar a Excel. Intente: pip install openpyxl")
+        avisos.append("Se requiere instalar 'openpyxl' para exportar a Excel. Intente: pip install openpyxl")
         return None
     
     try:
         wb = Workbook()
         wb.remove(wb.active)
         
-        resultado = st.session_state.resultados
+        resultado = estado['resultados']
         
         # Estilos
         header_style = Font(bold=True, color="FFFFFF", size=11)
@@ -2732,11 +4584,12 @@ def generar_excel_reporte_estatico():
         row = 3
         info_general = [
             ("Tipo de Análisis:", "Estático - Análisis de Cargas"),
-            ("Tipo de Elemento:", st.session_state.tipo_elemento.replace('_', ' ').title()),
-            ("Número de Nodos:", len(st.session_state.nodos)),
-            ("Número de Elementos:", len(st.session_state.elementos)),
-            ("Total de DOF:", len(st.session_state.grados_libertad_info)),
-            ("Determinante de K:", f"{resultado['determinante']:.6e}"),
+            ("Tipo de Elemento:", estado['tipo_elemento'].replace('_', ' ').title()),
+            ("Número de Nodos:", len(estado['nodos'])),
+            ("Número de Elementos:", len(estado['elementos'])),
+            ("Total de DOF:", len(estado['grados_libertad_info'])),
+            ("log₁₀ |det K_uu|:", f"{resultado['log10_determinante']:.4f}"),
+            ("Condición κ₁(K_uu) (estimada):", f"{resultado['condicion']:.3e}"),
             ("Fecha de Generación:", datetime.now().strftime("%d/%m/%Y %H:%M:%S"))
         ]
         
@@ -2749,7 +4602,7 @@ def generar_excel_reporte_estatico():
         # 2. HOJA: NODOS
         ws_nodos = wb.create_sheet("Nodos")
         
-        df_nodos = crear_tabla_nodos()
+        df_nodos = crear_tabla_nodos(estado)
         if not df_nodos.empty:
             ws_nodos.append(list(df_nodos.columns))
             for row in df_nodos.values.tolist():
@@ -2761,7 +4614,7 @@ def generar_excel_reporte_estatico():
         # 3. HOJA: ELEMENTOS
         ws_elem = wb.create_sheet("Elementos")
         
-        df_elem = crear_tabla_conectividad()
+        df_elem = crear_tabla_conectividad(estado)
         if not df_elem.empty:
             ws_elem.append(list(df_elem.columns))
             for row in df_elem.values.tolist():
@@ -2777,7 +4630,7 @@ def generar_excel_reporte_estatico():
         ws_desp.append(headers_desp)
         apply_style_to_range(ws_desp, 'A1:D1', header_fill, header_style, border, header_alignment)
         
-        for row_idx, info in enumerate(st.session_state.grados_libertad_info, 2):
+        for row_idx, info in enumerate(estado['grados_libertad_info'], 2):
             gl_num = info['numero']
             despl = resultado['desplazamientos'][gl_num - 1]
             
@@ -2798,7 +4651,7 @@ def generar_excel_reporte_estatico():
         ws_fuerzas.append(headers_fuerzas)
         apply_style_to_range(ws_fuerzas, 'A1:D1', header_fill, header_style, border, header_alignment)
         
-        for row_idx, info in enumerate(st.session_state.grados_libertad_info, 2):
+        for row_idx, info in enumerate(estado['grados_libertad_info'], 2):
             gl_num = info['numero']
             fuerza = resultado['fuerzas'][gl_num - 1]
             
@@ -2820,7 +4673,7 @@ def generar_excel_reporte_estatico():
         headers_k = [f"GL{i+1}" for i in range(K_global.shape[1])]
         ws_k.append(["Matriz K"] + headers_k)
         
-        for i, row_data in enumerate(K_global):
+        for i, row_data in enumerate(iterar_filas_densas(K_global)):
             ws_k.append([f"GL{i+1}"] + row_data.tolist())
         
         apply_style_to_range(ws_k, f'B1:{get_column_letter(len(headers_k)+1)}1', header_fill, header_style, border, header_alignment)
@@ -2844,9 +4697,110 @@ def generar_excel_reporte_estatico():
         return excel_buffer
         
     except Exception as e:
-        st.error(f"Error generando Excel: {str(e)}")
+        avisos.append(f"Error generando Excel: {str(e)}")
         return None
 
+# --- Generación de Reportes bajo Demanda (Segundo Plano) ---
+
+@st.cache_resource
+def obtener_ejecutor_reportes():
+    """Pool de hilos del proceso para generar reportes sin bloquear los reruns"""
+    return ThreadPoolExecutor(max_workers=NUM_HILOS_REPORTES, thread_name_prefix="reportes")
+
+def instantanea_reporte(tipo, con_figuras):
+    """
+    Copia, tomada en el hilo del script, de todo lo que lee un reporte: resultados, modelo, GL,
+    matrices de elementos y (si con_figuras) los gráficos de respuesta ya codificados en PNG.
+    Tiene las mismas claves que st.session_state: el hilo de reportes trabaja solo sobre ella,
+    así no ve resultados a medio cambiar ni toca figuras de pyplot que el script reemplaza.
+    """
+    ss = st.session_state
+    clave_resultados = 'resultados' if tipo == "estatico" else 'resultados_dinamicos'
+    resultado = ss[clave_resultados]
+    estado = {
+        # Copia del diccionario: el selector de caso de carga reasigna sus claves en el script
+        clave_resultados: dict(resultado) if resultado else resultado,
+        'tipo_elemento': ss.tipo_elemento,
+        'tipo_analisis': ss.tipo_analisis,
+        'nodos': copy.deepcopy(ss.nodos),
+        'elementos': copy.deepcopy(ss.elementos),
+        'grados_libertad_info': copy.deepcopy(ss.grados_libertad_info),
+        'matrices_elementos': copy.deepcopy(ss.matrices_elementos),
+        'figuras_respuesta': {},
+    }
+    if con_figuras:
+        for clave in ('fig_time_last', 'fig_acc_last', 'fig_disp_last'):
+            if clave in ss:
+                buffer = io.BytesIO()
+                ss[clave].savefig(buffer, format='png', dpi=150, bbox_inches='tight')
+                estado['figuras_respuesta'][clave] = buffer.getvalue()
+    return estado
+
+def enviar_reporte(generar, estado, avisos):
+    """
+    Lanzar generar(estado, avisos) en el pool de reportes sobre la instantánea 'estado'. El hilo
+    hereda el contexto de ejecución de la sesión (add_script_run_ctx) solo para las cachés
+    st.cache_resource; no lee st.session_state. Devuelve un Future con los bytes del reporte
+    (o None si falló); los avisos se muestran al terminar.
+    """
+    contexto = get_script_run_ctx() if get_script_run_ctx else None
+
+    def tarea():
+        if contexto is not None:
+            add_script_run_ctx(threading.current_thread(), contexto)
+        datos = generar(estado, avisos)
+        return datos.getvalue() if hasattr(datos, 'getvalue') else datos
+
+    return obtener_ejecutor_reportes().submit(tarea)
+
+def huella_reporte_estatico():
+    """Huella del contenido del reporte estático: modelo, GL (cargas/apoyos) y resultados mostrados"""
+    resultado = st.session_state.resultados
+    huellas = huellas_modelo()
+    return huella_etapa('reportes', [huellas['matrices_elementos']], 'estatico', st.session_state.grados_libertad_info,
+                        resultado['desplazamientos'], resultado['fuerzas'], resultado.get('caso_activo'))
+
+def huella_reporte_dinamico():
+    """Huella del contenido del reporte dinámico: análisis modal y gráficos de respuesta vigentes"""
+    return huella_etapa('reportes', [st.session_state.resultados_dinamicos['huella']], 'dinamico',
+                        st.session_state.get('huellas_figuras_reporte', {}))
+
+def panel_reporte(tipo, formato, generar, huella, etiqueta, nombre_archivo, mime):
+    """
+    Botón 'Preparar' → instantánea del estado y generación en segundo plano → botón de descarga.
+    La instantánea y la huella se toman en el mismo rerun, así el reporte guardado corresponde a
+    su huella; queda en caché en la sesión mientras la huella del contenido no cambie.
+    """
+    trabajos = st.session_state.reportes
+    trabajo = trabajos.get((tipo, formato))
+    if trabajo is not None and trabajo['huella'] != huella:
+        trabajo = None  # Resultados cambiados: el reporte guardado ya no corresponde
+    if trabajo is None:
+        if not st.button(f"Preparar {etiqueta}", key=f"preparar_reporte_{tipo}_{formato}", use_container_width=True):
+            return
+        estado = instantanea_reporte(tipo, con_figuras=(tipo == "dinamico" and formato == "pdf"))
+        trabajo = {'huella': huella, 'avisos': []}
+        trabajo['futuro'] = enviar_reporte(generar, estado, trabajo['avisos'])
+        trabajos[(tipo, formato)] = trabajo
+
+    futuro = trabajo['futuro']
+    if not futuro.done():
+        st.caption(f"Generando {etiqueta} en segundo plano...")
+        st.button("🔄 Actualizar estado", key=f"estado_reporte_{tipo}_{formato}", use_container_width=True)
+        return
+    datos = futuro.result()
+    if not datos:
+        st.error(f"No se pudo generar el {etiqueta}.")
+        for aviso in trabajo['avisos']:
+            st.error(aviso)
+        trabajos.pop((tipo, formato), None)
+        return
+    for aviso in trabajo['avisos']:
+        st.caption(aviso)
+    st.download_button(label=f"Descargar {etiqueta}", data=datos,
+                       file_name=f"{nombre_archivo}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{formato}",
+                       mime=mime, type="primary", use_container_width=True, key=f"descargar_reporte_{tipo}_{formato}")
+
 def calcular_respuesta_armonica_base(resultados_modales, carga_info):
     """
     Calcula la respuesta armónica en estado estacionario de los GDL libres
@@ -2873,10 +4827,10 @@ def calcular_respuesta_armonica_base(resultados_modales, carga_info):
             return None
 
         # 3. Particionar las matrices
-        K_xx = K_global[np.ix_(dof_libres_idx, dof_libres_idx)]
-        M_xx = M_global[np.ix_(dof_libres_idx, dof_libres_idx)]
-        K_xy = K_global[np.ix_(dof_libres_idx, dof_restringidos_idx)]
-        M_xy = M_global[np.ix_(dof_libres_idx, dof_restringidos_idx)]
+        K_xx = extraer_submatriz(K_global, dof_libres_idx, dof_libres_idx)
+        M_xx = extraer_submatriz(M_global, dof_libres_idx, dof_libres_idx)
+        K_xy = extraer_submatriz(K_global, dof_libres_idx, dof_restringidos_idx)
+        M_xy = extraer_submatriz(M_global, dof_libres_idx, dof_restringidos_idx)
         
         # 4. Construir vector de amplitud de desplazamiento de la base {U_y_amp}
         # $\ddot{U}_y = A \sin(\omega t)$
@@ -2908,7 +4862,7 @@ def calcular_respuesta_armonica_base(resultados_modales, carga_info):
         # 7. Resolver para Amplitud de Desplazamientos Libres {U_x_amp}
         # [Z] * {U_x_amp} = {P_0}
         try:
-            U_x_amp_vector = np.linalg.solve(Z_dinamica, P_0_vector)
+            U_x_amp_vector = resolver_sistema_lineal(Z_dinamica, P_0_vector)
         except np.linalg.LinAlgError:
             st.error(f"Error: Matriz de rigidez dinámica singular. La frecuencia de excitación ({omega:.2f} rad/s) puede coincidir con una frecuencia natural.")
             return None
@@ -2926,6 +4880,593 @@ def calcular_respuesta_armonica_base(resultados_modales, carga_info):
         st.error(f"Error calculando la respuesta armónica: {e}")
         return None
 
+def puntos_respuesta_temporal(resultados_modales):
+    """
+    Instantes de la respuesta temporal sobre la ventana máxima: NUM_PUNTOS_RESPUESTA_TEMPORAL en
+    la ventana mínima, sin pasar de MAX_VALORES_HISTORIA_INTEGRACION valores en u (GL × instantes)
+    ni en q (modos × instantes).
+    """
+    num_puntos = int(NUM_PUNTOS_RESPUESTA_TEMPORAL * VENTANA_MAXIMA_RESPUESTA_TEMPORAL / VENTANA_MINIMA_RESPUESTA_TEMPORAL)
+    filas = max(np.shape(resultados_modales['eigenvectors']))
+    return max(NUM_PUNTOS_RESPUESTA_TEMPORAL, min(num_puntos, MAX_VALORES_HISTORIA_INTEGRACION // max(filas, 1)))
+
+def calcular_respuesta_temporal_modal(resultados_modales, P_0_vector, omega_exc, t_max, num_puntos=NUM_PUNTOS_RESPUESTA_TEMPORAL):
+    """
+    Respuesta temporal (transitorio + estacionario, sin amortiguamiento) de TODOS los GL libres.
+
+    Masas, rigideces y fuerzas generalizadas de todos los modos en un solo producto;
+    q(t) se evalúa como matriz (n_modos, n_t) y u(t) = Φ q(t) con una sola multiplicación.
+    """
+    Phi = resultados_modales['eigenvectors']
+    wn = np.asarray(resultados_modales['frecuencias_rad'], dtype=float)
+    t = np.linspace(0, t_max, num_puntos)
+
+    # --- Cantidades generalizadas de todos los modos ---
+    m_gen = np.einsum('ij,ij->j', Phi, np.asarray(resultados_modales['M_libre'] @ Phi))
+    k_gen = m_gen * wn**2
+    f_gen = Phi.T @ P_0_vector
+
+    validos = np.isfinite(k_gen) & (k_gen > 1e-9)
+    q = np.zeros((Phi.shape[1], len(t)))
+    if np.any(validos):
+        w = wn[validos]
+        qst = f_gen[validos] / k_gen[validos]
+        resonante = np.abs(omega_exc - w) < 1e-2
+        beta = omega_exc / w
+        with np.errstate(divide='ignore'):
+            daf = np.where(resonante, 0.0, 1 / (1 - beta**2))
+
+        wt = np.outer(w, t)
+        q_estable = (qst * daf)[:, None] * (np.sin(omega_exc * t)[None, :] - beta[:, None] * np.sin(wt))
+        q_resonante = 0.5 * qst[:, None] * (np.sin(wt) - wt * np.cos(wt))
+        q[validos] = np.where(resonante[:, None], q_resonante, q_estable)
+
+    return {
+        't': t,
+        'q': q,
+        'u': Phi @ q,  # (n_libres, n_t)
+        't_max': t_max,
+        'omega_exc': omega_exc,
+        'dof_libres_nums': resultados_modales['dof_libres']
+    }
+
+# --- Integración Directa en el Tiempo (Movimiento Relativo a la Base) ---
+
+def coeficientes_rayleigh(zeta, omega_1, omega_2=None):
+    """a0, a1 de C = a0 M + a1 K con razón de amortiguamiento ζ en ω1 y ω2 (o solo en ω1)"""
+    if zeta <= 0 or omega_1 <= 0:
+        return 0.0, 0.0
+    if omega_2 is None or omega_2 <= omega_1:
+        return zeta * omega_1, zeta / omega_1
+    return 2 * zeta * omega_1 * omega_2 / (omega_1 + omega_2), 2 * zeta / (omega_1 + omega_2)
+
+def preparar_integracion_base(resultados_modales, gdl_restringidos_base_idx):
+    """
+    Ecuación de movimiento relativo a la base para los GL libres.
+
+    Con u_x = r·u_g + u_rel y r el vector de influencia pseudo-estático (K_xx r = -K_xy d):
+        M_xx ü_rel + C u̇_rel + K_xx u_rel = -(M_xx r + M_xy d)·a_g(t) = l·a_g(t)
+    La aceleración absoluta de los GL libres es ü_rel + r·a_g.
+    """
+    carga_base = preparar_carga_base(resultados_modales, gdl_restringidos_base_idx)
+    K_libre, M_libre = carga_base['K_libre'], carga_base['M_libre']
+    r = -factorizar_matriz_simetrica(K_libre)['resolver'](carga_base['p_k']) if np.any(carga_base['p_k']) \
+        else np.zeros(K_libre.shape[0])
+    return {
+        'K_libre': K_libre,
+        'M_libre': M_libre,
+        'r': r,
+        'l': -(np.asarray(M_libre @ r).ravel() + carga_base['p_m'])
+    }
+
+def integrar_newmark_hht(K, M, l, t, a_g, a0=0.0, a1=0.0, alfa=0.0, indices_salida=None, permutacion=None):
+    """
+    Integración implícita de M ü + C u̇ + K u = l·a_g(t), C = a0 M + a1 K, desde el reposo.
+
+    HHT-α (α ∈ [0, 1/3], β = (1+α)²/4, γ = 1/2 + α); α = 0 es Newmark de aceleración media.
+    La rigidez efectiva K̂ = M/(βΔt²) + (1-α)γ/(βΔt)·C + (1-α)K se factoriza una sola vez por
+    cada paso Δt distinto del registro; cada paso es un producto K·x, uno M·x y una
+    sustitución triangular con la factorización reutilizada.
+
+    Deducción del paso en Δu = u₊ - u (₊ = instante n+1): el equilibrio HHT
+        M a₊ + (1-α)(C v₊ + K u₊) + α(C v + K u) = (1-α) f₊ + α f
+    con las relaciones de Newmark
+        a₊ = Δu/(βΔt²) - v/(βΔt) - (1/(2β) - 1) a
+        v₊ = γ/(βΔt)·Δu + (1 - γ/β) v + Δt(1 - γ/(2β)) a
+    da K̂ Δu = (1-α) f₊ + α f - K u + M (v/(βΔt) + (1/(2β) - 1) a) - C (c_v v + c_a a), con
+        c_v = α + (1-α)(1 - γ/β),   c_a = (1-α) Δt (1 - γ/(2β)).
+
+    Returns:
+        dict: historias (u, ü relativas) de 'indices_salida' (todos si es None) y envolvente max|u| de todos los GL.
+    """
+    t = np.asarray(t, dtype=float)
+    a_g = np.asarray(a_g, dtype=float)
+    n = K.shape[0]
+    indices_salida = np.arange(n) if indices_salida is None else np.asarray(indices_salida, dtype=np.int64)
+    beta, gamma = (1 + alfa)**2 / 4, 0.5 + alfa
+
+    # Coeficientes de C·v_n y C·a_n en el término independiente (ver deducción en el docstring)
+    c_v = alfa + (1 - alfa) * (1 - gamma / beta)
+
+    u, v = np.zeros(n), np.zeros(n)
+    try:
+        a = factorizar_matriz_simetrica(M, permutacion)['resolver'](l * a_g[0]) if a_g[0] != 0 else np.zeros(n)
+    except np.linalg.LinAlgError:
+        a = np.zeros(n)  # Masa singular (GL sin inercia): se arranca con aceleración nula
+
+    historia_u = np.zeros((len(indices_salida), len(t)))
+    historia_a = np.zeros((len(indices_salida), len(t)))
+    historia_a[:, 0] = a[indices_salida]
+    envolvente = np.zeros(n)
+
+    # [K | M] apilada: los dos productos del término independiente en una sola pasada
+    KM = sparse.hstack([K, M]).tocsr() if sparse.issparse(K) else np.hstack([matriz_densa(K), matriz_densa(M)])
+    x = np.empty(2 * n)
+    carga = (1 - alfa) * a_g[1:] + alfa * a_g[:-1]
+    pasos_dt = np.round(np.diff(t), 12)
+
+    factores = {}
+    for paso, dt in enumerate(pasos_dt):
+        if dt not in factores:
+            K_ef = (1 / (beta * dt**2) + (1 - alfa) * gamma * a0 / (beta * dt)) * M \
+                   + (1 - alfa) * (1 + gamma * a1 / (beta * dt)) * K
+            factores[dt] = factorizar_matriz_simetrica(K_ef.tocsr() if sparse.issparse(K_ef) else K_ef, permutacion)['resolver']
+
+        c_a = (1 - alfa) * dt * (1 - gamma / (2 * beta))
+        amortiguado = c_v * v + c_a * a
+        x[:n] = -(u + a1 * amortiguado)
+        x[n:] = v / (beta * dt) + (1 / (2 * beta) - 1) * a - a0 * amortiguado
+        rhs = KM @ x
+        rhs += carga[paso] * l
+        du = factores[dt](rhs)
+
+        a_nueva = du / (beta * dt**2) - v / (beta * dt) - (0.5 / beta - 1) * a
+        v += dt * ((1 - gamma) * a + gamma * a_nueva)
+        a = a_nueva
+        u += du
+
+        historia_u[:, paso + 1] = u[indices_salida]
+        historia_a[:, paso + 1] = a[indices_salida]
+        np.maximum(envolvente, np.abs(u), out=envolvente)
+
+    return {
+        't': t,
+        'u_rel': historia_u,
+        'a_rel': historia_a,
+        'envolvente_u_rel': envolvente,
+        'indices_salida': indices_salida,
+        'factorizaciones': len(factores)
+    }
+
+def paso_estable_diferencia_central(a0=0.0, a1=0.0):
+    """
+    Paso de tiempo estable del integrador explícito a partir de la mayor frecuencia de elemento
+    (cota superior de ω_max global): autovalores en lote (eigvalsh) de D^-½ k D^-½ con D la masa
+    concentrada del elemento. Con amortiguamiento de Rayleigh, Δt = 2/ω·(√(1+ξ²) - ξ).
+    """
+    almacen = st.session_state.matrices_elementos
+    ids = [e['id'] for e in st.session_state.elementos if e['id'] in almacen]
+    filas = almacen.filas(ids)
+    filas = filas[almacen.tiene_masa[filas]]
+    if len(filas) == 0:
+        raise ValueError("No hay matrices de masa de elementos.")
+
+    k = almacen.matrices('numerica', filas)
+    m = almacen.matrices('masa_global', filas)
+    d = np.einsum('nii->ni', m)
+    if np.any(np.abs(m - np.einsum('ni,ij->nij', d, np.eye(m.shape[1]))) > 1e-12 * np.max(np.abs(d))) or np.any(d <= 0):
+        raise ValueError("El integrador explícito requiere masa concentrada (diagonal y positiva): elíjala en el paso 8.")
+
+    escala = 1 / np.sqrt(d)
+    omega_max = np.sqrt(np.max(np.linalg.eigvalsh(k * escala[:, :, None] * escala[:, None, :])))
+    xi = a0 / (2 * omega_max) + a1 * omega_max / 2
+    return FACTOR_SEGURIDAD_PASO_EXPLICITO * 2 / omega_max * (np.sqrt(1 + xi**2) - xi)
+
+def integrar_diferencia_central(K, m, l, t, a_g, a0=0.0, a1=0.0, indices_salida=None):
+    """
+    Integración explícita (diferencia central en forma de salto de rana) de
+    M ü + C u̇ + K u = l·a_g(t) con M = diag(m) y C = a0 M + a1 K, desde el reposo.
+
+    Sin factorizaciones: cada paso es un producto K·x y una división elemento a elemento.
+    La velocidad del término de amortiguamiento se toma en el medio paso anterior. Δt constante.
+    """
+    t = np.asarray(t, dtype=float)
+    a_g = np.asarray(a_g, dtype=float)
+    n = K.shape[0]
+    indices_salida = np.arange(n) if indices_salida is None else np.asarray(indices_salida, dtype=np.int64)
+    dt = t[1] - t[0]
+
+    u, v = np.zeros(n), np.zeros(n)  # v: velocidad en el medio paso
+    a = l * a_g[0] / m
+    historia_u = np.zeros((len(indices_salida), len(t)))
+    historia_a = np.zeros((len(indices_salida), len(t)))
+    historia_a[:, 0] = a[indices_salida]
+    envolvente = np.zeros(n)
+
+    for paso in range(len(t) - 1):
+        v += (0.5 * dt if paso == 0 else dt) * a
+        u += dt * v
+        a = (l * a_g[paso + 1] - K @ (u + a1 * v)) / m - a0 * v
+
+        historia_u[:, paso + 1] = u[indices_salida]
+        historia_a[:, paso + 1] = a[indices_salida]
+        np.maximum(envolvente, np.abs(u), out=envolvente)
+
+    return {
+        't': t,
+        'u_rel': historia_u,
+        'a_rel': historia_a,
+        'envolvente_u_rel': envolvente,
+        'indices_salida': indices_salida,
+        'factorizaciones': 0
+    }
+
+def calcular_integracion_directa(resultados_modales, carga_info, t, a_g, metodo="newmark", alfa=0.0, zeta=0.0, gdl_salida=None):
+    """
+    Respuesta transitoria a un registro de aceleración de base a_g(t) por integración directa
+    (Newmark-β / HHT-α, o diferencia central con masa concentrada y Δt estable automático)
+    con amortiguamiento de Rayleigh ζ en los dos primeros modos. Se guardan las historias de 'gdl_salida' (GL base-1; todos si es None).
+    """
+    try:
+        datos = preparar_integracion_base(resultados_modales, carga_info.get('gdl_aplicados_nums', []))
+        w = np.asarray(resultados_modales['frecuencias_rad'], dtype=float)
+        w = w[np.isfinite(w) & (w > 0)]
+        a0, a1 = coeficientes_rayleigh(zeta, w[0], w[1] if len(w) > 1 else None) if len(w) else (0.0, 0.0)
+
+        indices_salida = None if gdl_salida is None else [resultados_modales['dof_libres'].index(gl) for gl in gdl_salida]
+
+        dt_estable = None
+        if metodo == "diferencia_central":
+            dt_estable = paso_estable_diferencia_central(a0, a1)
+            t = np.asarray(t, dtype=float)
+            if t[1] - t[0] > dt_estable:
+                # Se remuestrea el registro con el paso estable
+                t_fino = np.linspace(t[0], t[-1], int(np.ceil((t[-1] - t[0]) / dt_estable)) + 1)
+                a_g = np.interp(t_fino, t, a_g)
+                t = t_fino
+                st.info(f"Δt reducido a {t[1] - t[0]:.3e} s (paso estable del integrador explícito).")
+            masa = np.asarray(datos['M_libre'].diagonal(), dtype=float)
+            resultado = integrar_diferencia_central(datos['K_libre'], masa, datos['l'], t, a_g, a0=a0, a1=a1,
+                                                    indices_salida=indices_salida)
+        else:
+            resultado = integrar_newmark_hht(
+                datos['K_libre'], datos['M_libre'], datos['l'], t, a_g, a0=a0, a1=a1,
+                alfa=alfa if metodo == "hht" else 0.0, indices_salida=indices_salida,
+                permutacion=obtener_permutacion_gl([gl - 1 for gl in resultados_modales['dof_libres']])
+            )
+        resultado['a_abs'] = resultado['a_rel'] + np.outer(datos['r'][resultado['indices_salida']], a_g)
+        resultado.update({'exito': True, 'metodo': metodo, 'alfa': alfa, 'zeta': zeta, 'a0': a0, 'a1': a1,
+                          'dt_estable': dt_estable, 'dof_libres': resultados_modales['dof_libres']})
+        return resultado
+    except Exception as e:
+        st.error(f"Error en la integración directa: {e}")
+        return None
+
+
+# --- Paneles de Resultados (Paso 11) ---
+# Cada panel es un fragmento: sus widgets solo vuelven a ejecutar el propio panel, no el script completo.
+
+def fragmento(funcion):
+    """st.fragment (o st.experimental_fragment) si la versión de Streamlit lo tiene; si no, la función tal cual"""
+    decorador = getattr(st, 'fragment', None) or getattr(st, 'experimental_fragment', None)
+    return decorador(funcion) if decorador else funcion
+
+@fragmento
+def panel_modo_dinamico(resultado_din):
+    """Selector de modo y su deformada (el resto de la página no se redibuja al cambiar de modo)"""
+    num_modos = len(resultado_din['frecuencias_hz'])
+    modo_seleccionado = st.selectbox(
+        "Seleccione el modo a visualizar",
+        range(1, num_modos + 1),
+        key="modo_visualizacion_selector",
+        format_func=lambda x: f"Modo {x} - f = {resultado_din['frecuencias_hz'][x-1]:.2f} Hz"
+    )
+    
+    idx_modo = modo_seleccionado - 1 
+    
+    st.markdown(f"#### Modo {modo_seleccionado} (Deformada)")
+    # Misma clave que el reporte PDF: una figura ya vista (o ya exportada) no se vuelve a dibujar
+    imagen_modo = imagen_modo_dinamico(idx_modo, factor_escala_modo(resultado_din, idx_modo))
+    if imagen_modo: st.image(imagen_modo, use_container_width=True)
+
+@fragmento
+def panel_respuesta_temporal(resultado_din):
+    """Respuesta temporal modal e integración directa para el GL elegido"""
+    st.markdown("### 1. Respuesta Temporal (Transitorio + Estacionario)")
+    st.info("Gráfico de la respuesta en el tiempo ante la carga armónica definida.")
+    
+    if st.session_state.carga_dinamica_info:
+        # Respuesta unitaria (A = 1) de la etapa 'respuesta_forzada', escalada con la amplitud actual
+        amplitud_base = st.session_state.carga_dinamica_info['amplitud_A']
+        res_forzado_unitario = etapa_respuesta_forzada(resultado_din, st.session_state.carga_dinamica_info)
+        res_forzado = escalar_resultado_lineal(res_forzado_unitario, amplitud_base, CLAVES_LINEALES_RESPUESTA_FORZADA)
+        
+        col_sel1, col_sel2 = st.columns([1, 3])
+        with col_sel1:
+            gdl_plot_time = st.selectbox("GDL para Tiempo:", res_forzado['dof_libres_nums'], format_func=lambda x: f"GL {x}")
+            t_max_plot = st.number_input("T. Max [s]", min_value=VENTANA_MINIMA_RESPUESTA_TEMPORAL,
+                                         max_value=VENTANA_MAXIMA_RESPUESTA_TEMPORAL, value=0.2, step=0.05)
+        
+        with col_sel2:
+            # Respuesta unitaria de todos los GL en caché sobre la ventana máxima: cambiar de GL,
+            # de amplitud o de ventana no recalcula
+            omega_exc = st.session_state.carga_dinamica_info['freq_omega']
+            clave_temporal = res_forzado_unitario['huella']
+            resp_t = st.session_state.respuesta_temporal
+            if resp_t is None or resp_t['clave'] != clave_temporal:
+                resp_t = calcular_respuesta_temporal_modal(resultado_din, res_forzado_unitario['P_0_vector'], omega_exc,
+                                                           VENTANA_MAXIMA_RESPUESTA_TEMPORAL, puntos_respuesta_temporal(resultado_din))
+                resp_t['clave'] = clave_temporal
+                st.session_state.respuesta_temporal = resp_t
+
+            idx_plot = resp_t['dof_libres_nums'].index(gdl_plot_time)
+            en_ventana = resp_t['t'] <= t_max_plot
+            t = resp_t['t'][en_ventana]
+            u_t = amplitud_base * resp_t['u'][idx_plot, en_ventana]
+            if len(t) < NUM_PUNTOS_RESPUESTA_TEMPORAL:
+                st.caption(f"Modelo grande: {len(t)} instantes en la ventana (la respuesta de todos los GL se guarda "
+                           f"con {len(resp_t['t'])} instantes hasta {VENTANA_MAXIMA_RESPUESTA_TEMPORAL:g} s).")
+                    
+            # Gráfico Fijo
+            fig_time, ax_time = plt.subplots(figsize=(10, 6)) 
+            ax_time.plot(t, u_t, label=f"Respuesta GL {gdl_plot_time}", linewidth=1.5)
+            ax_time.set_title(f"Respuesta Temporal - GL {gdl_plot_time}")
+            ax_time.set_xlabel("Tiempo [s]")
+            ax_time.set_ylabel("Desplazamiento [m]")
+            ax_time.grid(True, which='both', linestyle='--', alpha=0.7)
+            ax_time.legend()
+            ax_time.ticklabel_format(axis='y', style='sci', scilimits=(0,0))
+            
+            st.session_state['fig_time_last'] = fig_time
+            st.session_state.setdefault('huellas_figuras_reporte', {})['tiempo'] = (clave_temporal, amplitud_base, gdl_plot_time, t_max_plot)
+            st.pyplot(fig_time, use_container_width=False)
+
+        # --- Integración directa (registro de aceleración de base, con amortiguamiento) ---
+        with st.expander("Integración Directa en el Tiempo (Newmark-β / HHT-α)"):
+            col_i1, col_i2, col_i3, col_i4 = st.columns(4)
+            with col_i1:
+                metodo_integracion = st.selectbox(
+                    "Método:", list(METODOS_INTEGRACION.keys()), format_func=lambda m: METODOS_INTEGRACION[m], key="metodo_integracion"
+                )
+            with col_i2:
+                alfa_hht = st.number_input("α (HHT)", min_value=0.0, max_value=ALFA_HHT_MAXIMO, value=0.05, step=0.01,
+                                           disabled=metodo_integracion != "hht", key="alfa_hht")
+            with col_i3:
+                zeta_pct = st.number_input("ζ Rayleigh [%]", min_value=0.0, max_value=100.0, value=2.0, step=0.5, key="zeta_integracion")
+            with col_i4:
+                dt_integracion = st.number_input("Δt [s]", min_value=1e-7, value=1e-4, format="%.2e", key="dt_integracion")
+
+            origen_registro = st.radio("Registro de aceleración de base:", ["Armónica (carga definida)", "Archivo CSV (t [s], a_g [m/s²])"],
+                                       horizontal=True, key="origen_registro")
+            if origen_registro.startswith("Armónica"):
+                duracion = st.number_input("Duración [s]", min_value=dt_integracion, value=float(t_max_plot), key="duracion_integracion")
+                t_reg = np.arange(0.0, duracion + 0.5 * dt_integracion, dt_integracion)
+                a_reg = st.session_state.carga_dinamica_info['amplitud_A'] * np.sin(omega_exc * t_reg)
+            else:
+                archivo_registro = st.file_uploader("Registro CSV (dos columnas: tiempo, aceleración)", type=["csv", "txt"], key="archivo_registro")
+                t_reg = a_reg = None
+                if archivo_registro is not None:
+                    try:
+                        datos_registro = pd.read_csv(archivo_registro, header=None, sep=None, engine="python").apply(pd.to_numeric, errors="coerce").dropna()
+                        t_orig, a_orig = datos_registro.iloc[:, 0].to_numpy(), datos_registro.iloc[:, 1].to_numpy()
+                        # Se remuestrea a Δt constante: una sola factorización de la rigidez efectiva
+                        t_reg = np.arange(t_orig[0], t_orig[-1] + 0.5 * dt_integracion, dt_integracion)
+                        a_reg = np.interp(t_reg, t_orig, a_orig)
+                    except Exception as e:
+                        st.error(f"No se pudo leer el registro: {e}")
+
+            if st.button("Integrar Respuesta", disabled=t_reg is None, key="btn_integrar"):
+                n_libres = len(res_forzado['dof_libres_nums'])
+                gdl_salida = None if n_libres * len(t_reg) <= MAX_VALORES_HISTORIA_INTEGRACION else [gdl_plot_time]
+                with st.spinner(f"Integrando {len(t_reg) - 1} pasos..."):
+                    st.session_state.resultados_integracion = calcular_integracion_directa(
+                        resultado_din, st.session_state.carga_dinamica_info, t_reg, a_reg,
+                        metodo=metodo_integracion, alfa=alfa_hht, zeta=zeta_pct / 100, gdl_salida=gdl_salida
+                    )
+
+            res_int = st.session_state.resultados_integracion
+            if res_int:
+                gdl_guardados = [res_int['dof_libres'][i] for i in res_int['indices_salida']]
+                if gdl_plot_time in gdl_guardados:
+                    fila = gdl_guardados.index(gdl_plot_time)
+                    fig_int, (ax_u, ax_a) = plt.subplots(2, 1, figsize=(10, 7), sharex=True)
+                    ax_u.plot(res_int['t'], res_int['u_rel'][fila], linewidth=1.0)
+                    ax_u.set_ylabel("Despl. relativo [m]")
+                    ax_u.set_title(f"{METODOS_INTEGRACION[res_int['metodo']]} - GL {gdl_plot_time} (ζ = {100 * res_int['zeta']:.1f}%)")
+                    ax_a.plot(res_int['t'], res_int['a_abs'][fila] / 9.81, color='red', linewidth=1.0)
+                    ax_a.set_ylabel("Aceleración absoluta [g]")
+                    ax_a.set_xlabel("Tiempo [s]")
+                    for ax in (ax_u, ax_a):
+                        ax.grid(True, linestyle='--', alpha=0.7)
+                    st.pyplot(fig_int, use_container_width=False)
+                    plt.close(fig_int)
+                else:
+                    st.info(f"La última integración solo guardó los GL {gdl_guardados}; vuelva a integrar para el GL {gdl_plot_time}.")
+                texto_integracion = (f"Máx. desplazamiento relativo (todos los GL): {np.max(res_int['envolvente_u_rel']):.4e} m · "
+                                     f"{res_int['factorizaciones']} factorización(es) de la rigidez efectiva")
+                if res_int.get('dt_estable') is not None:
+                    texto_integracion += f" · Δt estable (elementos): {res_int['dt_estable']:.3e} s"
+                st.caption(texto_integracion)
+
+@fragmento
+def panel_barrido_frecuencia(resultado_din):
+    """Parámetros, cálculo y curvas del barrido en frecuencia"""
+    st.markdown("### 2. Respuesta en Frecuencia (Barrido)")
+    st.info("Gráficos de Aceleración (g) y Desplazamiento vs Frecuencia de Excitación.")
+    
+    col_b1, col_b2, col_b3, col_b4 = st.columns(4)
+    with col_b1:
+        f_start = st.number_input("Frec. Inicio [Hz]", 0.0, value=0.0)
+    with col_b2:
+        f_end = st.number_input("Frec. Fin [Hz]", value=200.0, min_value=1.0)
+    with col_b3:
+        steps_b = st.number_input("Puntos", 50, 20000, 200)
+    with col_b4:
+        metodo_barrido = st.selectbox(
+            "Método:", list(METODOS_BARRIDO.keys()), format_func=lambda m: METODOS_BARRIDO[m], key="metodo_barrido"
+        )
+    
+    barrido_adaptativo_activo = st.checkbox(
+        "Malla adaptativa (refinar picos; 'Puntos' es el presupuesto total)", value=False, key="barrido_adaptativo"
+    )
+    num_trabajadores, tamano_tramo = None, TAMANO_TRAMO_BARRIDO
+    if metodo_barrido == "paralelo":
+        col_p1, col_p2 = st.columns(2)
+        with col_p1:
+            num_trabajadores = st.number_input("Procesos:", min_value=1, max_value=256, value=os.cpu_count() or 1, key="barrido_trabajadores")
+        with col_p2:
+            tamano_tramo = st.number_input("Frecuencias por tramo:", min_value=1, max_value=10000, value=TAMANO_TRAMO_BARRIDO, key="barrido_tramo")
+    
+    if st.button("Generar Gráficos de Frecuencia"):
+        with st.spinner("Calculando barrido..."):
+            gdl_base = st.session_state.carga_dinamica_info.get('gdl_aplicados_nums', [])
+            etapa_barrido(
+                resultado_din, 
+                st.session_state.carga_dinamica_info, 
+                f_start, f_end, steps_b, gdl_base, metodo=metodo_barrido,
+                num_trabajadores=int(num_trabajadores) if num_trabajadores else None, tamano_tramo=int(tamano_tramo),
+                adaptativo=barrido_adaptativo_activo
+            )
+    
+    # Último barrido de la etapa, válido mientras no cambie el análisis modal; escalado con |A|
+    entrada_barrido = obtener_etapa('barrido', [resultado_din['huella']])
+    if entrada_barrido is not None:
+        res_b = escalar_resultado_lineal(entrada_barrido['valor'], abs(st.session_state.carga_dinamica_info['amplitud_A']),
+                                         CLAVES_LINEALES_BARRIDO)
+        
+        gdl_plot_freq = st.selectbox("Seleccionar GDL para curvas:", res_b['dof_libres'], key="sel_gdl_freq", format_func=lambda x: f"GL {x}")
+        idx_gf = res_b['dof_libres'].index(gdl_plot_freq)
+        
+        # --- 1. Gráfico Aceleración vs Frecuencia (en g) ---
+        fig_acc, ax_acc = plt.subplots(figsize=(10, 6)) # FIJO
+        
+        # Conversión de Unidades
+        g_const = 9.81
+        acc_response_g = res_b['aceleraciones'][:, idx_gf] / g_const
+        acc_input_m_s2 = st.session_state.carga_dinamica_info['amplitud_A']
+        acc_input_g = acc_input_m_s2 / g_const
+        
+        # Plot Respuesta
+        ax_acc.plot(res_b['freqs'], acc_response_g, color='red', linewidth=1.5, label=f"Respuesta (Nodo Extremo GL {gdl_plot_freq})")
+        
+        # Plot Excitación (Línea Punteada Azul)
+        ax_acc.plot(res_b['freqs'], [acc_input_g]*len(res_b['freqs']), color='blue', linestyle='--', linewidth=1.5, label="Excitación (Base)")
+        
+        ax_acc.set_title(f"Respuesta en Frecuencia (Aceleración) - GL {gdl_plot_freq}")
+        ax_acc.set_xlabel("Frecuencia [Hz]")
+        ax_acc.set_ylabel("Aceleración [g]")
+        ax_acc.legend()
+        ax_acc.grid(True, which="both", ls="-", alpha=0.6)
+        
+        st.session_state['fig_acc_last'] = fig_acc
+        st.session_state.setdefault('huellas_figuras_reporte', {})['frecuencia'] = (
+            entrada_barrido['huella'], st.session_state.carga_dinamica_info['amplitud_A'], gdl_plot_freq)
+        st.pyplot(fig_acc, use_container_width=False)
+
+        # --- 2. Gráfico Desplazamiento vs Frecuencia ---
+        fig_disp, ax_disp = plt.subplots(figsize=(10, 6)) # FIJO
+        ax_disp.plot(res_b['freqs'], res_b['desplazamientos'][:, idx_gf], color='blue', linewidth=1.5)
+        ax_disp.set_title(f"Respuesta en Frecuencia (Desplazamiento) - GL {gdl_plot_freq}")
+        ax_disp.set_xlabel("Frecuencia [Hz]")
+        ax_disp.set_ylabel("Desplazamiento [m]")
+        ax_disp.grid(True, which="both", ls="-", alpha=0.6)
+        
+        st.session_state['fig_disp_last'] = fig_disp
+        st.pyplot(fig_disp, use_container_width=False)
+
+@fragmento
+def panel_exportacion_dinamica():
+    """Reportes PDF/Excel del análisis dinámico (generados bajo demanda)"""
+    st.markdown("### Exportar Análisis Dinámico")
+    col_exp1, col_exp2 = st.columns(2)
+    
+    huella_dinamico = huella_reporte_dinamico()
+    with col_exp1:
+        panel_reporte("dinamico", "pdf", generar_pdf_reporte_dinamico, huella_dinamico, "Reporte PDF (Tablas y Gráficos)",
+                      "analisis_dinamico", "application/pdf")
+    with col_exp2:
+        if OPENPYXL_AVAILABLE:
+            panel_reporte("dinamico", "xlsx", generar_excel_reporte_dinamico, huella_dinamico, "Reporte Excel (Estilo Solicitado)",
+                          "analisis_dinamico", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        else:
+            st.warning("Instale 'openpyxl' para exportar a Excel.")
+
+@fragmento
+def panel_exportacion_estatica():
+    """Reportes PDF/Excel del análisis estático (generados bajo demanda)"""
+    st.markdown("### Exportar Análisis Estático")
+    col_exp1, col_exp2 = st.columns(2)
+    huella_estatico = huella_reporte_estatico()
+    with col_exp1:
+        panel_reporte("estatico", "pdf", generar_pdf_reporte_estatico, huella_estatico, "Reporte PDF",
+                      "analisis_estatico", "application/pdf")
+    
+    with col_exp2:
+        if OPENPYXL_AVAILABLE:
+            panel_reporte("estatico", "xlsx", generar_excel_reporte_estatico, huella_estatico, "Reporte Excel",
+                          "analisis_estatico", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        else:
+            st.warning("Instale 'openpyxl' para exportar a Excel.")
+    
+
+@fragmento
+def panel_matrices_dinamicas(resultado_din):
+    """Visores de las matrices globales (K, M) y locales de elementos"""
+    with st.expander("Ver Matrices Globales del Sistema (K y M)"):
+        st.markdown(f"**Matrices Globales (Tamaño: {len(st.session_state.grados_libertad_info)} x {len(st.session_state.grados_libertad_info)})**")
+        K_global_full = resultado_din['K_global']
+        M_global_full = resultado_din['M_global']
+        gl_labels = [f"GL{info['numero']}" for info in st.session_state.grados_libertad_info]
+        
+        if sparse.issparse(K_global_full):
+            st.info(f"Matrices dispersas (K: {K_global_full.nnz} y M: {M_global_full.nnz} valores no nulos). Consulte el reporte Excel para ver todos los coeficientes.")
+        else:
+            st.markdown("#### Matriz de Rigidez Global (K)")
+            df_K_global = pd.DataFrame(K_global_full, columns=gl_labels, index=gl_labels)
+            st.dataframe(df_K_global.applymap(lambda x: f"{x:.3e}"), use_container_width=True)
+
+            st.markdown("#### Matriz de Masa Global (M)")
+            df_M_global = pd.DataFrame(M_global_full, columns=gl_labels, index=gl_labels)
+            st.dataframe(df_M_global.applymap(lambda x: f"{x:.3e}"), use_container_width=True)
+            
+            st.markdown("---")
+            st.markdown(f"**Matrices 'Libres' Usadas en el Solver (Tamaño: {len(resultado_din['dof_libres'])} x {len(resultado_din['dof_libres'])})**")
+            gl_labels_libres = [f"GL{gl_num}" for gl_num in resultado_din['dof_libres']]
+
+            st.markdown("#### Matriz de Rigidez Libre (K_libre)")
+            df_K_libre = pd.DataFrame(resultado_din['K_libre'], columns=gl_labels_libres, index=gl_labels_libres)
+            st.dataframe(df_K_libre.applymap(lambda x: f"{x:.3e}"), use_container_width=True)
+            
+            st.markdown("#### Matriz de Masa Libre (M_libre)")
+            df_M_libre = pd.DataFrame(resultado_din['M_libre'], columns=gl_labels_libres, index=gl_labels_libres)
+            st.dataframe(df_M_libre.applymap(lambda x: f"{x:.3e}"), use_container_width=True)
+
+    with st.expander("Ver Matrices Locales de Elementos (K' y M')"):
+        if st.session_state.tipo_elemento == "viga_portico":
+            labels = ["u1'", "v1'", "θ1'", "u2'", "v2'", "θ2'"]
+        elif st.session_state.tipo_elemento == "viga":
+            labels = ["v1'", "θ1'", "v2'", "θ2'"]
+        else:
+            labels = ["u1'", "v1'", "u2'", "v2'"]
+
+        for elemento in st.session_state.elementos:
+            st.markdown(f"#### Elemento {elemento['id']} (Nodos {elemento['nodo_inicio']} → {elemento['nodo_fin']})")
+            col_k, col_m = st.columns(2)
+            
+            with col_k:
+                st.markdown("**Matriz de Rigidez Local (k')**")
+                matriz_k_local = np.asarray(st.session_state.matrices_elementos[elemento['id']].get('local', []))
+                if matriz_k_local.any():
+                    df_k_local = pd.DataFrame(matriz_k_local, index=labels, columns=labels)
+                    st.dataframe(df_k_local.applymap(lambda x: f"{x:.3e}"))
+            
+            with col_m:
+                st.markdown("**Matriz de Masa Local (m')**")
+                matriz_m_local = np.asarray(st.session_state.matrices_elementos[elemento['id']].get('masa_local', []))
+                if matriz_m_local.any():
+                    df_m_local = pd.DataFrame(matriz_m_local, index=labels, columns=labels)
+                    st.dataframe(df_m_local.applymap(lambda x: f"{x:.3e}"))
+
 
 # -----------------------------------------------------------------
 # 5. INICIALIZACIÓN DE SESSION STATE
@@ -2946,13 +5487,15 @@ if 'nodos' not in st.session_state:
 if 'elementos' not in st.session_state:
     st.session_state.elementos = []
 if 'matrices_elementos' not in st.session_state:
-    st.session_state.matrices_elementos = {}
+    st.session_state.matrices_elementos = AlmacenMatricesElementos()
 if 'grados_libertad_info' not in st.session_state:
     st.session_state.grados_libertad_info = []
 if 'nombres_fuerzas' not in st.session_state:
     st.session_state.nombres_fuerzas = {}
 if 'resultados' not in st.session_state:
     st.session_state.resultados = None
+if 'casos_carga' not in st.session_state:
+    st.session_state.casos_carga = None  # {'nombres': [...], 'valores': (GL, caso)} casos estáticos adicionales
 if 'materiales_personalizados' not in st.session_state:
     st.session_state.materiales_personalizados = {}
 if 'auto_calcular' not in st.session_state:
@@ -2979,19 +5522,46 @@ if 'grupos_elementos' not in st.session_state:
     st.session_state.grupos_elementos = {}
 if 'carga_dinamica_info' not in st.session_state:
     st.session_state.carga_dinamica_info = {}
-if 'resultados_forzados' not in st.session_state:
-    st.session_state.resultados_forzados = None
+if 'etapas_analisis' not in st.session_state:
+    st.session_state.etapas_analisis = {}
+if 'reportes' not in st.session_state:
+    st.session_state.reportes = {}
+if 'respuesta_temporal' not in st.session_state:
+    st.session_state.respuesta_temporal = None
+if 'resultados_integracion' not in st.session_state:
+    st.session_state.resultados_integracion = None
+if 'tipo_masa' not in st.session_state:
+    st.session_state.tipo_masa = "consistente"
+if 'renumeracion_rcm' not in st.session_state:
+    st.session_state.renumeracion_rcm = False
+if 'analisis_incremental' not in st.session_state:
+    st.session_state.analisis_incremental = False
+if 'max_actualizaciones_incrementales' not in st.session_state:
+    st.session_state.max_actualizaciones_incrementales = MAX_ACTUALIZACIONES_INCREMENTALES
+if 'base_incremental' not in st.session_state:
+    st.session_state.base_incremental = None  # Última factorización completa de K_uu (reanálisis incremental)
+if 'modificaciones_elementos' not in st.session_state:
+    st.session_state.modificaciones_elementos = []  # ΔK de elementos editados desde la base
+if 'rango_gl_rcm' not in st.session_state:
+    st.session_state.rango_gl_rcm = None
 
 
 # -----------------------------------------------------------------
 # 6. NAVEGACIÓN DE LA APLICACIÓN (LÓGICA DE PÁGINA)
 # -----------------------------------------------------------------
 
+# Los procesos de los pools (figuras, barrido) importan este script como '__mp_main__' solo
+# para obtener sus funciones: no dibujan la UI (no tienen sesión)
+PROCESO_TRABAJADOR = __name__ == '__mp_main__'
+
 # Llamar a las funciones de UI (definidas en la Parte 1)
-mostrar_barra_progreso()
-mostrar_sidebar_mejorado()
+if not PROCESO_TRABAJADOR:
+    mostrar_barra_progreso()
+    mostrar_sidebar_mejorado()
 
-if st.session_state.step == 0:
+if PROCESO_TRABAJADOR:
+    pass
+elif st.session_state.step == 0:
     st.markdown("""
     <div style='background: linear-gradient(135deg, #2d3748 0%, #4a5568 100%); 
                 min-height: 80vh; display: flex; align-items: center; justify-content: center; 
@@ -3159,11 +5729,12 @@ elif st.session_state.step == 5 and st.session_state.modo == "manual":
     
     nodos_actualizados = []
     if st.session_state.modo == "manual":
+        nodos_por_id = {n['id']: n for n in st.session_state.nodos}
         for i in range(st.session_state.num_nodos):
             nodo_id = i + 1
             
             # Obtener datos previos si existen
-            nodo_existente = next((n for n in st.session_state.nodos if n['id'] == nodo_id), {})
+            nodo_existente = nodos_por_id.get(nodo_id, {})
             x = nodo_existente.get('x', 0.0)
             y = nodo_existente.get('y', 0.0)
             
@@ -3194,9 +5765,10 @@ elif st.session_state.step == 6 and st.session_state.modo == "manual":
         st.stop()
         
     nodos_clasificados = []
+    nodos_por_id = {n['id']: n for n in st.session_state.nodos}
     for i in range(st.session_state.num_nodos):
         nodo_id = i + 1
-        nodo_actual = next((n for n in st.session_state.nodos if n['id'] == nodo_id), None)
+        nodo_actual = nodos_por_id.get(nodo_id)
         
         if not nodo_actual:
             st.error(f"Datos del Nodo {nodo_id} incompletos. Por favor, revise los pasos anteriores.")
@@ -3224,7 +5796,7 @@ elif st.session_state.step == 7 and st.session_state.modo == "manual":
         st.session_state.num_elementos = num_elementos
         # Resetear elementos si el número cambia
         st.session_state.elementos = []
-        st.session_state.matrices_elementos = {}
+        st.session_state.matrices_elementos = AlmacenMatricesElementos()
         next_step()
 
 # --- LÓGICA MODO INTERACTIVO ---
@@ -3438,68 +6010,35 @@ elif st.session_state.step == 8:
                     if st.button(f"💾 Aplicar a Grupo '{nombre_grupo}'", key=f"aplicar_grupo_{nombre_grupo}"):
                         elementos_grupo_ids = info_grupo['elementos']
                         # No usamos props_material['modulo_young'] directamente, usamos el input
+                        elementos_por_id = {e['id']: e for e in st.session_state.elementos}
+                        
+                        area_final = calcular_area_seccion(tipo_seccion_grupo, parametros_grupo)
+                        inercia_final = calcular_momento_inercia(tipo_seccion_grupo, parametros_grupo) if st.session_state.tipo_elemento in ["viga", "viga_portico"] else 0
                         
+                        elementos_grupo = []
                         for elemento_id in elementos_grupo_ids:
-                            elemento_idx = next((i for i, e in enumerate(st.session_state.elementos) if e['id'] == elemento_id), None)
-                            if elemento_idx is None:
+                            elem = elementos_por_id.get(elemento_id)
+                            if elem is None:
                                 continue 
 
                             # Actualizar propiedades del elemento
-                            elem = st.session_state.elementos[elemento_idx]
                             elem['material'] = material_grupo
                             elem['tipo_seccion'] = tipo_seccion_grupo
                             elem['parametros_seccion'] = parametros_grupo
-                            
-                            area_final = calcular_area_seccion(tipo_seccion_grupo, parametros_grupo)
-                            inercia_final = calcular_momento_inercia(tipo_seccion_grupo, parametros_grupo) if st.session_state.tipo_elemento in ["viga", "viga_portico"] else 0
-                            
                             elem['area'] = area_final
                             elem['inercia'] = inercia_final
+                            # --- USO DEL NUEVO VALOR ---
+                            elem['modulo_young'] = modulo_young_grupo
                             
                             if st.session_state.tipo_analisis == "dinamico":
                                 elem['densidad'] = densidad_grupo
                             else:
                                 # Si es estático, actualizamos densidad por consistencia aunque no se use en K
                                 elem['densidad'] = todos_materiales[material_grupo].get('densidad', 2700)
-                            
-                            # Recalcular matrices
-                            nodo_inicio_obj = next(n for n in st.session_state.nodos if n['id'] == elem['nodo_inicio'])
-                            nodo_fin_obj = next(n for n in st.session_state.nodos if n['id'] == elem['nodo_fin'])
-                            
-                            elem['longitud'] = calcular_longitud_elemento(nodo_inicio_obj, nodo_fin_obj)
-                            elem['beta'] = calcular_angulo_beta(nodo_inicio_obj, nodo_fin_obj)
-                            
-                            # --- USO DEL NUEVO VALOR ---
-                            E = modulo_young_grupo
-                            # ---------------------------
-                            
-                            A, I, L, beta = elem['area'], elem['inercia'], elem['longitud'], elem['beta']
-                            
-                            k_global, k_local, m_global, m_local = None, None, None, None
-                            
-                            if st.session_state.tipo_elemento == "barra":
-                                k_global, k_local = generar_matriz_rigidez_barra(E, A, L, beta)
-                                if st.session_state.tipo_analisis == "dinamico":
-                                    m_local = generar_matriz_masa_barra(elem['densidad'], A, L)
-                                    m_global = m_local 
-                            elif st.session_state.tipo_elemento == "viga":
-                                k_global, k_local = generar_matriz_rigidez_viga(E, I, L)
-                                if st.session_state.tipo_analisis == "dinamico":
-                                    m_local = generar_matriz_masa_viga(elem['densidad'], A, L)
-                                    m_global = m_local
-                            else: # viga_portico
-                                k_global, k_local = generar_matriz_rigidez_viga_portico(E, A, I, L, beta)
-                                if st.session_state.tipo_analisis == "dinamico":
-                                    m_local = generar_matriz_masa_viga_portico(elem['densidad'], A, L)
-                                    T = generar_matriz_transformacion_viga_portico(beta)
-                                    m_global = T.T @ m_local @ T
-
-                            st.session_state.matrices_elementos[elemento_id] = {
-                                'numerica': k_global.tolist() if k_global is not None else [],
-                                'local': k_local.tolist() if k_local is not None else [],
-                                'masa_global': m_global.tolist() if m_global is not None else [],
-                                'masa_local': m_local.tolist() if m_local is not None else []
-                            }
+                            elementos_grupo.append(elem)
+                        
+                        # Recalcular matrices de todo el grupo en lote
+                        recalcular_matrices_elementos(elementos_grupo)
                         
                         st.success(f"✅ Configuración aplicada a {len(elementos_grupo_ids)} elementos. E = {modulo_young_grupo:.2e} Pa")
                         st.rerun()
@@ -3588,41 +6127,12 @@ elif st.session_state.step == 8:
                 if st.session_state.tipo_analisis == "dinamico":
                     elem['densidad'] = densidad_sel
                 
-                # Propiedades geométricas (ya deben existir desde el modo interactivo o manual)
-                nodo_inicio_obj = next(n for n in st.session_state.nodos if n['id'] == elem['nodo_inicio'])
-                nodo_fin_obj = next(n for n in st.session_state.nodos if n['id'] == elem['nodo_fin'])
-                
-                elem['longitud'] = calcular_longitud_elemento(nodo_inicio_obj, nodo_fin_obj)
-                elem['beta'] = calcular_angulo_beta(nodo_inicio_obj, nodo_fin_obj)
+                elem['modulo_young'] = props_material['modulo_young']
                 
-                E = props_material['modulo_young']
-                A, I, L, beta = elem['area'], elem['inercia'], elem['longitud'], elem['beta']
-                
-                k_global, k_local, m_global, m_local = None, None, None, None
-                
-                if st.session_state.tipo_elemento == "barra":
-                    k_global, k_local = generar_matriz_rigidez_barra(E, A, L, beta)
-                    if st.session_state.tipo_analisis == "dinamico":
-                        m_local = generar_matriz_masa_barra(elem['densidad'], A, L)
-                        m_global = m_local # Placeholder
-                elif st.session_state.tipo_elemento == "viga":
-                    k_global, k_local = generar_matriz_rigidez_viga(E, I, L)
-                    if st.session_state.tipo_analisis == "dinamico":
-                        m_local = generar_matriz_masa_viga(elem['densidad'], A, L)
-                        m_global = m_local
-                else: # viga_portico
-                    k_global, k_local = generar_matriz_rigidez_viga_portico(E, A, I, L, beta)
-                    if st.session_state.tipo_analisis == "dinamico":
-                        m_local = generar_matriz_masa_viga_portico(elem['densidad'], A, L)
-                        T = generar_matriz_transformacion_viga_portico(beta)
-                        m_global = T.T @ m_local @ T
-
-                st.session_state.matrices_elementos[elemento_id] = {
-                    'numerica': k_global.tolist() if k_global is not None else [],
-                    'local': k_local.tolist() if k_local is not None else [],
-                    'masa_global': m_global.tolist() if m_global is not None else [],
-                    'masa_local': m_local.tolist() if m_local is not None else []
-                }
+                # Propiedades geométricas y matrices (misma ruta en lote que los grupos)
+                recalcular_matrices_elementos([elem])
+                st.session_state.resultados = None
+                st.session_state.resultados_dinamicos = None
                 
                 st.success(f"✅ Elemento {elemento_id} guardado")
                 st.rerun()
@@ -3635,6 +6145,46 @@ elif st.session_state.step == 8:
         df_elementos = crear_tabla_conectividad()
         st.dataframe(df_elementos, use_container_width=True)
         
+        if st.button("🔄 Recalcular Matrices de Todos los Elementos", key="recalcular_todos"):
+            elementos_a_recalcular = [e for e in st.session_state.elementos if e.get('material') is not None]
+            recalcular_matrices_elementos(elementos_a_recalcular)
+            st.success(f"✅ Matrices recalculadas para {len(elementos_a_recalcular)} elementos")
+        
+        if st.session_state.tipo_analisis == "dinamico":
+            tipo_masa = st.selectbox(
+                "Matriz de masa de los elementos:", list(TIPOS_MASA.keys()), format_func=lambda t: TIPOS_MASA[t],
+                index=list(TIPOS_MASA.keys()).index(st.session_state.tipo_masa),
+                help="La masa concentrada (diagonal) permite la integración explícita por diferencia central (paso 11)."
+            )
+            if tipo_masa != st.session_state.tipo_masa:
+                st.session_state.tipo_masa = tipo_masa
+                recalcular_matrices_elementos([e for e in st.session_state.elementos if e.get('material') is not None])
+                st.session_state.resultados_dinamicos = None
+        
+        st.session_state.renumeracion_rcm = st.checkbox(
+            "Renumerar GL internamente (Cuthill–McKee inverso) para reducir el ancho de banda",
+            value=st.session_state.renumeracion_rcm,
+            help="Los números de GL mostrados no cambian. En modelos grandes con perfil estrecho se usan solvers en banda. "
+                 "El número de modos extraídos se controla en las opciones del solver modal (paso 11)."
+        )
+        
+        if st.session_state.tipo_analisis == "estatico":
+            col_inc1, col_inc2 = st.columns([2, 1])
+            with col_inc1:
+                st.session_state.analisis_incremental = st.checkbox(
+                    "Reanálisis incremental tras editar elementos (Sherman–Morrison–Woodbury)",
+                    value=st.session_state.analisis_incremental,
+                    help="Cada elemento guardado es una actualización de rango ≤ 6 de K: el siguiente cálculo estático "
+                         "reutiliza la última factorización en lugar de refactorizar."
+                )
+            with col_inc2:
+                st.session_state.max_actualizaciones_incrementales = st.number_input(
+                    "Elementos antes de refactorizar:", min_value=1, max_value=100,
+                    value=st.session_state.max_actualizaciones_incrementales, disabled=not st.session_state.analisis_incremental
+                )
+            if st.session_state.analisis_incremental and st.session_state.base_incremental is not None:
+                st.caption(f"Elementos editados desde la última factorización: {len(st.session_state.modificaciones_elementos)}")
+        
         if elementos_configurados:
             if st.button("Continuar →", type="primary"):
                 calcular_y_asignar_grados_libertad() # Recalcular GLs por si acaso
@@ -3654,10 +6204,11 @@ elif st.session_state.step == 9:
             st.stop()
 
         # Crear tabla para entrada de datos
+        modelo = obtener_modelo_estructural()
         data_gl = []
         for info in st.session_state.grados_libertad_info:
             # Obtener el nodo y dirección correspondiente
-            nodo_obj = next(n for n in st.session_state.nodos if n['id'] == info['nodo'])
+            nodo_obj = modelo.nodo(info['nodo'])
             direccion = info['direccion']
             
             # Determinar si es fijo
@@ -3699,11 +6250,55 @@ elif st.session_state.step == 9:
             hide_index=True
         )
 
+        # --- Casos de carga adicionales (misma partición de GL, una sola factorización) ---
+        edited_df_casos = None
+        with st.expander("📑 Casos de Carga Adicionales", expanded=bool(st.session_state.casos_carga)):
+            st.markdown("El **Caso 1** es el de la tabla anterior. En cada caso adicional el valor es la fuerza aplicada en los GL "
+                        "de fuerza conocida y el desplazamiento impuesto en los GL de desplazamiento conocido.")
+            casos_previos = st.session_state.casos_carga
+            num_casos_adicionales = st.number_input(
+                "Número de casos adicionales:", min_value=0, max_value=500,
+                value=len(casos_previos['nombres']) if casos_previos else 0, key="num_casos_adicionales"
+            )
+            if num_casos_adicionales > 0:
+                data_casos = {
+                    'GL': [fila['GL'] for fila in data_gl],
+                    'Conocido': ["Despl." if fila['Despl. Conocido'] else "Fuerza" for fila in data_gl]
+                }
+                for k in range(int(num_casos_adicionales)):
+                    nombre_caso = f"Caso {k + 2}"
+                    if casos_previos and nombre_caso in casos_previos['nombres'] and casos_previos['valores'].shape[0] >= len(data_gl):
+                        columna = casos_previos['valores'][:, casos_previos['nombres'].index(nombre_caso)]
+                        data_casos[nombre_caso] = [columna[fila['GL'] - 1] for fila in data_gl]
+                    else:
+                        data_casos[nombre_caso] = [0.0] * len(data_gl)
+                edited_df_casos = st.data_editor(
+                    pd.DataFrame(data_casos),
+                    column_config={
+                        "GL": st.column_config.TextColumn("Grado de Libertad", disabled=True),
+                        "Conocido": st.column_config.TextColumn("Valor conocido", disabled=True)
+                    },
+                    use_container_width=True,
+                    hide_index=True,
+                    key="editor_casos_carga"
+                )
+
         if st.button("Continuar →", type="primary"):
+            # Guardar los casos adicionales como bloque (GL, caso) indexado por número de GL
+            if edited_df_casos is not None:
+                nombres_casos = [c for c in edited_df_casos.columns if c not in ('GL', 'Conocido')]
+                valores_casos = np.zeros((len(st.session_state.grados_libertad_info), len(nombres_casos)))
+                valores_casos[edited_df_casos['GL'].astype(int).to_numpy() - 1] = edited_df_casos[nombres_casos].to_numpy(dtype=float)
+                st.session_state.casos_carga = {'nombres': nombres_casos, 'valores': valores_casos}
+            else:
+                st.session_state.casos_carga = None
+            st.session_state.resultados = None
+            
             # Actualizar el estado de la sesión con los datos editados
+            info_por_gl = {info['numero']: info for info in st.session_state.grados_libertad_info}
             for index, row in edited_df_gl.iterrows():
                 gl_num = int(row['GL'])
-                info_gl = next(info for info in st.session_state.grados_libertad_info if info['numero'] == gl_num)
+                info_gl = info_por_gl[gl_num]
                 
                 info_gl['desplazamiento_conocido'] = row['Despl. Conocido']
                 info_gl['valor_desplazamiento'] = row['Valor Despl. [m o rad]'] if row['Despl. Conocido'] else 0.0
@@ -3800,9 +6395,10 @@ elif st.session_state.step == 10:
     
     gl_restringidos_info = []
     if 'condiciones_contorno_dinamica' in st.session_state:
+        info_por_gl = {info['numero']: info for info in st.session_state.grados_libertad_info}
         for gl_num, restringido in st.session_state.condiciones_contorno_dinamica.items():
             if restringido:
-                info = next((info for info in st.session_state.grados_libertad_info if info['numero'] == gl_num), None)
+                info = info_por_gl.get(gl_num)
                 if info:
                     gl_restringidos_info.append(info)
     
@@ -3840,8 +6436,7 @@ elif st.session_state.step == 10:
                 "freq_omega": freq_omega,
                 "gdl_aplicados_nums": gdl_aplicados_nums
             }
-            if 'resultados_forzados' in st.session_state:
-                st.session_state.resultados_forzados = None
+            st.session_state.resultados_integracion = None
             next_step()
 
 # --- PASO 11  ---
@@ -3871,12 +6466,34 @@ elif st.session_state.step == 11:
         if st.session_state.resultados and st.session_state.resultados.get('exito'):
             resultado_estatico = st.session_state.resultados
             
+            nombres_casos = resultado_estatico.get('nombres_casos', ['Caso 1'])
+            if len(nombres_casos) > 1:
+                caso_activo = st.selectbox(
+                    "Caso de carga:", range(len(nombres_casos)), format_func=lambda k: nombres_casos[k],
+                    index=resultado_estatico['caso_activo'], key="selector_caso_carga"
+                )
+                if caso_activo != resultado_estatico['caso_activo']:
+                    # Tablas, gráficos y reportes leen 'desplazamientos'/'fuerzas' del caso activo
+                    resultado_estatico['caso_activo'] = caso_activo
+                    resultado_estatico['desplazamientos'] = resultado_estatico['desplazamientos_casos'][:, caso_activo]
+                    resultado_estatico['fuerzas'] = resultado_estatico['fuerzas_casos'][:, caso_activo]
+                with st.expander("Resumen de Casos de Carga"):
+                    st.dataframe(pd.DataFrame({
+                        'Caso': nombres_casos,
+                        'Máx. |Desplazamiento| [m o rad]': np.max(np.abs(resultado_estatico['desplazamientos_casos']), axis=0),
+                        'Máx. |Fuerza| [N o Nm]': np.max(np.abs(resultado_estatico['fuerzas_casos']), axis=0)
+                    }), use_container_width=True, hide_index=True)
+            
             st.markdown("### Métricas Principales")
-            col1, col2, col3, col4 = st.columns(4)
+            col1, col2, col3, col4, col5 = st.columns(5)
             with col1: st.metric("Nodos", len(st.session_state.nodos))
             with col2: st.metric("Elementos", len(st.session_state.elementos))
             with col3: st.metric("DOF Libres", len(st.session_state.grados_libertad_info))
-            with col4: st.metric("Determinante K", f"{resultado_estatico['determinante']:.3e}")
+            with col4: st.metric("log₁₀ |det K_uu|", f"{resultado_estatico['log10_determinante']:.2f}")
+            with col5: st.metric("κ₁(K_uu) ≈", f"{resultado_estatico['condicion']:.2e}",
+                                 help="Estimación del número de condición en norma 1 (onenormest) con la misma factorización")
+            if resultado_estatico.get('tipo_factorizacion'):
+                st.caption(f"Factorización de K_uu: {resultado_estatico['tipo_factorizacion']}")
             
             st.divider()
             
@@ -3920,21 +6537,7 @@ elif st.session_state.step == 11:
             
             st.divider()
             
-            st.markdown("### Exportar Análisis Estático")
-            col_exp1, col_exp2 = st.columns(2)
-            with col_exp1:
-                pdf_reporte_estatico = generar_pdf_reporte_estatico()
-                if pdf_reporte_estatico:
-                    st.download_button(label="Descargar Reporte PDF", data=pdf_reporte_estatico, file_name=f"analisis_estatico_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf", mime="application/pdf", type="primary", use_container_width=True)
-            
-            with col_exp2:
-                if OPENPYXL_AVAILABLE:
-                    excel_reporte_estatico = generar_excel_reporte_estatico()
-                    if excel_reporte_estatico:
-                        st.download_button(label="Descargar Reporte Excel", data=excel_reporte_estatico, file_name=f"analisis_estatico_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", type="primary", use_container_width=True)
-                else:
-                    st.warning("Instale 'openpyxl' para exportar a Excel.")
-            
+            panel_exportacion_estatica()
             st.divider()
             
             with st.expander("Ver Tablas de Referencia (Nodos, Elementos, K Global)"):
@@ -3948,22 +6551,60 @@ elif st.session_state.step == 11:
                 
                 st.markdown("#### Matriz de Rigidez Global (K)")
                 K_global = resultado_estatico['K_global']
-                df_K_global = pd.DataFrame(K_global, 
-                                            columns=[f"GL{i+1}" for i in range(K_global.shape[1])],
-                                            index=[f"GL{i+1}" for i in range(K_global.shape[0])])
-                st.dataframe(df_K_global.applymap(lambda x: f"{x:.3e}"), use_container_width=True)
+                if sparse.issparse(K_global):
+                    st.info(f"Matriz dispersa de {K_global.shape[0]} x {K_global.shape[1]} ({K_global.nnz} valores no nulos). Consulte el reporte Excel para ver todos los coeficientes.")
+                else:
+                    df_K_global = pd.DataFrame(K_global, 
+                                                columns=[f"GL{i+1}" for i in range(K_global.shape[1])],
+                                                index=[f"GL{i+1}" for i in range(K_global.shape[0])])
+                    st.dataframe(df_K_global.applymap(lambda x: f"{x:.3e}"), use_container_width=True)
 
     # --- RAMA: ANÁLISIS DINÁMICO ---
     elif st.session_state.tipo_analisis == "dinamico":
         st.markdown("## Resultados del Análisis Dinámico")
         
+        # El análisis modal (y todo lo que depende de él) caduca si cambió alguna etapa del modelo
+        if (st.session_state.resultados_dinamicos and
+                st.session_state.resultados_dinamicos.get('huella_ensamblaje') != huellas_modelo()['ensamblaje']):
+            st.session_state.resultados_dinamicos = None
+            invalidar_etapa('modal')
+            st.info("El modelo cambió desde el último análisis modal: vuelva a calcular el sistema dinámico.")
+        
         # 1. BOTÓN DE CÁLCULO PRINCIPAL
         if not st.session_state.resultados_dinamicos:
+            with st.expander("⚙️ Opciones del Solver Modal", expanded=False):
+                col_s1, col_s2, col_s3, col_s4 = st.columns(4)
+                with col_s1:
+                    metodo_modal = st.selectbox(
+                        "Método de extracción:", list(METODOS_MODALES.keys()),
+                        format_func=lambda m: METODOS_MODALES[m], key="metodo_modal"
+                    )
+                with col_s2:
+                    num_modos_solver = st.number_input(
+                        "Número de modos (0 = todos en denso):", min_value=0, value=0 if metodo_modal == "denso" else NUM_MODOS_POR_DEFECTO,
+                        step=1, key="num_modos_solver",
+                        help="Se ignora si se define una ventana de frecuencias: se extraen todos los modos de la ventana."
+                    )
+                with col_s3:
+                    frecuencia_minima = st.number_input(
+                        "Frecuencia mínima [Hz]:", min_value=0.0, value=0.0, step=10.0, key="frecuencia_minima_hz"
+                    )
+                with col_s4:
+                    frecuencia_corte = st.number_input(
+                        "Frecuencia máxima [Hz] (0 = sin límite):", min_value=0.0, value=0.0, step=10.0, key="frecuencia_corte_hz"
+                    )
+                st.caption("Lanczos extrae solo los modos más bajos (shift-invert sobre la factorización de K). Con una ventana de frecuencias se extraen solo los modos de la banda; el conteo de Sturm (inercia LDLᵀ de K - σM) garantiza que no falta ninguno.")
+
             if st.button("🧮 Calcular Sistema Dinámico", type="primary", use_container_width=True):
                 if not st.session_state.elementos or not st.session_state.grados_libertad_info:
                     st.error("Faltan definir elementos.")
                 else:
-                    resultado = resolver_sistema_dinamico()
+                    resultado = resolver_sistema_dinamico_cacheado(
+                        metodo=st.session_state.get('metodo_modal', "auto"),
+                        num_modos=int(st.session_state.get('num_modos_solver', 0)) or None,
+                        frecuencia_corte_hz=float(st.session_state.get('frecuencia_corte_hz', 0.0)) or None,
+                        frecuencia_minima_hz=float(st.session_state.get('frecuencia_minima_hz', 0.0)) or None
+                    )
                     if resultado and resultado.get('exito'):
                         st.session_state.resultados_dinamicos = resultado
                         st.rerun()
@@ -3975,10 +6616,20 @@ elif st.session_state.step == 11:
             
             # --- MÉTRICAS ---
             col1, col2, col3, col4 = st.columns(4)
-            col1.metric("Modo 1", f"{resultado_din['frecuencias_hz'][0]:.2f} Hz")
-            col2.metric("Modo 2", f"{resultado_din['frecuencias_hz'][1]:.2f} Hz")
-            col3.metric("Modo 3", f"{resultado_din['frecuencias_hz'][2]:.2f} Hz")
+            for i, col in enumerate([col1, col2, col3]):
+                if i < len(resultado_din['frecuencias_hz']):
+                    col.metric(f"Modo {i+1}", f"{resultado_din['frecuencias_hz'][i]:.2f} Hz")
+                else:
+                    col.metric(f"Modo {i+1}", "—")
             col4.metric("Total Modos", len(resultado_din['frecuencias_hz']))
+            texto_metodo = f"Método modal: {resultado_din.get('metodo_modal', 'denso')}"
+            if resultado_din.get('modos_sturm') is not None:
+                texto_metodo += (f" · Conteo de Sturm: {resultado_din['modos_sturm']} modos en la ventana"
+                                 f" ({len(resultado_din['frecuencias_hz'])} extraídos)")
+            st.caption(texto_metodo)
+            if resultado_din.get('modos_sturm') is None and len(resultado_din['frecuencias_hz']) < len(resultado_din['dof_libres']):
+                st.info(f"Se muestran los {len(resultado_din['frecuencias_hz'])} modos más bajos de {len(resultado_din['dof_libres'])} GL libres. "
+                        "Para obtener todos, elija 'Denso simétrico' con 0 modos en las opciones del solver modal.")
             st.divider()
 
             # --- TABLA DE MODOS ---
@@ -3988,32 +6639,8 @@ elif st.session_state.step == 11:
 
             # --- VISUALIZACIÓN DE MODOS ---
             st.markdown("### Visualización de Modos")
-            num_modos = len(resultado_din['frecuencias_hz'])
-
-            if num_modos > 0:
-                modo_seleccionado = st.selectbox(
-                    "Seleccione el modo a visualizar",
-                    range(1, num_modos + 1),
-                    key="modo_visualizacion_selector",
-                    format_func=lambda x: f"Modo {x} - f = {resultado_din['frecuencias_hz'][x-1]:.2f} Hz"
-                )
-                
-                idx_modo = modo_seleccionado - 1 
-                f_modo = resultado_din['frecuencias_hz'][idx_modo]
-                
-                # Cálculo de factor escala automático para visualización
-                factor_escala = None 
-                try:
-                    max_despl = np.max(np.abs(resultado_din['eigenvectors'][:, idx_modo]))
-                    if max_despl > 1e-9:
-                        rango_x = max([n['x'] for n in st.session_state.nodos]) if st.session_state.nodos else 1.0
-                        factor_escala = (0.15 * rango_x) / max_despl
-                        factor_escala = max(1, min(factor_escala, 1000))
-                    else:
-                        factor_escala = 1.0
-                except:
-                    factor_escala = 1.0
-                
+
+            if len(resultado_din['frecuencias_hz']) > 0:
                 col_viz1, col_viz2 = st.columns(2) 
                 
                 with col_viz1:
@@ -4022,209 +6649,29 @@ elif st.session_state.step == 11:
                     if fig_orig: st.pyplot(fig_orig, use_container_width=False)
 
                 with col_viz2:
-                    st.markdown(f"#### Modo {modo_seleccionado} (Deformada)")
-                    fig_modo = visualizar_modo_dinamico(idx_modo, factor_escala=factor_escala) 
-                    if fig_modo: st.pyplot(fig_modo, use_container_width=False)
+                    panel_modo_dinamico(resultado_din)
             else:
                 st.warning("No hay modos válidos para visualizar.")
             
             st.divider()
             
             # --- SECCIÓN A: RESPUESTA TEMPORAL ---
-            st.markdown("### 1. Respuesta Temporal (Transitorio + Estacionario)")
-            st.info("Gráfico de la respuesta en el tiempo ante la carga armónica definida.")
-            
-            if st.session_state.carga_dinamica_info:
-                if st.session_state.resultados_forzados is None:
-                    st.session_state.resultados_forzados = calcular_respuesta_armonica_base(
-                        resultado_din, st.session_state.carga_dinamica_info
-                    )
-                
-                res_forzado = st.session_state.resultados_forzados
-                
-                col_sel1, col_sel2 = st.columns([1, 3])
-                with col_sel1:
-                    gdl_plot_time = st.selectbox("GDL para Tiempo:", res_forzado['dof_libres_nums'], format_func=lambda x: f"GL {x}")
-                    t_max_plot = st.number_input("T. Max [s]", value=0.2, step=0.05)
-                
-                with col_sel2:
-                    # Cálculo del gráfico temporal
-                    omega_exc = st.session_state.carga_dinamica_info['freq_omega']
-                    idx_plot = res_forzado['dof_libres_nums'].index(gdl_plot_time)
-                    Phi = resultado_din['eigenvectors']
-                    P_0 = res_forzado['P_0_vector']
-                    freqs_n = resultado_din['frecuencias_rad']
-                    M_libre = resultado_din['M_libre']
-                    
-                    t = np.linspace(0, t_max_plot, 1000)
-                    u_t = np.zeros_like(t)
-                    
-                    for i in range(Phi.shape[1]):
-                        phi = Phi[:, i]
-                        wn = freqs_n[i]
-                        m_gen = phi.T @ M_libre @ phi
-                        k_gen = m_gen * (wn**2)
-                        f_gen = phi.T @ P_0
-                        
-                        if k_gen > 1e-9:
-                            qst = f_gen/k_gen
-                            if abs(omega_exc - wn) < 1e-2:
-                                qt = 0.5 * qst * (np.sin(wn*t) - wn*t*np.cos(wn*t))
-                            else:
-                                beta = omega_exc/wn
-                                daf = 1/(1-beta**2)
-                                qt = qst * daf * (np.sin(omega_exc*t) - beta*np.sin(wn*t))
-                            u_t += phi[idx_plot] * qt
-                            
-                    # Gráfico Fijo
-                    fig_time, ax_time = plt.subplots(figsize=(10, 6)) 
-                    ax_time.plot(t, u_t, label=f"Respuesta GL {gdl_plot_time}", linewidth=1.5)
-                    ax_time.set_title(f"Respuesta Temporal - GL {gdl_plot_time}")
-                    ax_time.set_xlabel("Tiempo [s]")
-                    ax_time.set_ylabel("Desplazamiento [m]")
-                    ax_time.grid(True, which='both', linestyle='--', alpha=0.7)
-                    ax_time.legend()
-                    ax_time.ticklabel_format(axis='y', style='sci', scilimits=(0,0))
-                    
-                    st.session_state['fig_time_last'] = fig_time
-                    st.pyplot(fig_time, use_container_width=False)
+            panel_respuesta_temporal(resultado_din)
 
             st.divider()
 
             # --- SECCIÓN B: RESPUESTA EN FRECUENCIA (BARRIDO) ---
-            st.markdown("### 2. Respuesta en Frecuencia (Barrido)")
-            st.info("Gráficos de Aceleración (g) y Desplazamiento vs Frecuencia de Excitación.")
-            
-            col_b1, col_b2, col_b3 = st.columns(3)
-            with col_b1:
-                f_start = st.number_input("Frec. Inicio [Hz]", 0.0, value=0.0)
-            with col_b2:
-                f_end = st.number_input("Frec. Fin [Hz]", value=200.0, min_value=1.0)
-            with col_b3:
-                steps_b = st.number_input("Puntos", 50, 2000, 200)
-            
-            if st.button("Generar Gráficos de Frecuencia"):
-                with st.spinner("Calculando barrido..."):
-                    gdl_base = st.session_state.carga_dinamica_info.get('gdl_aplicados_nums', [])
-                    res_barrido = calcular_barrido_frecuencia(
-                        resultado_din, 
-                        st.session_state.carga_dinamica_info, 
-                        f_start, f_end, steps_b, gdl_base
-                    )
-                    st.session_state['res_barrido'] = res_barrido
-            
-            if 'res_barrido' in st.session_state:
-                res_b = st.session_state['res_barrido']
-                
-                gdl_plot_freq = st.selectbox("Seleccionar GDL para curvas:", res_b['dof_libres'], key="sel_gdl_freq", format_func=lambda x: f"GL {x}")
-                idx_gf = res_b['dof_libres'].index(gdl_plot_freq)
-                
-                # --- 1. Gráfico Aceleración vs Frecuencia (en g) ---
-                fig_acc, ax_acc = plt.subplots(figsize=(10, 6)) # FIJO
-                
-                # Conversión de Unidades
-                g_const = 9.81
-                acc_response_g = res_b['aceleraciones'][:, idx_gf] / g_const
-                acc_input_m_s2 = st.session_state.carga_dinamica_info['amplitud_A']
-                acc_input_g = acc_input_m_s2 / g_const
-                
-                # Plot Respuesta
-                ax_acc.plot(res_b['freqs'], acc_response_g, color='red', linewidth=1.5, label=f"Respuesta (Nodo Extremo GL {gdl_plot_freq})")
-                
-                # Plot Excitación (Línea Punteada Azul)
-                ax_acc.plot(res_b['freqs'], [acc_input_g]*len(res_b['freqs']), color='blue', linestyle='--', linewidth=1.5, label="Excitación (Base)")
-                
-                ax_acc.set_title(f"Respuesta en Frecuencia (Aceleración) - GL {gdl_plot_freq}")
-                ax_acc.set_xlabel("Frecuencia [Hz]")
-                ax_acc.set_ylabel("Aceleración [g]")
-                ax_acc.legend()
-                ax_acc.grid(True, which="both", ls="-", alpha=0.6)
-                
-                st.session_state['fig_acc_last'] = fig_acc
-                st.pyplot(fig_acc, use_container_width=False)
-
-                # --- 2. Gráfico Desplazamiento vs Frecuencia ---
-                fig_disp, ax_disp = plt.subplots(figsize=(10, 6)) # FIJO
-                ax_disp.plot(res_b['freqs'], res_b['desplazamientos'][:, idx_gf], color='blue', linewidth=1.5)
-                ax_disp.set_title(f"Respuesta en Frecuencia (Desplazamiento) - GL {gdl_plot_freq}")
-                ax_disp.set_xlabel("Frecuencia [Hz]")
-                ax_disp.set_ylabel("Desplazamiento [m]")
-                ax_disp.grid(True, which="both", ls="-", alpha=0.6)
-                
-                st.session_state['fig_disp_last'] = fig_disp
-                st.pyplot(fig_disp, use_container_width=False)
+            panel_barrido_frecuencia(resultado_din)
 
             st.divider()
             
             # --- EXPORTACIÓN ---
-            st.markdown("### Exportar Análisis Dinámico")
-            col_exp1, col_exp2 = st.columns(2)
-            
-            with col_exp1:
-                pdf_reporte = generar_pdf_reporte_dinamico()
-                if pdf_reporte:
-                    st.download_button(label="Descargar Reporte PDF (Tablas y Gráficos)", data=pdf_reporte, file_name=f"analisis_dinamico_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf", mime="application/pdf", type="primary", use_container_width=True)
-            with col_exp2:
-                if OPENPYXL_AVAILABLE:
-                    excel_reporte = generar_excel_reporte_dinamico()
-                    if excel_reporte:
-                        st.download_button(label="Descargar Reporte Excel (Estilo Solicitado)", data=excel_reporte, file_name=f"analisis_dinamico_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", type="primary", use_container_width=True)
-                else:
-                    st.warning("Instale 'openpyxl' para exportar a Excel.")
+            panel_exportacion_dinamica()
 
             st.divider()
             
-            with st.expander("Ver Matrices Globales del Sistema (K y M)"):
-                st.markdown(f"**Matrices Globales (Tamaño: {len(st.session_state.grados_libertad_info)} x {len(st.session_state.grados_libertad_info)})**")
-                K_global_full = resultado_din['K_global']
-                M_global_full = resultado_din['M_global']
-                gl_labels = [f"GL{info['numero']}" for info in st.session_state.grados_libertad_info]
-                
-                st.markdown("#### Matriz de Rigidez Global (K)")
-                df_K_global = pd.DataFrame(K_global_full, columns=gl_labels, index=gl_labels)
-                st.dataframe(df_K_global.applymap(lambda x: f"{x:.3e}"), use_container_width=True)
-
-                st.markdown("#### Matriz de Masa Global (M)")
-                df_M_global = pd.DataFrame(M_global_full, columns=gl_labels, index=gl_labels)
-                st.dataframe(df_M_global.applymap(lambda x: f"{x:.3e}"), use_container_width=True)
-                
-                st.markdown("---")
-                st.markdown(f"**Matrices 'Libres' Usadas en el Solver (Tamaño: {len(resultado_din['dof_libres'])} x {len(resultado_din['dof_libres'])})**")
-                gl_labels_libres = [f"GL{gl_num}" for gl_num in resultado_din['dof_libres']]
-
-                st.markdown("#### Matriz de Rigidez Libre (K_libre)")
-                df_K_libre = pd.DataFrame(resultado_din['K_libre'], columns=gl_labels_libres, index=gl_labels_libres)
-                st.dataframe(df_K_libre.applymap(lambda x: f"{x:.3e}"), use_container_width=True)
-                
-                st.markdown("#### Matriz de Masa Libre (M_libre)")
-                df_M_libre = pd.DataFrame(resultado_din['M_libre'], columns=gl_labels_libres, index=gl_labels_libres)
-                st.dataframe(df_M_libre.applymap(lambda x: f"{x:.3e}"), use_container_width=True)
-
-            with st.expander("Ver Matrices Locales de Elementos (K' y M')"):
-                if st.session_state.tipo_elemento == "viga_portico":
-                    labels = ["u1'", "v1'", "θ1'", "u2'", "v2'", "θ2'"]
-                elif st.session_state.tipo_elemento == "viga":
-                    labels = ["v1'", "θ1'", "v2'", "θ2'"]
-                else:
-                    labels = ["u1'", "v1'", "u2'", "v2'"]
-
-                for elemento in st.session_state.elementos:
-                    st.markdown(f"#### Elemento {elemento['id']} (Nodos {elemento['nodo_inicio']} → {elemento['nodo_fin']})")
-                    col_k, col_m = st.columns(2)
-                    
-                    with col_k:
-                        st.markdown("**Matriz de Rigidez Local (k')**")
-                        matriz_k_local = np.array(st.session_state.matrices_elementos[elemento['id']].get('local', []))
-                        if matriz_k_local.any():
-                            df_k_local = pd.DataFrame(matriz_k_local, index=labels, columns=labels)
-                            st.dataframe(df_k_local.applymap(lambda x: f"{x:.3e}"))
-                    
-                    with col_m:
-                        st.markdown("**Matriz de Masa Local (m')**")
-                        matriz_m_local = np.array(st.session_state.matrices_elementos[elemento['id']].get('masa_local', []))
-                        if matriz_m_local.any():
-                            df_m_local = pd.DataFrame(matriz_m_local, index=labels, columns=labels)
-                            st.dataframe(df_m_local.applymap(lambda x: f"{x:.3e}"))
+            # --- MATRICES ---
+            panel_matrices_dinamicas(resultado_din)
 
 st.markdown("""
 <div style='background-color: #212529; padding: 2rem; margin-top: 3rem; border-radius: 15px;'>